@@ -2,21 +2,37 @@
 # batch_worker.py
 
 import os
+import json
 import time
+import signal
+import threading
+import tempfile
+from datetime import datetime, timezone
 import numpy as np
 from PIL import Image
 import io as python_io
 import torch
 import concurrent.futures
+import httpx
 
 from dotenv import load_dotenv
 from supabase import create_client, Client
 from supabase.lib.client_options import ClientOptions
 
 # 사용자 정의 모듈 및 외부 라이브러리
-from inference_engine import ImageRestorer
-import pyiqa
-from reporting_tool import calculate_metrics # reporting_tool.py에서 함수 재사용
+from inference_engine import ImageRestorer, DEFAULT_WARMUP_SHAPES
+from model_registry import MODELS_CONFIG
+from quality_metrics import calculate_metrics, calculate_metrics_array, decode_image
+from deconvolution import deconvolve_array, deconvolve_rgb, WIENER_MODEL_ID, WIENER_RGB_MODEL_ID
+from job_telemetry import JobTimer, METRICS, start_metrics_server, current_rss_mb
+from forward_profiler import ForwardProfiler
+from job_scheduler import JobScheduler, record_queue_waits, job_pixels
+from write_buffer import WriteBehindBuffer
+from job_spool import JobSpool
+from progress_reporter import ProgressReporter
+from model_router import ModelRouter
+from cpu_topology import plan_lanes, calibrate_lanes, configure_interop_threads, lane_initializer, describe_plan
+from streaming_restoration import restore_streaming, STREAMING_EXTENSIONS, DEFAULT_BAND_HEIGHT, DEFAULT_TILE, DEFAULT_BLOCK_WIDTH
 
 # --- Configuration ---
 load_dotenv(dotenv_path=".env.local")
@@ -32,252 +48,816 @@ opts = ClientOptions(postgrest_client_timeout=60, storage_client_timeout=60)
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY, options=opts)
 
 IMAGE_STORAGE_BUCKET = "images"
-MAX_WORKERS = 4  # 동시에 처리할 작업 수 (시스템 사양에 맞게 조절)
+MAX_WORKERS = int(os.environ.get("INFERENCE_LANES", 4))  # 동시에 처리할 작업 수 = 추론 lane 수 (AUTOTUNE_LANES 사용 시 보정 결과로 대체)
+THREADS_PER_LANE = int(os.environ.get("THREADS_PER_LANE", 0))  # lane별 intra-op 스레드 수 (0이면 lane에 배정된 코어 수)
+INTEROP_THREADS = int(os.environ.get("INTEROP_THREADS", 0))    # torch inter-op 스레드 수 (0이면 기본값 유지)
+CPU_PLACEMENT = os.environ.get("CPU_PLACEMENT", "numa")        # lane 배치 방식: numa, cores, none
+AUTOTUNE_LANES = os.environ.get("AUTOTUNE_LANES", "0").lower() in ("1", "true")  # 시작 시 lane 수 x 스레드 수 보정 실행 여부
 BATCH_SIZE = 8   # 한 번에 가져올 작업 수
-
-# 이전에 정의된 모델 설정을 그대로 사용
-MODELS_CONFIG = {
-    "swinir_real_sr_x4": {
-        "path": "model_weights/003_realSR_BSRGAN_DFO_s64w8_SwinIR-S_x4_GAN.pth",
-        "config": {
-            'upscale': 4, 'in_chans': 3, 'img_size': 64, 'window_size': 8, 'img_range': 1.,
-            'depths': [6, 6, 6, 6, 6, 6], 'embed_dim': 180, 'num_heads': [6, 6, 6, 6, 6, 6],
-            'mlp_ratio': 2, 'upsampler': 'real-esrgan', 'resi_connection': '1conv'
-        }
-    }
-}
-
-# --- Single Job Processing Logic ---
-
-def process_job(job: dict) -> str:
-    """단일 복원 작업을 처리하는 함수 (스레드에서 실행됨)"""
+POLL_INTERVAL = float(os.environ.get("POLL_INTERVAL", 5))  # 대기 작업이 없을 때 다시 조회하기까지의 간격(초)
+EXIT_WHEN_IDLE = os.environ.get("EXIT_WHEN_IDLE", "0").lower() in ("1", "true")  # 대기 작업이 없으면 폴링하지 않고 종료 (일회성 실행용)
+SCHEDULER_LOOKAHEAD = int(os.environ.get("SCHEDULER_LOOKAHEAD", BATCH_SIZE * 4))  # 스케줄링 후보로 조회할 대기 작업 수
+SCHEDULER_AGING_SECONDS = float(os.environ.get("SCHEDULER_AGING_SECONDS", 300))  # 큰 작업의 기아 방지를 위한 aging 주기(초)
+SCHEDULER_MAX_WAIT_SECONDS = float(os.environ.get("SCHEDULER_MAX_WAIT_SECONDS", 3600))  # 이 시간 이상 기다린 작업은 비용과 관계없이 먼저 선택 (0이면 미사용)
+WRITE_BUFFER_MAX_PENDING = int(os.environ.get("WRITE_BUFFER_MAX_PENDING", 50))       # 이 개수만큼 쓰기가 쌓이면 즉시 flush
+WRITE_BUFFER_FLUSH_INTERVAL = float(os.environ.get("WRITE_BUFFER_FLUSH_INTERVAL", 2))  # 주기적 flush 간격(초)
+# 부하 기반 모델 라우팅 (parameters.allow_downgrade 작업만 대상, 예상 대기 시간 기준 hysteresis)
+ROUTING_ENABLED = os.environ.get("ROUTING_ENABLED", "0").lower() in ("1", "true")  # 켜면 정밀도 변형을 미리 로드하고 opt-in 작업을 라우팅 (기본: 꺼짐, 항상 요청 구성으로 처리)
+ROUTING_DOWNGRADE_WAIT = float(os.environ.get("ROUTING_DOWNGRADE_WAIT", 120))   # 예상 대기(초)가 이보다 길면 한 단계 다운그레이드
+ROUTING_UPGRADE_WAIT = float(os.environ.get("ROUTING_UPGRADE_WAIT", 30))        # 예상 대기(초)가 이보다 짧으면 한 단계 복귀
+ROUTING_DOWNGRADE_DEPTH = int(os.environ.get("ROUTING_DOWNGRADE_DEPTH", 0))     # 대기 작업 수 기준 다운그레이드 (0이면 미사용)
+ROUTING_UPGRADE_DEPTH = int(os.environ.get("ROUTING_UPGRADE_DEPTH", 0))         # 대기 작업 수 기준 복귀 (0이면 미사용)
+ROUTING_MIN_DWELL = float(os.environ.get("ROUTING_MIN_DWELL", 60))              # 단계 변경 후 최소 유지 시간(초)
+WORKER_ID = os.environ.get("WORKER_ID", "0")  # 같은 호스트에서 여러 워커를 띄울 때 워커마다 다르게 지정
+SPOOL_DIR = os.environ.get("SPOOL_DIR", os.path.join(".spool", WORKER_ID))  # 워커별 업로드 전 결과 체크포인트 디렉터리
+SPOOL_MAX_RESUME_ATTEMPTS = int(os.environ.get("SPOOL_MAX_RESUME_ATTEMPTS", 3))  # 체크포인트 업로드 재개를 포기하고 실패 처리하기까지의 시도 횟수
+PREVIEW_MIN_PIXELS = int(os.environ.get("PREVIEW_MIN_PIXELS", 1_000_000))  # 이 픽셀 수 이상인 입력은 저해상도 미리보기를 먼저 업로드 (0이면 비활성화)
+PREVIEW_MAX_SIDE = int(os.environ.get("PREVIEW_MAX_SIDE", 256))            # 미리보기 추론 입력의 긴 변 길이
+PROGRESS_MIN_INTERVAL = float(os.environ.get("PROGRESS_MIN_INTERVAL", 2))  # 작업별 진행률 기록 최소 간격(초)
+PROGRESS_TILE = int(os.environ.get("PROGRESS_TILE", 512))  # 모델에 tile 설정이 없을 때 큰 입력(PREVIEW_MIN_PIXELS 이상)에 적용할 타일 크기 (0이면 전체 추론)
+STREAMING_PIXEL_THRESHOLD = int(os.environ.get("STREAMING_PIXEL_THRESHOLD", 64_000_000))  # 이 픽셀 수를 넘는 .npy/.tif 입력은 밴드 단위로 처리
+STREAMING_BAND_HEIGHT = int(os.environ.get("STREAMING_BAND_HEIGHT", DEFAULT_BAND_HEIGHT))  # 스트리밍 입력 밴드 높이(행)
+STREAMING_TILE = int(os.environ.get("STREAMING_TILE", DEFAULT_TILE))                      # 밴드 내부 타일 추론 크기
+STREAMING_BLOCK_WIDTH = int(os.environ.get("STREAMING_BLOCK_WIDTH", DEFAULT_BLOCK_WIDTH))  # 밴드를 나눠 추론할 열 블록 폭 (추론 버퍼 크기 제한)
+WARMUP_ITERATIONS = int(os.environ.get("WARMUP_ITERATIONS", 2))  # 입력 크기별 워밍업 반복 횟수
+READY_FILE = os.environ.get("WORKER_READY_FILE", ".worker_ready")  # 준비 완료 시 생성되는 readiness 파일
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))  # /metrics, /ready 엔드포인트 포트 (0이면 비활성화)
+
+# forward 프로파일링 설정 (PROFILE_SAMPLE_RATE가 0이면 비활성화)
+PROFILE_SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", 0))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "profiles")
+PROFILE_MAX_TRACES = int(os.environ.get("PROFILE_MAX_TRACES", 50))          # 모델별 최대 트레이스 수
+PROFILE_MIN_INTERVAL = float(os.environ.get("PROFILE_MIN_INTERVAL", 30))    # 같은 모델의 연속 샘플 간 최소 간격(초)
+
+# 워커 시작 시 로드 및 워밍업된 모델 인스턴스 (model_id -> ImageRestorer)
+RESTORERS = {}
+
+# 라우팅으로 선택되는 정밀도 변형 인스턴스 ((model_id, precision) -> ImageRestorer, 시작 시 미리 로드 및 워밍업)
+ROUTED_RESTORERS = {}
+_routed_restorers_lock = threading.Lock()
+
+# 작업 스레드별 CPU 집합과 intra-op 스레드 수 (configure_lanes()에서 결정)
+LANE_PLAN = []
+
+scheduler = JobScheduler(MODELS_CONFIG, aging_seconds=SCHEDULER_AGING_SECONDS, max_wait_seconds=SCHEDULER_MAX_WAIT_SECONDS)
+router = ModelRouter(MODELS_CONFIG, downgrade_wait_seconds=ROUTING_DOWNGRADE_WAIT, upgrade_wait_seconds=ROUTING_UPGRADE_WAIT,
+                     downgrade_queue_depth=ROUTING_DOWNGRADE_DEPTH, upgrade_queue_depth=ROUTING_UPGRADE_DEPTH,
+                     min_dwell_seconds=ROUTING_MIN_DWELL)
+
+# 상태 변경, 벤치마크, 단계별 타이밍 쓰기를 모아 일괄 기록하는 write-behind 버퍼
+write_buffer = WriteBehindBuffer(supabase, max_pending=WRITE_BUFFER_MAX_PENDING,
+                                 flush_interval=WRITE_BUFFER_FLUSH_INTERVAL)
+
+# 업로드 전 결과 체크포인트 스풀과 종료 신호 상태
+spool = JobSpool(SPOOL_DIR)
+shutdown_requested = threading.Event()
+shutdown_signal_count = 0
+
+# --- Model Warmup & Readiness ---
+
+def load_restorers() -> dict:
+    """등록된 모든 모델을 로드하고 워밍업하여 RESTORERS 캐시에 보관합니다."""
+    readiness = {}
+    profiler = None
+    if PROFILE_SAMPLE_RATE > 0:
+        profiler = ForwardProfiler(trace_dir=PROFILE_DIR, sample_rate=PROFILE_SAMPLE_RATE,
+                                   max_traces_per_model=PROFILE_MAX_TRACES, min_interval_seconds=PROFILE_MIN_INTERVAL)
+        print(f"forward 프로파일링 활성화 (샘플링 비율: {PROFILE_SAMPLE_RATE}, 저장 위치: '{PROFILE_DIR}')")
+
+    for model_id, model_info in MODELS_CONFIG.items():
+        load_start = time.time()
+        restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'],
+                                 checksum=model_info.get('sha256'))
+        load_time = time.time() - load_start
+
+        stats = restorer.warmup(warmup_shapes(model_id), iterations=WARMUP_ITERATIONS)
+        # 워밍업 호출은 프로파일링 대상에서 제외
+        if profiler is not None:
+            restorer.enable_profiling(profiler, model_id)
+        RESTORERS[model_id] = restorer
+        router.register(model_id, restorer.device.type, stats)
+        readiness[model_id] = {"load_seconds": round(load_time, 3), "rss_mb": round(current_rss_mb(), 1), "warmup": stats}
+
+        for entry in stats:
+            h, w = entry['shape']
+            print(f"[Warmup] {model_id} {h}x{w}: cold={entry['cold_ms']:.1f}ms, warm={entry['warm_ms']:.1f}ms")
+            METRICS.set("restoration_warmup_cold_seconds", entry['cold_ms'] / 1000,
+                        "First-call latency measured during warmup", model=model_id, shape=f"{h}x{w}")
+            METRICS.set("restoration_warmup_warm_seconds", entry['warm_ms'] / 1000,
+                        "Steady-state latency measured during warmup", model=model_id, shape=f"{h}x{w}")
+
+    if ROUTING_ENABLED:
+        load_routed_restorers(readiness)
+    return readiness
+
+
+def load_routed_restorers(readiness: dict):
+    """
+    라우터 티어에 포함된 정밀도 변형을 시작 시 미리 로드하고 워밍업합니다.
+    (과부하 중에 작업 스레드가 콜드 스타트 비용을 떠안지 않도록, 모든 모델이 등록된 뒤 티어 기준으로 준비)
+    """
+    for model_id, restorer in RESTORERS.items():
+        for variant_id, precision in router.tiers(model_id):
+            if variant_id != model_id or precision is None or precision == restorer.precision:
+                continue
+            model_info = MODELS_CONFIG[model_id]
+            load_start = time.time()
+            try:
+                variant = ImageRestorer(model_path=model_info['path'], model_config={**model_info['config'], 'precision': precision},
+                                        checksum=model_info.get('sha256'))
+                stats = variant.warmup(warmup_shapes(model_id), iterations=WARMUP_ITERATIONS)
+            except Exception as e:
+                print(f"[Router] {model_id} ({precision}) 변형 로드 실패, 기본 정밀도로 대체합니다: {e}")
+                continue
+            # 변형의 실제 워밍업 시간으로 비용을 보정하고, 기본 정밀도보다 빠르지 않으면 티어에서 빠지므로 로드하지 않음
+            router.register(model_id, variant.device.type, stats, precision)
+            if (model_id, precision) not in router.tiers(model_id):
+                print(f"[Router] {model_id} ({precision}) 변형이 기본 정밀도보다 빠르지 않아 사용하지 않습니다.")
+                del variant
+                continue
+            with _routed_restorers_lock:
+                ROUTED_RESTORERS[(model_id, precision)] = variant
+            readiness[f"{model_id}:{precision}"] = {"load_seconds": round(time.time() - load_start, 3),
+                                                   "rss_mb": round(current_rss_mb(), 1), "warmup": stats}
+            print(f"[Router] {model_id} ({precision}) 변형을 로드하고 워밍업했습니다.")
+
+
+def get_restorer(model_id: str, precision: str = None) -> ImageRestorer:
+    """(model_id, precision) 구성의 인스턴스를 반환합니다. 미리 로드된 변형이 없으면 기본 인스턴스를 반환합니다."""
+    restorer = RESTORERS[model_id]
+    if precision is None or precision == restorer.precision:
+        return restorer
+    with _routed_restorers_lock:
+        return ROUTED_RESTORERS.get((model_id, precision), restorer)
+
+
+def warmup_shapes(model_id: str) -> list:
+    """
+    모델의 워밍업 입력 크기 목록. 큰 입력은 타일(모델의 tile 설정, 없으면 PROGRESS_TILE) 단위로 추론되므로
+    그 타일 크기도 포함하여 첫 작업이 해당 크기의 콜드 스타트 비용을 떠안지 않도록 합니다.
+    """
+    model_info = MODELS_CONFIG[model_id]
+    shapes = [tuple(shape) for shape in (model_info.get('warmup_shapes') or DEFAULT_WARMUP_SHAPES)]
+    tile = model_info['config'].get('tile') or PROGRESS_TILE
+    if tile and (tile, tile) not in shapes:
+        shapes.append((tile, tile))
+    return shapes
+
+
+def calibration_shape(model_id: str) -> tuple:
+    """lane 보정에 사용할 입력 크기: 워밍업 크기 중 픽셀 수가 가장 큰 것"""
+    return max(warmup_shapes(model_id), key=lambda shape: shape[0] * shape[1])
+
+
+def configure_lanes() -> list:
+    """
+    추론 lane 계획을 정하고 MAX_WORKERS를 lane 수로 맞춥니다.
+    AUTOTUNE_LANES가 켜져 있고 모델이 CPU에서 실행되면 짧은 보정 실행으로 처리량이 가장 높은 lane 수를 고릅니다.
+    """
+    global MAX_WORKERS, LANE_PLAN
+    plan = None
+    model_id, restorer = next(iter(RESTORERS.items()), (None, None))
+    if AUTOTUNE_LANES and restorer is not None and restorer.device.type == "cpu":
+        # 작은 입력은 intra-op 병렬화 이득이 거의 없어 항상 lane을 최대로 고르게 되므로,
+        # 실제 작업 크기를 대표하도록 가장 큰 워밍업 크기와 진행률 타일 크기 중 큰 쪽으로 보정
+        h, w = calibration_shape(model_id)
+        dummy = np.random.randint(0, 256, (h, w, 3), dtype=np.uint8)
+        plan, results = calibrate_lanes(lambda: restorer.restore_array(dummy), placement=CPU_PLACEMENT)
+        for entry in results:
+            print(f"[CPU] 보정 lane {entry['lanes']} x 스레드 {entry['threads_per_lane']}: {entry['throughput']:.2f}회/초")
+
+    if plan is None:
+        plan = plan_lanes(MAX_WORKERS, THREADS_PER_LANE or None, CPU_PLACEMENT)
+    LANE_PLAN = plan
+    MAX_WORKERS = len(plan)
+
+    for line in describe_plan(plan):
+        print(f"[CPU] {line}")
+    METRICS.set("restoration_inference_lanes", len(plan), "Concurrent inference lanes (worker threads)")
+    return plan
+
+
+def mark_ready(readiness: dict):
+    """워밍업이 끝난 뒤 readiness 파일에 콜드/웜 지연 시간을 기록합니다. (오토스케일러 헬스체크용)"""
+    with open(READY_FILE, 'w', encoding='utf-8') as f:
+        json.dump({"ready": True, "pid": os.getpid(), "models": readiness}, f, ensure_ascii=False, indent=2)
+    METRICS.set("restoration_worker_ready", 1, "1 once all models are loaded and warmed up")
+    print(f"워커 준비 완료. ('{READY_FILE}')")
+
+
+def clear_ready():
+    """readiness 파일을 제거하여 워커를 '준비되지 않음' 상태로 표시합니다."""
+    METRICS.set("restoration_worker_ready", 0, "1 once all models are loaded and warmed up")
+    if os.path.exists(READY_FILE):
+        os.remove(READY_FILE)
+
+# --- Streaming (Gigapixel) Jobs ---
+
+def is_streaming_job(job: dict) -> bool:
+    """밴드 단위 접근이 가능한 포맷이면서 parameters.streaming이 켜졌거나 임계값보다 큰 작업인지 확인합니다."""
+    ext = os.path.splitext(job.get("blurred_image_path") or "")[1].lower()
+    if ext not in STREAMING_EXTENSIONS:
+        return False
+    params = job.get('parameters') or {}
+    return bool(params.get('streaming')) or job_pixels(job) > STREAMING_PIXEL_THRESHOLD
+
+
+def download_to_file(path: str, dest: str, chunk_size: int = 4 * 1024 * 1024) -> int:
+    """스토리지 객체를 서명 URL로 스트리밍 다운로드하여 파일에 기록합니다. (전체를 메모리에 올리지 않음)"""
+    signed = supabase.storage.from_(IMAGE_STORAGE_BUCKET).create_signed_url(path, 3600)
+    url = signed.get("signedURL") or signed.get("signedUrl")
+    written = 0
+    with httpx.stream("GET", url, timeout=60) as response, open(dest, 'wb') as f:
+        response.raise_for_status()
+        for chunk in response.iter_bytes(chunk_size):
+            f.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def process_streaming_job(job: dict, restorer: ImageRestorer, timer: JobTimer, progress: ProgressReporter) -> str:
+    """
+    기가픽셀 입력을 디스크로 받아 밴드 단위로 복원하고, 출력 파일을 그대로 업로드합니다.
+    결과가 이미지 전체 크기이므로 스풀 체크포인트와 전체 이미지 품질 지표는 생략합니다.
+    """
     job_id = job['id']
-    start_time = time.time()
-    
-    try:
-        print(f"[Job {job_id}] 처리 시작...")
+    model_id = job.get('model_id')
+    blurred_image_path = job["blurred_image_path"]
+    ext = os.path.splitext(blurred_image_path)[1].lower()
+    content_type = "application/octet-stream" if ext == ".npy" else "image/tiff"
+
+    restored_filename = f"restored_{model_id}_{os.path.splitext(os.path.basename(blurred_image_path))[0]}_{int(time.time())}{ext}"
+    restored_path = os.path.join(os.path.dirname(blurred_image_path), restored_filename)
+
+    with tempfile.TemporaryDirectory(prefix=f"stream_{job_id}_") as workdir:
+        input_path = os.path.join(workdir, f"input{ext}")
+        output_path = os.path.join(workdir, f"output{ext}")
+
+        with timer.stage("download") as span:
+            span["bytes"] = download_to_file(blurred_image_path, input_path)
+
+        with timer.stage("stream_restore") as span:
+            stats = restore_streaming(restorer, input_path, output_path,
+                                      band_height=STREAMING_BAND_HEIGHT, tile=STREAMING_TILE,
+                                      progress_callback=progress.range_callback(5, 90, "stream_restore"),
+                                      block_width=STREAMING_BLOCK_WIDTH)
+            span["bytes"] = os.path.getsize(output_path)
+
+        progress.update(90, "upload", force=True)
+        with timer.stage("upload", os.path.getsize(output_path)):
+            supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
+                path=restored_path,
+                file=output_path,
+                file_options={"content-type": content_type, "upsert": "true"}
+            )
+
+    with timer.stage("db_update"):
+        write_buffer.update_job(job_id, {
+            "status": "completed",
+            "restored_image_path": restored_path,
+            "progress": 100,
+            "current_step": "completed",
+            "completed_at": utc_now(),
+            "logs": timer.summary_lines() + [f"streaming: {stats['bands']} bands x {stats['band_height']} rows, output {stats['output_shape'][1]}x{stats['output_shape'][0]}"],
+        })
+
+    write_buffer.insert("job_stage_timings", timer.to_rows())
+    METRICS.inc("restoration_jobs_total", help_text="Processed restoration jobs", status="completed", model=str(model_id))
+    return f"[Job {job_id}] 스트리밍 복원 완료 ({stats['bands']}개 밴드, 소요 시간: {timer.total_ms() / 1000:.2f}초)"
+
+# --- Multi-model Comparison Jobs ---
+
+def comparison_models(job: dict) -> list:
+    """parameters.models에 나열된 비교 대상 model_id 목록을 반환합니다. (비교 작업이 아니면 빈 목록)"""
+    return list((job.get('parameters') or {}).get('models') or [])
+
+
+def process_comparison_job(job: dict, model_ids: list, timer: JobTimer, progress: ProgressReporter) -> str:
+    """
+    하나의 입력에 대해 여러 모델(및 Wiener 경로)을 실행하고 결과를 비교합니다.
+    입력·원본 다운로드와 디코딩, NIQE 메트릭 객체는 한 번만 준비하여 모든 모델이 공유하고,
+    벤치마크 행은 한 번의 bulk insert로 기록합니다.
+    """
+    job_id = job['id']
+    unknown = [m for m in model_ids if m not in RESTORERS and m != WIENER_MODEL_ID]
+    if unknown:
+        raise ValueError(f"지원되지 않는 비교 모델 ID: {unknown}")
 
-        # 1. 모델 선택 및 로드
-        model_id = job.get('model_id')
-        if not model_id or model_id not in MODELS_CONFIG:
-            raise ValueError(f"지원되지 않는 모델 ID: '{model_id}'")
-        
-        model_info = MODELS_CONFIG[model_id]
-        restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'])
-        
-        # 2. 이미지 다운로드
-        blurred_image_path = job.get("blurred_image_path")
-        if not blurred_image_path:
-            raise ValueError("블러 이미지 경로가 없습니다.")
-        
+    blurred_image_path = job["blurred_image_path"]
+    with timer.stage("download") as span:
         image_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=blurred_image_path)
+        span["bytes"] = len(image_bytes)
+
+    with timer.stage("decode") as span:
+        try:
+            img_np = decode_image(image_bytes)
+        except Exception as img_exc:
+            raise ValueError(f"잘못된 이미지 형식 또는 손상된 파일입니다: {img_exc}")
+        span["bytes"] = img_np.nbytes
+
+    original_array = None
+    if job.get("original_image_path"):
+        with timer.stage("download_original") as span:
+            original_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=job["original_image_path"])
+            span["bytes"] = len(original_bytes)
+            original_array = decode_image(original_bytes)
+
+    results, benchmark_rows = [], []
+    stem = os.path.basename(blurred_image_path)
+    for index, model_id in enumerate(model_ids):
+        progress.update(100 * index / len(model_ids), f"compare {model_id} ({index + 1}/{len(model_ids)})", force=True)
+        restorer = RESTORERS.get(model_id)
+        device = restorer.device if restorer is not None else torch.device("cpu")
+
+        with timer.stage(f"restore:{model_id}") as span:
+            start = time.perf_counter()
+            restored = restorer.restore_array(img_np) if restorer is not None else deconvolve_array(img_np)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            span["bytes"] = restored.nbytes
+
+        restored_path = os.path.join(os.path.dirname(blurred_image_path),
+                                     f"restored_{model_id}_{stem}_{int(time.time())}.png")
+        with timer.stage(f"upload:{model_id}") as span:
+            output_io = python_io.BytesIO()
+            Image.fromarray(restored).save(output_io, format='PNG')
+            span["bytes"] = output_io.tell()
+            supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
+                path=restored_path,
+                file=output_io.getvalue(),
+                file_options={"content-type": "image/png", "upsert": "true"}
+            )
+        results.append({"model_id": model_id, "restored_image_path": restored_path, "inference_ms": round(elapsed_ms, 1)})
+
+        if original_array is not None:
+            with timer.stage(f"metrics:{model_id}"):
+                metrics = calculate_metrics_array(original_array, restored, device)
+            benchmark_rows.append({
+                "job_id": job_id, "model_name": model_id,
+                "psnr": metrics.get('psnr'), "ssim": metrics.get('ssim'), "niqe": metrics.get('niqe'),
+            })
+        print(f"[Job {job_id}] 비교 {model_id}: {elapsed_ms / 1000:.2f}초")
+
+    if benchmark_rows:
+        write_buffer.insert("model_benchmarks", benchmark_rows)
+
+    # 모델별 결과 경로는 parameters.comparison_results에, 대표 결과는 첫 번째 모델로 기록
+    with timer.stage("db_update"):
+        write_buffer.update_job(job_id, {
+            "status": "completed",
+            "restored_image_path": results[0]["restored_image_path"],
+            "progress": 100,
+            "current_step": "completed",
+            "parameters": {**(job.get('parameters') or {}), "comparison_results": results},
+            "completed_at": utc_now(),
+            "logs": timer.summary_lines(),
+        })
+
+    write_buffer.insert("job_stage_timings", timer.to_rows())
+    METRICS.inc("restoration_jobs_total", help_text="Processed restoration jobs", status="completed", model="comparison")
+    return f"[Job {job_id}] {len(model_ids)}개 모델 비교 완료 (소요 시간: {timer.total_ms() / 1000:.2f}초)"
+
+# --- Progressive Preview ---
+
+def model_upscale(model_id: str) -> int:
+    """모델 설정의 출력 배율 (등록되지 않은 모델과 Wiener 경로는 1)"""
+    return MODELS_CONFIG.get(model_id, {}).get('config', {}).get('upscale', 1)
+
+
+def resize_to_scale(restored: np.ndarray, input_shape: tuple, scale: int) -> np.ndarray:
+    """복원 결과를 입력 크기 x scale 로 맞춥니다. 이미 같은 크기면 그대로 반환합니다."""
+    target = (input_shape[1] * scale, input_shape[0] * scale)
+    if (restored.shape[1], restored.shape[0]) == target:
+        return restored
+    return np.array(Image.fromarray(restored).resize(target, Image.LANCZOS))
+
+
+def publish_preview(job: dict, restorer: ImageRestorer, img_np: np.ndarray, timer: JobTimer, progress: ProgressReporter):
+    """축소 입력으로 만든 미리보기를 업로드하고 preview_image_path를 기록합니다. 실패해도 본 작업은 계속합니다."""
+    job_id = job['id']
+    blurred_image_path = job["blurred_image_path"]
+    stem = os.path.splitext(os.path.basename(blurred_image_path))[0]
+    preview_path = os.path.join(os.path.dirname(blurred_image_path), f"preview_{job.get('model_id')}_{stem}.jpg")
+    try:
+        with timer.stage("preview") as span:
+            preview = restorer.preview(img_np, PREVIEW_MAX_SIDE)
+            preview_io = python_io.BytesIO()
+            Image.fromarray(preview).save(preview_io, format='JPEG', quality=80)
+            span["bytes"] = preview_io.tell()
+            supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
+                path=preview_path,
+                file=preview_io.getvalue(),
+                file_options={"content-type": "image/jpeg", "upsert": "true"}
+            )
+        progress.update(10, "preview", force=True, preview_image_path=preview_path)
+    except Exception as e:
+        print(f"[Job {job_id}] 미리보기 생성 실패 (본 추론은 계속 진행): {e}")
 
-                
-
-                # 3. 이미지 유효성 검사
-
-                try:
-
-                    # 이미지를 열어봄으로써 기본적인 유효성 검사 수행
-
-                    Image.open(python_io.BytesIO(image_bytes)).verify()
-
-                except Exception as img_exc:
-
-                    # PIL.UnidentifiedImageError 등 다양한 이미지 관련 예외 처리
-
-                    raise ValueError(f"잘못된 이미지 형식 또는 손상된 파일입니다: {img_exc}")
-
-        
-
-                # 4. AI 모델 추론
-
-                restored_image_array = restorer.inference(image_bytes)
-
-                
-
-                # 5. 결과 업로드
-
-                restored_filename = f"restored_{model_id}_{os.path.basename(blurred_image_path)}_{int(time.time())}.png"
-
-                restored_path = os.path.join(os.path.dirname(blurred_image_path), restored_filename)
-
-                
-
-                output_io = python_io.BytesIO()
-
-                Image.fromarray(restored_image_array).save(output_io, format='PNG')
-
-                output_io.seek(0)
-
-                
-
-                supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
-
-                    path=restored_path,
-
-                    file=output_io.read(),
-
-                    file_options={"content-type": "image/png"}
-
-                )
-
-        
-
-                # 6. 벤치마크 계산 및 저장
-
-                if job.get("original_image_path"):
-
-                    original_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=job["original_image_path"])
-
-                    metrics = calculate_metrics(original_bytes, restored_image_array, restorer.device)
-
-                    
-
-                    supabase.table("model_benchmarks").insert({
-
-                        "job_id": job_id, "model_name": model_id,
-
-                        "psnr": metrics.get('psnr'), "ssim": metrics.get('ssim'), "niqe": metrics.get('niqe'),
-
-                    }).execute()
-
-                    print(f"[Job {job_id}] 품질 지표: PSNR={metrics.get('psnr'):.2f}, SSIM={metrics.get('ssim'):.4f}, NIQE={metrics.get('niqe'):.2f}")
-
-        
-
-                # 7. 작업 상태 'completed'로 업데이트
-
-                supabase.table("restoration_jobs").update({
-
-                    "status": "completed",
-
-                    "restored_image_path": restored_path,
-
-                    "completed_at": "now()"
-
-                }).eq("id", job_id).execute()
-
-                
-
-                elapsed = time.time() - start_time
-
-                return f"[Job {job_id}] 성공적으로 완료 (소요 시간: {elapsed:.2f}초)"
-
-        
-
-            except Exception as e:
-
-                # 8. 견고한 오류 처리
-
-                error_message = f"오류 발생: {type(e).__name__}: {str(e)}"
-
-                print(f"[Job {job_id}] 실패. {error_message}")
-
-        
-
-                # 메모리 부족 오류 식별 (PyTorch MPS/CUDA에서 흔히 발생)
-
-                if isinstance(e, torch.cuda.OutOfMemoryError) or 'out of memory' in str(e).lower():
-
-                    error_message = f"메모리 부족(OOM): {str(e)}"
-
-                
-
-                supabase.table("restoration_jobs").update({
-
-                    "status": "failed",
-
-                    "error_log": error_message
-
-                }).eq("id", job_id).execute()
-
-                
-
-                # 예외를 다시 발생시켜 concurrent.futures가 인지하도록 함
-
-                raise
-
-        
-
-        # --- Main Batch Worker ---
-
-        
-
-        def main():
-
-            """배치 워커 메인 함수"""
-
-            print(f"배치 워커 시작. (최대 동시 작업: {MAX_WORKERS}, 배치 크기: {BATCH_SIZE})")
-
-            
-
-            # 1. 'pending' 상태의 작업을 배치 크기만큼 가져옴
-
-            response = supabase.table("restoration_jobs").select("*").eq("status", "pending").limit(BATCH_SIZE).execute()
-
-            jobs = response.data
-
-            
-
-            if not jobs:
-
-                print("처리할 작업이 없습니다. 종료합니다.")
-
-                return
-
-                
-
-            print(f"{len(jobs)}개의 작업을 가져왔습니다. 처리를 시작합니다.")
-
-            
-
-            # 2. 가져온 작업들의 상태를 'processing'으로 일괄 변경
-
-            job_ids = [job['id'] for job in jobs]
-
-            supabase.table("restoration_jobs").update({"status": "processing"}).in_("id", job_ids).execute()
-
-        
-
-            # 3. ThreadPoolExecutor를 사용하여 병렬 처리
-
-            with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-
-                # 각 job에 대해 process_job 함수를 제출
-
-                future_to_job = {executor.submit(process_job, job): job for job in jobs}
-
-                
-
-                for future in concurrent.futures.as_completed(future_to_job):
-
-                    job = future_to_job[future]
-
-                    try:
+# --- Single Job Processing Logic ---
 
-                        result = future.get()
+def utc_now() -> str:
+    """버퍼링된 쓰기가 실제 flush 시각이 아닌 발생 시각을 기록하도록 ISO 타임스탬프를 반환"""
+    return datetime.now(timezone.utc).isoformat()
 
-                        print(result)
 
-                    except Exception as exc:
+def finalize_job(job: dict, restored_path: str, output_bytes: bytes, restored_image_array: np.ndarray,
+                 device: torch.device, timer: JobTimer):
+    """
+    체크포인트된 결과를 업로드하고 품질 지표와 'completed' 상태를 기록합니다.
+    정상 처리와 스풀 재개가 같은 경로를 사용합니다.
+    """
+    job_id = job['id']
+    model_id = job.get('model_id')
+    manifest = spool.manifest(job_id)
+
+    # 5. 결과 업로드 (재개 시 이미 업로드된 결과는 건너뜀)
+    if not manifest.get("uploaded"):
+        with timer.stage("upload", len(output_bytes)):
+            supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
+                path=restored_path,
+                file=output_bytes,
+                file_options={"content-type": "image/png", "upsert": "true"}
+            )
+        spool.mark(job_id, uploaded=True)
+
+    # 6. 벤치마크 계산 및 저장 (재개 시 이미 기록된 벤치마크는 다시 넣지 않음)
+    if job.get("original_image_path") and not manifest.get("benchmarked"):
+        with timer.stage("metrics") as span:
+            original_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=job["original_image_path"])
+            span["bytes"] = len(original_bytes)
+            metrics = calculate_metrics(original_bytes, restored_image_array, device)
+
+            write_buffer.insert("model_benchmarks", {
+                "job_id": job_id, "model_name": model_id,
+                "psnr": metrics.get('psnr'), "ssim": metrics.get('ssim'), "niqe": metrics.get('niqe'),
+            }, on_flushed=lambda: spool.mark(job_id, benchmarked=True))
+        print(f"[Job {job_id}] 품질 지표: PSNR={metrics.get('psnr'):.2f}, SSIM={metrics.get('ssim'):.4f}, NIQE={metrics.get('niqe'):.2f}")
+
+    # 7. 작업 상태 'completed'로 업데이트 (단계별 요약은 logs 컬럼에 함께 기록, write-behind 버퍼 경유)
+    with timer.stage("db_update"):
+        completed_update = {
+            "status": "completed",
+            "restored_image_path": restored_path,
+            "progress": 100,
+            "current_step": "completed",
+            "completed_at": utc_now(),
+            "logs": timer.summary_lines(),
+        }
+        write_buffer.update_job(job_id, completed_update)
 
-                        # process_job 내부에서 이미 오류 처리 및 로깅을 수행함
+    write_buffer.insert("job_stage_timings", timer.to_rows())
+    # 버퍼가 flush 된 뒤 purge_finalized()로 스풀에서 삭제됨. 그 전에 중단되면 재개 시 상태 변경만 다시 기록
+    spool.mark(job_id, finalized=True, completed_update=completed_update)
+    METRICS.inc("restoration_jobs_total", help_text="Processed restoration jobs", status="completed", model=str(model_id))
 
-                        # 여기서는 메인 스레드에 오류가 발생했음을 알리는 역할만 함
 
-                        print(f"[Job {job['id']}] 최종 처리 실패. 상세 내용은 로그를 확인하세요.")
+def process_job(job: dict, claim_ms: float = None) -> str:
+    """단일 복원 작업을 처리하는 함수 (스레드에서 실행됨)"""
+    job_id = job['id']
+    timer = JobTimer(job_id)
+    progress = ProgressReporter(write_buffer, job_id, min_interval=PROGRESS_MIN_INTERVAL)
+    if claim_ms is not None:
+        # 배치 단위로 측정된 claim 구간을 각 작업에 동일하게 기록
+        timer.add_span("claim", claim_ms)
 
-        
+    try:
+        # 종료 신호를 받은 뒤 시작되는 작업은 처리하지 않고 큐로 반환
+        if shutdown_requested.is_set():
+            release_jobs([job])
+            return f"[Job {job_id}] 종료 요청으로 처리하지 않고 반환했습니다."
 
-            print("
+        print(f"[Job {job_id}] 처리 시작...")
 
-        모든 배치 작업이 완료되었습니다.")
+        # 비교 작업: 하나의 입력으로 여러 모델을 실행
+        model_ids = comparison_models(job)
+        if model_ids:
+            if not job.get("blurred_image_path"):
+                raise ValueError("블러 이미지 경로가 없습니다.")
+            return process_comparison_job(job, model_ids, timer, progress)
 
-        
+        # 1. 모델 선택 (워커 시작 시 워밍업된 인스턴스 재사용)
+        model_id = job.get('model_id')
+        if not model_id or model_id not in RESTORERS:
+            raise ValueError(f"지원되지 않는 모델 ID: '{model_id}'")
 
-        if __name__ == "__main__":
+        blurred_image_path = job.get("blurred_image_path")
+        if not blurred_image_path:
+            raise ValueError("블러 이미지 경로가 없습니다.")
 
-            main()
+        # 대용량 입력은 전체 디코딩 없이 밴드 단위로 처리
+        if is_streaming_job(job):
+            timer.device = RESTORERS[model_id].device
+            return process_streaming_job(job, RESTORERS[model_id], timer, progress)
+
+        # 부하가 높으면 opt-in 작업을 더 저렴한 구성(낮은 정밀도, 작은 모델, Wiener 경로)으로 라우팅
+        decision = router.route(job)
+        if (job.get('parameters') or {}).get('allow_downgrade'):
+            write_buffer.update_job(job_id, {"routed_model_id": decision["model_id"], "routing_decision": decision})
+        if decision["level"]:
+            print(f"[Job {job_id}] 라우팅: {model_id} -> {decision['model_id']} ({decision['precision'] or '기본 정밀도'}), "
+                  f"예상 절감 {decision['estimated_savings_s']:.1f}초")
+        model_id = decision["model_id"]
+        restorer = get_restorer(model_id, decision["precision"]) if model_id != WIENER_RGB_MODEL_ID else None
+        if restorer is not None and decision["precision"] and restorer.precision != decision["precision"]:
+            # 변형 로드에 실패해 기본 인스턴스로 대체된 경우 실제 실행된 정밀도를 기록
+            decision["precision"] = restorer.precision
+        timer.device = restorer.device if restorer is not None else torch.device("cpu")
 
-        
+        # 2. 이미지 다운로드
+        with timer.stage("download") as span:
+            image_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=blurred_image_path)
+            span["bytes"] = len(image_bytes)
+
+        # 3. 이미지 유효성 검사
+        try:
+            # 이미지를 열어봄으로써 기본적인 유효성 검사 수행
+            Image.open(python_io.BytesIO(image_bytes)).verify()
+        except Exception as img_exc:
+            # PIL.UnidentifiedImageError 등 다양한 이미지 관련 예외 처리
+            raise ValueError(f"잘못된 이미지 형식 또는 손상된 파일입니다: {img_exc}")
+
+        with timer.stage("decode") as span:
+            img_np = decode_image(image_bytes)
+            span["bytes"] = img_np.nbytes
+
+        # 큰 입력은 본 추론 전에 저해상도 미리보기를 먼저 제공
+        large_input = bool(PREVIEW_MIN_PIXELS) and img_np.shape[0] * img_np.shape[1] >= PREVIEW_MIN_PIXELS
+        if restorer is not None and large_input:
+            publish_preview(job, restorer, img_np, timer, progress)
+
+        # 4. AI 모델 추론 (pad/forward/postprocess 단계는 엔진 내부에서 기록, 타일 추론 시 진행률 보고)
+        # 진행률은 타일 단위로만 보고되므로, 모델에 tile 설정이 없어도 큰 입력은 PROGRESS_TILE로 나눠 추론
+        inference_start = time.perf_counter()
+        if restorer is not None:
+            tile = restorer.tile or (PROGRESS_TILE if large_input else None) or None
+            restored_image_array = restorer.restore_array(img_np, timer=timer, tile=tile,
+                                                          progress_callback=progress.range_callback(10, 90, "inference"))
+        else:
+            with timer.stage("forward"):
+                restored_image_array = deconvolve_rgb(img_np)
+        if model_id != decision["requested_model_id"]:
+            # 더 저렴한 모델이나 Wiener 경로는 출력 배율이 다를 수 있으므로 요청 모델의 출력 크기에 맞춤
+            with timer.stage("postprocess"):
+                restored_image_array = resize_to_scale(restored_image_array, img_np.shape,
+                                                       model_upscale(decision["requested_model_id"]))
+        inference_seconds = time.perf_counter() - inference_start
+        router.observe(job, decision, inference_seconds)
+        if (job.get('parameters') or {}).get('allow_downgrade'):
+            # 예상 절감 시간과 함께 실제 추론 시간을 기록 (버퍼에서 위의 라우팅 기록과 병합됨)
+            write_buffer.update_job(job_id, {"routing_decision": {**decision, "actual_seconds": round(inference_seconds, 3)}})
+        progress.update(90, "upload", force=True)
+
+        # 5. 결과 인코딩 및 체크포인트
+        restored_filename = f"restored_{model_id}_{os.path.basename(blurred_image_path)}_{int(time.time())}.png"
+        restored_path = os.path.join(os.path.dirname(blurred_image_path), restored_filename)
+
+        with timer.stage("encode") as span:
+            output_io = python_io.BytesIO()
+            Image.fromarray(restored_image_array).save(output_io, format='PNG')
+            output_bytes = output_io.getvalue()
+            span["bytes"] = len(output_bytes)
+
+        # 결과를 업로드 전에 로컬 스풀에 체크포인트 (중단 시 재시작 후 추론 없이 업로드 재개)
+        # 벤치마크와 스풀에는 실제로 실행된 모델을 기록
+        routed_job = {**job, "model_id": model_id}
+        spool.save(routed_job, restored_path, output_bytes)
+
+        finalize_job(routed_job, restored_path, output_bytes, restored_image_array, timer.device, timer)
+        return f"[Job {job_id}] 성공적으로 완료 (소요 시간: {timer.total_ms() / 1000:.2f}초)"
+
+    except Exception as e:
+        # 8. 견고한 오류 처리
+        error_message = f"오류 발생: {type(e).__name__}: {str(e)}"
+        print(f"[Job {job_id}] 실패. {error_message}")
+
+        # 메모리 부족 오류 식별 (PyTorch MPS/CUDA에서 흔히 발생)
+        if isinstance(e, torch.cuda.OutOfMemoryError) or 'out of memory' in str(e).lower():
+            error_message = f"메모리 부족(OOM): {str(e)}"
+
+        if spool.has(job_id):
+            # 인코딩 후(업로드, 지표, DB 기록) 실패: 체크포인트를 유지하고 'processing' 상태로 두어 추론 없이 업로드를 재시도
+            print(f"[Job {job_id}] 결과 체크포인트를 유지합니다. 다음 배치 전에 업로드를 재시도합니다.")
+            raise
+
+        with timer.stage("db_update"):
+            write_buffer.update_job(job_id, {
+                "status": "failed",
+                "error_log": error_message,
+                "logs": timer.summary_lines(),
+            })
+
+        write_buffer.insert("job_stage_timings", timer.to_rows())
+        METRICS.inc("restoration_jobs_total", help_text="Processed restoration jobs", status="failed", model=str(job.get('model_id')))
+
+        # 예외를 다시 발생시켜 concurrent.futures가 인지하도록 함
+        raise
+
+# --- Main Batch Worker ---
+
+def main():
+    """배치 워커 메인 함수"""
+    # inter-op 스레드 수는 병렬 작업이 실행되기 전에만 설정 가능
+    configure_interop_threads(INTEROP_THREADS)
+
+    # 0. 모델 로드 및 워밍업, lane 구성이 끝난 뒤에만 준비 완료로 보고
+    clear_ready()
+    if METRICS_PORT:
+        start_metrics_server(METRICS_PORT)
+    readiness = load_restorers()
+    configure_lanes()
+    print(f"배치 워커 시작. (최대 동시 작업: {MAX_WORKERS}, 배치 크기: {BATCH_SIZE})")
+    mark_ready(readiness)
+    write_buffer.start()
+    signal.signal(signal.SIGTERM, handle_shutdown_signal)
+    signal.signal(signal.SIGINT, handle_shutdown_signal)
+    try:
+        # 강제 종료로 체크포인트 없이 남은 claim 작업을 반환
+        release_orphaned_claims()
+        # 프로세스가 살아 있는 동안 배치를 반복 처리하여 라우터의 부하 단계와 비용 보정 상태가 배치 간에 유지되도록 함
+        while not shutdown_requested.is_set():
+            # 이전 실행이나 이전 배치에서 업로드하지 못한 결과부터 재개
+            resume_spooled_jobs()
+            if shutdown_requested.is_set():
+                break
+            processed = run_batch()
+            if processed:
+                purge_flushed_checkpoints()
+                continue
+            if EXIT_WHEN_IDLE:
+                break
+            shutdown_requested.wait(POLL_INTERVAL)
+    finally:
+        # 종료 전에 버퍼에 남은 쓰기를 반드시 기록하고, DB 기록이 끝난 체크포인트를 정리
+        write_buffer.close()
+        if write_buffer.has_pending():
+            print("일부 DB 쓰기가 실패하여 스풀 체크포인트를 보존합니다. 다음 실행에서 재개됩니다.")
+        else:
+            spool.purge_finalized()
+            spool.clear_claims()
+        clear_ready()
+
+
+def purge_flushed_checkpoints():
+    """배치 사이에 버퍼를 flush 하고, 실패한 쓰기가 없으면 DB 기록이 끝난 체크포인트를 스풀에서 삭제합니다."""
+    write_buffer.flush()
+    if not write_buffer.has_pending():
+        spool.purge_finalized()
+        # 배치의 최종 상태가 모두 기록되었으므로 claim 기록도 정리
+        spool.clear_claims()
+
+
+def handle_shutdown_signal(signum, frame):
+    """
+    첫 신호: 진행 중인 작업만 마치고 나머지는 반환.
+    두 번째 신호: 아직 시작하지 않은 작업을 즉시 취소하여 반환. (실행 중인 작업은 스레드를 멈출 수 없으므로 완료를 기다림)
+    """
+    global shutdown_signal_count
+    shutdown_signal_count += 1
+    if shutdown_signal_count == 1:
+        print(f"\n종료 신호({signal.Signals(signum).name}) 수신: 진행 중인 작업을 마친 뒤 종료합니다. (대기 작업을 즉시 취소하려면 한 번 더)")
+        shutdown_requested.set()
+    elif shutdown_signal_count == 2:
+        raise KeyboardInterrupt
+    else:
+        print("실행 중인 작업이 끝나기를 기다리는 중입니다. 결과 기록 후 종료합니다.")
+
+
+def release_jobs(jobs: list, attempts: int = 3) -> bool:
+    """
+    처리하지 않은 작업을 'pending'으로 되돌려 다른 워커가 가져갈 수 있게 합니다.
+    (종료 직전 버퍼 flush가 실패하면 작업이 'processing'에 남으므로, claim과 마찬가지로 버퍼를 거치지 않고 즉시 기록)
+    아직 'processing'인 행만 되돌리므로 이미 완료·실패·취소된 작업을 다시 큐에 넣지 않습니다.
+    """
+    if not jobs:
+        return True
+    job_ids = [job['id'] for job in jobs]
+    for attempt in range(1, attempts + 1):
+        try:
+            supabase.table("restoration_jobs").update({"status": "pending"}) \
+                .in_("id", job_ids).eq("status", "processing").execute()
+            print(f"{len(jobs)}개의 작업을 'pending' 상태로 반환했습니다.")
+            return True
+        except Exception as e:
+            print(f"작업 반환 실패 ({attempt}/{attempts}): {e}")
+            time.sleep(attempt)
+    print(f"다음 작업은 'processing' 상태로 남았습니다. 수동으로 확인하세요: {job_ids}")
+    return False
+
+
+def release_orphaned_claims():
+    """
+    이전 실행이 강제 종료(SIGKILL, OOM)되어 claim 기록만 남은 작업 중 체크포인트가 없는 작업을 큐로 반환합니다.
+    체크포인트가 있는 작업은 resume_spooled_jobs()가 추론 없이 이어서 완료합니다.
+    """
+    orphaned = [job_id for job_id in spool.claims() if not spool.has(job_id)]
+    if orphaned:
+        print(f"이전 실행에서 완료되지 않은 claim 작업 {len(orphaned)}개를 반환합니다.")
+        if not release_jobs([{"id": job_id} for job_id in orphaned]):
+            return
+    spool.clear_claims(orphaned)
+
+
+def resume_spooled_jobs():
+    """스풀에 남은 체크포인트를 추론 없이 업로드하고 완료 처리합니다."""
+    manifests = spool.pending()
+    if manifests:
+        print(f"스풀에서 {len(manifests)}개의 미완료 결과를 재개합니다.")
+
+    for manifest in manifests:
+        job_id = manifest["job_id"]
+        if shutdown_requested.is_set():
+            break
+        try:
+            if manifest.get("finalized"):
+                # 완료 처리 후 flush 전에 중단되었을 수 있으므로 상태 변경만 다시 기록 (UPDATE는 멱등, insert는 재실행하지 않음)
+                write_buffer.update_job(job_id, manifest.get("completed_update") or
+                                        {"status": "completed", "restored_image_path": manifest["restored_path"]})
+                continue
+
+            output_bytes = spool.read(job_id)
+            restored_image_array = np.array(Image.open(python_io.BytesIO(output_bytes)).convert('RGB'))
+            restorer = RESTORERS.get(manifest.get("model_id"))
+            device = restorer.device if restorer is not None else torch.device("cpu")
+
+            job = {"id": job_id, "model_id": manifest.get("model_id"),
+                   "original_image_path": manifest.get("original_image_path")}
+            finalize_job(job, manifest["restored_path"], output_bytes, restored_image_array, device, JobTimer(job_id, device))
+            print(f"[Job {job_id}] 스풀에서 재개하여 완료했습니다.")
+        except Exception as e:
+            attempts = manifest.get("resume_attempts", 0) + 1
+            if attempts < SPOOL_MAX_RESUME_ATTEMPTS:
+                spool.mark(job_id, resume_attempts=attempts)
+                print(f"[Job {job_id}] 스풀 재개 실패 ({attempts}/{SPOOL_MAX_RESUME_ATTEMPTS}, 다음 배치 전에 재시도): {e}")
+                continue
+            print(f"[Job {job_id}] 스풀 재개를 {attempts}회 실패하여 작업을 실패 처리합니다: {e}")
+            write_buffer.update_job(job_id, {"status": "failed",
+                                             "error_log": f"결과 업로드 재시도 {attempts}회 실패: {type(e).__name__}: {e}"})
+            spool.remove(job_id)
+
+
+def update_routing_load(fallback_depth: int):
+    """대기 작업 수를 조회하여 라우터의 예상 대기 시간과 부하 단계를 갱신합니다."""
+    try:
+        response = supabase.table("restoration_jobs").select("id", count="exact").eq("status", "pending").limit(1).execute()
+        queue_depth = response.count if response.count is not None else fallback_depth
+    except Exception as e:
+        print(f"대기 작업 수 조회 실패 (후보 수로 대체): {e}")
+        queue_depth = fallback_depth
+    router.update_load(queue_depth, MAX_WORKERS)
+
+
+def run_batch() -> int:
+    """대기 중인 작업을 한 배치 가져와 병렬로 처리하고, 가져온 작업 수를 반환합니다."""
+    # 1. 오래된 순으로 후보 작업을 넉넉히 가져온 뒤, 스케줄러로 배치 크기만큼 선택 및 정렬
+    claim_start = time.perf_counter()
+    response = supabase.table("restoration_jobs").select("*").eq("status", "pending") \
+        .order("created_at").limit(SCHEDULER_LOOKAHEAD).execute()
+    jobs = scheduler.schedule(response.data, BATCH_SIZE)
+
+    if not jobs:
+        print("처리할 작업이 없습니다." if EXIT_WHEN_IDLE else f"처리할 작업이 없습니다. {POLL_INTERVAL:g}초 후 다시 확인합니다.")
+        return 0
+
+    print(f"{len(response.data)}개의 후보 중 {len(jobs)}개의 작업을 선택했습니다. 처리를 시작합니다.")
+    for job_class, stats in record_queue_waits(jobs).items():
+        print(f"  - 큐 대기 [{job_class}] {stats['jobs']}건: 평균 {stats['avg_wait_s']}초, 최대 {stats['max_wait_s']}초")
+
+    # 2. 가져온 작업들의 상태를 'processing'으로 일괄 변경
+    job_ids = [job['id'] for job in jobs]
+    # (claim은 다른 워커와의 중복 처리를 막아야 하므로 버퍼를 거치지 않고 즉시 기록)
+    supabase.table("restoration_jobs").update({"status": "processing"}).in_("id", job_ids).execute()
+    # 강제 종료되어도 재시작 시 반환할 수 있도록 claim 한 작업을 스풀에 기록
+    spool.record_claims(job_ids)
+    claim_ms = (time.perf_counter() - claim_start) * 1000
+    if ROUTING_ENABLED:
+        update_routing_load(len(response.data))
+
+    # 3. ThreadPoolExecutor를 사용하여 병렬 처리
+    # 각 작업 스레드는 시작 시 lane 하나에 고정되어 코어를 초과 할당하지 않음
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS, initializer=lane_initializer(LANE_PLAN))
+    # 스케줄러가 정한 순서대로 제출 (먼저 제출된 작업이 먼저 실행됨)
+    future_to_job = {executor.submit(process_job, job, claim_ms): job for job in jobs}
+    try:
+        for future in concurrent.futures.as_completed(future_to_job):
+            job = future_to_job[future]
+            try:
+                result = future.result()
+                print(result)
+            except Exception as exc:
+                # process_job 내부에서 이미 오류 처리 및 로깅을 수행함
+                # 여기서는 메인 스레드에 오류가 발생했음을 알리는 역할만 함
+                print(f"[Job {job['id']}] 최종 처리 실패. 상세 내용은 로그를 확인하세요.")
+    except KeyboardInterrupt:
+        # 두 번째 종료 신호: 실제로 취소된(시작되지 않은) 작업만 큐로 반환
+        cancelled = [job for future, job in future_to_job.items() if future.cancel()]
+        release_jobs(cancelled)
+        # 실행 중인 작업은 완료 후 버퍼에 결과를 기록하므로, 끝날 때까지 기다린 뒤에 main()에서 버퍼를 닫음
+        print(f"\n대기 중인 작업 {len(cancelled)}개를 취소했습니다. 실행 중인 작업이 끝나면 종료합니다.")
+        executor.shutdown(wait=True)
+        return len(jobs)
+    executor.shutdown(wait=True)
+
+    print("\n배치 작업이 완료되었습니다.")
+    return len(jobs)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+
+# benchmark_tool.py
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import itertools
+import concurrent.futures
+import multiprocessing
+
+import numpy as np
+from PIL import Image, ImageFilter
+import io as python_io
+import torch
+
+# 사용자 정의 모듈 (Supabase 클라이언트에 의존하지 않음)
+from inference_engine import ImageRestorer
+from model_registry import MODELS_CONFIG
+from deconvolution import deconvolve_image, WIENER_MODEL_ID
+from quality_metrics import calculate_metrics
+from local_storage import LocalStorageClient
+from job_telemetry import RssSampler
+
+# --- Configuration ---
+BENCH_STORAGE_ROOT = ".bench_storage"  # 로컬 스토리지 대체 디렉터리
+IMAGE_STORAGE_BUCKET = "images"
+DEFAULT_OUTPUT = "bench_results.json"
+WORKLOADS = ("inference", "wiener", "metrics")
+
+# 결과 비교 시 케이스를 식별하는 키
+CASE_KEYS = ("workload", "model", "resolution", "precision", "tile", "batch_size", "threads", "processes")
+
+# 프로세스별 로드된 모델 캐시 ((model_id, precision) -> ImageRestorer)
+_RESTORERS = {}
+
+# --- Synthetic Dataset ---
+
+def generate_synthetic_set(storage_root: str, resolutions: list, count: int, seed: int) -> dict:
+    """
+    해상도별로 원본/블러 이미지 쌍을 결정적으로 생성하여 로컬 스토리지에 저장합니다.
+    같은 seed로 생성하면 항상 같은 이미지 세트가 만들어집니다.
+    """
+    bucket = LocalStorageClient(storage_root).storage.from_(IMAGE_STORAGE_BUCKET)
+    rng = np.random.default_rng(seed)
+    dataset = {}
+
+    for res in resolutions:
+        yy, xx = np.mgrid[0:res, 0:res] / res
+        items = []
+        for i in range(count):
+            # 채널별로 다른 주파수의 그라디언트 + 고주파 텍스처
+            freqs = rng.uniform(1, 8, size=(3, 2))
+            channels = [np.sin(2 * np.pi * (fx * xx + fy * yy)) for fx, fy in freqs]
+            texture = rng.normal(0, 0.15, size=(res, res, 3))
+            original = np.clip((np.stack(channels, axis=-1) * 0.5 + 0.5) + texture, 0, 1)
+            original_pil = Image.fromarray((original * 255).astype(np.uint8))
+            blurred_pil = original_pil.filter(ImageFilter.GaussianBlur(radius=2))
+
+            paths = {"original": f"bench/{res}/original_{i}.png", "blurred": f"bench/{res}/blurred_{i}.png"}
+            for key, image in (("original", original_pil), ("blurred", blurred_pil)):
+                buffer = python_io.BytesIO()
+                image.save(buffer, format='PNG')
+                bucket.upload(path=paths[key], file=buffer.getvalue(),
+                              file_options={"content-type": "image/png", "upsert": "true"})
+            items.append(paths)
+        dataset[res] = items
+    return dataset
+
+# --- Measurement Helpers ---
+
+def _default_device() -> torch.device:
+    if torch.backends.mps.is_available() and torch.backends.mps.is_built():
+        return torch.device("mps")
+    return torch.device("cpu")
+
+
+def _get_restorer(model_id: str, precision: str, resolution: int) -> ImageRestorer:
+    """(model_id, precision) 조합의 모델을 로드하고 측정 해상도로 워밍업합니다."""
+    key = (model_id, precision)
+    if key not in _RESTORERS:
+        model_info = MODELS_CONFIG[model_id]
+        restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'],
+                                 checksum=model_info.get('sha256'))
+        restorer.set_precision(precision)
+        _RESTORERS[key] = restorer
+    restorer = _RESTORERS[key]
+    restorer.warmup(shapes=[(resolution, resolution)], iterations=1)
+    return restorer
+
+
+def _encode_png(image_array: np.ndarray) -> bytes:
+    buffer = python_io.BytesIO()
+    Image.fromarray(image_array).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+# --- Workloads ---
+
+def _run_unit(case: dict, restorer, bucket, batch: list) -> list:
+    """
+    한 단위(배치)의 작업을 실행하고 이미지별 지연 시간(ms)을 반환합니다.
+    배치 안의 이미지는 배치 전체가 끝나야 결과를 받으므로 모두 같은 지연 시간을 가집니다.
+    """
+    start = time.perf_counter()
+    workload = case["workload"]
+
+    if workload == "inference":
+        inputs = [bucket.download(path=item["blurred"]) for item in batch]
+        if len(inputs) > 1:
+            outputs = restorer.inference_batch(inputs)
+        else:
+            outputs = [restorer.inference(inputs[0], tile=case["tile"] or None)]
+        for item, output in zip(batch, outputs):
+            bucket.upload(path=f"bench/out/{case['model']}/{os.path.basename(item['blurred'])}",
+                          file=_encode_png(output), file_options={"content-type": "image/png", "upsert": "true"})
+
+    elif workload == "wiener":
+        for item in batch:
+            output = deconvolve_image(bucket.download(path=item["blurred"]))
+            bucket.upload(path=f"bench/out/{WIENER_MODEL_ID}/{os.path.basename(item['blurred'])}",
+                          file=_encode_png(output), file_options={"content-type": "image/png", "upsert": "true"})
+
+    elif workload == "metrics":
+        for item in batch:
+            original_bytes = bucket.download(path=item["original"])
+            # 블러 이미지를 복원 결과 대용으로 사용하여 지표 계산 비용만 측정
+            restored = np.array(Image.open(python_io.BytesIO(bucket.download(path=item["blurred"]))).convert('RGB'))
+            calculate_metrics(original_bytes, restored, _default_device())
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return [elapsed_ms] * len(batch)
+
+
+def run_case_local(case: dict, items: list, storage_root: str, barrier=None) -> dict:
+    """현재 프로세스에서 case['threads']개의 스레드로 items를 처리하고 측정값을 반환합니다."""
+    restorer = None
+    if case["workload"] == "inference":
+        restorer = _get_restorer(case["model"], case["precision"], case["resolution"])
+    bucket = LocalStorageClient(storage_root).storage.from_(IMAGE_STORAGE_BUCKET)
+    batches = [items[i:i + case["batch_size"]] for i in range(0, len(items), case["batch_size"])]
+
+    # 측정에서 제외되는 예열 실행 (파일 캐시, 지표 객체 초기화 등)
+    if batches:
+        _run_unit(case, restorer, bucket, batches[0])
+
+    # 다중 프로세스 측정 시 모든 프로세스가 준비된 뒤 동시에 시작
+    if barrier is not None:
+        barrier.wait()
+
+    with RssSampler() as sampler:
+        start = time.time()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=case["threads"]) as executor:
+            results = list(executor.map(lambda batch: _run_unit(case, restorer, bucket, batch), batches))
+        end = time.time()
+
+    return {
+        "latencies_ms": [latency for batch_latencies in results for latency in batch_latencies],
+        "start": start,
+        "end": end,
+        "peak_rss_mb": sampler.peak_mb,
+    }
+
+
+def _init_process(torch_threads: int):
+    if torch_threads:
+        torch.set_num_threads(torch_threads)
+
+
+def run_case(case: dict, items: list, storage_root: str, torch_threads: int) -> dict:
+    """케이스 하나를 실행하여 처리량, 지연 시간 분위수, 최대 RSS를 집계합니다."""
+    processes = case["processes"]
+    if processes == 1:
+        runs = [run_case_local(case, items, storage_root)]
+    else:
+        # 각 프로세스가 자신의 모델을 로드한 뒤 barrier에서 대기하므로 로드 시간은 측정에서 제외됨
+        chunks = [items[i::processes] for i in range(processes)]
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Manager() as manager:
+            barrier = manager.Barrier(processes)
+            with concurrent.futures.ProcessPoolExecutor(max_workers=processes, mp_context=ctx,
+                                                        initializer=_init_process, initargs=(torch_threads,)) as executor:
+                futures = [executor.submit(run_case_local, case, chunk, storage_root, barrier) for chunk in chunks]
+                runs = [future.result() for future in futures]
+
+    latencies = [latency for run in runs for latency in run["latencies_ms"]]
+    wall = max(run["end"] for run in runs) - min(run["start"] for run in runs)
+    return {
+        "case": case_id(case),
+        **case,
+        "images": len(latencies),
+        "wall_seconds": round(wall, 4),
+        "images_per_sec": round(len(latencies) / wall, 4) if wall > 0 else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        # 다중 프로세스인 경우 프로세스별 최대 RSS의 합 (호스트 전체 메모리 사용량 기준)
+        "peak_rss_mb": round(sum(run["peak_rss_mb"] for run in runs), 1),
+    }
+
+# --- Case Matrix ---
+
+def case_id(case: dict) -> str:
+    return "|".join(f"{key}={case[key]}" for key in CASE_KEYS)
+
+
+def build_cases(args) -> list:
+    """인자로 받은 조합을 펼쳐 실행할 케이스 목록을 만듭니다. 의미 없는 조합은 제외합니다."""
+    cases = []
+    for workload, resolution, threads, processes in itertools.product(
+            args.workloads, args.resolutions, args.threads, args.processes):
+        common = {"workload": workload, "resolution": resolution, "threads": threads, "processes": processes}
+        if workload == "inference":
+            for model, precision, tile, batch_size in itertools.product(
+                    args.models, args.precisions, args.tiles, args.batch_sizes):
+                # 배치 추론은 전체 이미지 단위로만 지원
+                if tile and batch_size > 1:
+                    continue
+                cases.append({**common, "model": model, "precision": precision, "tile": tile, "batch_size": batch_size})
+        else:
+            model = WIENER_MODEL_ID if workload == "wiener" else "-"
+            cases.append({**common, "model": model, "precision": "-", "tile": 0, "batch_size": 1})
+    return cases
+
+# --- Regression Comparison ---
+
+def compare_results(baseline: dict, current: dict, tolerance: float) -> list:
+    """
+    같은 케이스끼리 비교하여 처리량 감소, p95 지연 증가, 최대 RSS 증가가
+    tolerance 비율을 넘는 항목을 회귀로 보고합니다.
+    """
+    base_cases = {row["case"]: row for row in baseline["results"]}
+    regressions = []
+
+    print(f"\n--- 벤치마크 비교 (허용 오차: {tolerance:.0%}) ---")
+    for row in current["results"]:
+        base = base_cases.get(row["case"])
+        if base is None:
+            continue
+
+        checks = [
+            ("images_per_sec", row["images_per_sec"] < base["images_per_sec"] * (1 - tolerance)),
+            ("p95_ms", row["p95_ms"] > base["p95_ms"] * (1 + tolerance)),
+            ("peak_rss_mb", row["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance)),
+        ]
+        for metric, regressed in checks:
+            change = (row[metric] - base[metric]) / base[metric] if base[metric] else 0.0
+            status = "REGRESSION" if regressed else "ok"
+            print(f"[{status}] {row['case']} {metric}: {base[metric]} -> {row[metric]} ({change:+.1%})")
+            if regressed:
+                regressions.append({"case": row["case"], "metric": metric,
+                                    "baseline": base[metric], "current": row[metric], "change": change})
+
+    print(f"회귀 {len(regressions)}건 발견.")
+    return regressions
+
+# --- Command-line Interface ---
+
+def _write_report(path: str, report: dict, failures: list):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({**report, "failures": failures}, f, ensure_ascii=False, indent=4)
+
+
+def _int_list(value: str) -> list:
+    return [int(x.strip()) for x in value.split(',') if x.strip()]
+
+
+def _str_list(value: str) -> list:
+    return [x.strip() for x in value.split(',') if x.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="복원 파이프라인 처리량/지연 시간 벤치마크 도구")
+    parser.add_argument('--resolutions', type=_int_list, default=[128, 256, 512], help="입력 해상도 목록. 예: '128,256,512'")
+    parser.add_argument('--images', type=int, default=8, help="해상도별 합성 이미지 수")
+    parser.add_argument('--workloads', type=_str_list, default=list(WORKLOADS), help=f"실행할 워크로드 ({','.join(WORKLOADS)})")
+    parser.add_argument('--models', type=_str_list, default=list(MODELS_CONFIG), help="inference 워크로드에 사용할 model_id 목록")
+    parser.add_argument('--precisions', type=_str_list, default=['fp32'], help="추론 정밀도 목록. 예: 'fp32,bf16'")
+    parser.add_argument('--tiles', type=_int_list, default=[0], help="타일 크기 목록 (0은 타일링 없음)")
+    parser.add_argument('--batch-sizes', type=_int_list, default=[1], help="배치 크기 목록")
+    parser.add_argument('--threads', type=_int_list, default=[1], help="프로세스당 동시 처리 스레드 수 목록")
+    parser.add_argument('--processes', type=_int_list, default=[1], help="프로세스 수 목록")
+    parser.add_argument('--torch-threads', type=int, default=0, help="프로세스당 torch intra-op 스레드 수 (0은 기본값 유지)")
+    parser.add_argument('--seed', type=int, default=0, help="합성 이미지 생성 시드")
+    parser.add_argument('--storage-root', type=str, default=BENCH_STORAGE_ROOT, help="로컬 스토리지 대체 디렉터리")
+    parser.add_argument('--output', type=str, default=DEFAULT_OUTPUT, help="결과 JSON 파일 경로")
+    parser.add_argument('--baseline', type=str, help="실행 후 비교할 기준 결과 JSON 파일")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="회귀로 판단할 변화 비율 (기본 0.1 = 10%%)")
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'), help="벤치마크를 실행하지 않고 두 결과 파일만 비교")
+
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            baseline = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            current = json.load(f)
+        sys.exit(1 if compare_results(baseline, current, args.tolerance) else 0)
+
+    unknown = [workload for workload in args.workloads if workload not in WORKLOADS]
+    if unknown:
+        parser.error(f"알 수 없는 워크로드: {unknown}")
+
+    if args.torch_threads:
+        torch.set_num_threads(args.torch_threads)
+
+    print(f"합성 이미지 세트 생성 중... (해상도: {args.resolutions}, 해상도별 {args.images}장)")
+    dataset = generate_synthetic_set(args.storage_root, args.resolutions, args.images, args.seed)
+
+    cases = build_cases(args)
+    report = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "torch": torch.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "device": str(_default_device()),
+            "torch_threads": torch.get_num_threads(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("compare", "baseline")},
+        },
+        "results": [],
+    }
+    failures = []
+    for index, case in enumerate(cases, start=1):
+        print(f"[{index}/{len(cases)}] {case_id(case)}")
+        try:
+            result = run_case(case, dataset[case["resolution"]], args.storage_root, args.torch_threads)
+        except Exception as e:
+            # 한 케이스의 실패로 이미 측정한 케이스들을 잃지 않도록 기록하고 다음 케이스로 진행
+            print(f"  -> 실패: {type(e).__name__}: {e}")
+            failures.append({"case": case_id(case), "error": f"{type(e).__name__}: {e}"})
+            continue
+        print(f"  -> {result['images_per_sec']} img/s, p50={result['p50_ms']}ms, p95={result['p95_ms']}ms, peak RSS={result['peak_rss_mb']}MB")
+        report["results"].append(result)
+        # 케이스마다 결과 파일을 갱신하여 중간에 중단되어도 완료된 측정값이 남도록 함
+        _write_report(args.output, report, failures)
+    _write_report(args.output, report, failures)
+    print(f"\n벤치마크 결과가 '{args.output}' 파일로 저장되었습니다.")
+    if failures:
+        print(f"실패한 케이스 {len(failures)}건: " + ", ".join(failure["case"] for failure in failures))
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if compare_results(baseline, report, args.tolerance):
+            sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+
+# cpu_topology.py
+
+import os
+import glob
+import time
+import threading
+import itertools
+import argparse
+import concurrent.futures
+
+import torch
+
+# 추론 lane: 하나의 작업 스레드와 그 스레드가 사용하는 intra-op 스레드 수, 고정할 CPU 집합
+# 배치 방식 - "numa": NUMA 노드 단위로 lane을 나눠 노드 안의 코어에 고정
+#            "cores": 노드 구분 없이 사용 가능한 코어를 연속 구간으로 나눠 고정
+#            "none": 스레드 수만 제한하고 고정하지 않음
+PLACEMENTS = ("numa", "cores", "none")
+NUMA_SYSFS = "/sys/devices/system/node"
+
+# --- Topology Detection ---
+
+def parse_cpulist(text: str) -> list:
+    """'0-3,8-11' 형태의 sysfs cpulist를 CPU 번호 목록으로 변환합니다."""
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cpus.extend(range(int(start), int(end) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def available_cpus() -> list:
+    """현재 프로세스가 사용할 수 있는 CPU 목록 (컨테이너 cpuset 반영)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def numa_nodes() -> dict:
+    """NUMA 노드별 사용 가능한 CPU 목록을 반환합니다. sysfs가 없으면 단일 노드로 간주합니다."""
+    allowed = set(available_cpus())
+    nodes = {}
+    for path in sorted(glob.glob(os.path.join(NUMA_SYSFS, "node[0-9]*"))):
+        try:
+            with open(os.path.join(path, "cpulist")) as f:
+                cpus = [cpu for cpu in parse_cpulist(f.read()) if cpu in allowed]
+        except OSError:
+            continue
+        if cpus:
+            nodes[int(os.path.basename(path)[4:])] = cpus
+    return nodes or {0: sorted(allowed)}
+
+# --- Lane Planning ---
+
+def _split(cpus: list, parts: int) -> list:
+    """CPU 목록을 parts개의 연속 구간으로 최대한 균등하게 나눕니다."""
+    size, extra = divmod(len(cpus), parts)
+    chunks, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(cpus[start:end])
+        start = end
+    return chunks
+
+
+def plan_lanes(lanes: int, threads_per_lane: int = None, placement: str = "numa") -> list:
+    """
+    lane 수와 배치 방식에 따라 lane별 CPU 집합과 intra-op 스레드 수를 계획합니다.
+    threads_per_lane을 생략하면 lane에 배정된 코어 수를 사용하여 코어를 초과 할당하지 않습니다.
+    """
+    if placement not in PLACEMENTS:
+        raise ValueError(f"알 수 없는 CPU 배치 방식: '{placement}' (지원: {PLACEMENTS})")
+    cpus = available_cpus()
+    lanes = max(1, min(lanes, len(cpus)))
+
+    if placement == "numa":
+        nodes = list(numa_nodes().values())
+        if lanes < len(nodes):
+            # lane이 노드보다 적으면 lane마다 노드 여러 개를 통째로 배정
+            cpu_sets = [sum((nodes[j] for j in range(i, len(nodes), lanes)), []) for i in range(lanes)]
+        else:
+            # lane을 노드에 라운드 로빈으로 배정한 뒤, 노드 안의 코어를 배정된 lane끼리 나눔
+            per_node = [len(range(i, lanes, len(nodes))) for i in range(len(nodes))]
+            node_chunks = [_split(node_cpus, count) for node_cpus, count in zip(nodes, per_node)]
+            cpu_sets = [node_chunks[i % len(nodes)][i // len(nodes)] for i in range(lanes)]
+    elif placement == "cores":
+        cpu_sets = _split(cpus, lanes)
+    else:
+        cpu_sets = [None] * lanes
+
+    plan = []
+    for index, cpu_set in enumerate(cpu_sets):
+        cores = len(cpu_set) if cpu_set else max(len(cpus) // lanes, 1)
+        plan.append({"lane": index, "cpus": cpu_set, "threads": threads_per_lane or cores})
+    return plan
+
+
+def configure_interop_threads(threads: int):
+    """inter-op 스레드 수를 설정합니다. 병렬 작업이 한 번이라도 실행된 뒤에는 변경할 수 없으므로 실패 시 무시합니다."""
+    if not threads:
+        return
+    try:
+        torch.set_num_interop_threads(threads)
+    except RuntimeError as e:
+        print(f"[CPU] inter-op 스레드 수를 설정할 수 없습니다 (이미 초기화됨): {e}")
+
+
+def lane_initializer(plan: list):
+    """
+    ThreadPoolExecutor의 initializer로 사용할 함수를 반환합니다.
+    각 작업 스레드는 처음 시작될 때 lane 하나를 배정받아 자신의 CPU 집합에 고정되고 intra-op 스레드 수를 설정합니다.
+    (OpenMP 스레드 수와 affinity는 호출한 스레드 기준이며, 이후 생성되는 OpenMP 워커 스레드가 이를 상속합니다.)
+    """
+    counter = itertools.count()
+    lock = threading.Lock()
+
+    def initializer():
+        with lock:
+            lane = plan[next(counter) % len(plan)]
+        if lane["cpus"] and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, lane["cpus"])
+        # ATen은 새 스레드의 첫 병렬 연산에서 lazy_init_num_threads()로 프로세스 전역의 마지막 set_num_threads 값을 적용하므로,
+        # get_num_threads()로 지연 초기화를 먼저 끝낸 뒤 이 lane의 값을 설정해야 다른 lane의 설정에 덮어쓰이지 않음
+        torch.get_num_threads()
+        torch.set_num_threads(lane["threads"])
+
+    return initializer
+
+
+def describe_plan(plan: list) -> list:
+    lines = []
+    for lane in plan:
+        cpus = lane["cpus"]
+        placement = f"CPU {cpus[0]}-{cpus[-1]} ({len(cpus)}개)" if cpus else "고정 없음"
+        lines.append(f"lane {lane['lane']}: intra-op {lane['threads']} 스레드, {placement}")
+    return lines
+
+# --- Calibration ---
+
+def candidate_lane_counts(max_lanes: int = 16) -> list:
+    """보정 대상 lane 수: 1, 2, 4, ... 와 NUMA 노드 수 (사용 가능한 코어 수 이하)"""
+    cpus = len(available_cpus())
+    counts = {len(numa_nodes())}
+    lanes = 1
+    while lanes <= min(cpus, max_lanes):
+        counts.add(lanes)
+        lanes *= 2
+    return sorted(counts)
+
+
+def calibrate_lanes(run_once, placement: str = "numa", lane_counts: list = None, rounds: int = 3) -> tuple:
+    """
+    lane 수 후보별로 run_once를 lane마다 rounds번씩 동시에 실행하여 처리량(회/초)을 측정하고,
+    처리량이 가장 높은 계획과 후보별 측정 결과를 반환합니다.
+    """
+    results = []
+    best_plan, best_throughput = None, -1.0
+    for lanes in lane_counts or candidate_lane_counts():
+        plan = plan_lanes(lanes, placement=placement)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(plan), initializer=lane_initializer(plan)) as executor:
+            # 스레드 생성과 lane 초기화를 측정에서 제외하기 위해 한 번씩 먼저 실행
+            list(executor.map(lambda _: run_once(), range(len(plan))))
+            start = time.perf_counter()
+            list(executor.map(lambda _: run_once(), range(len(plan) * rounds)))
+            elapsed = time.perf_counter() - start
+
+        throughput = len(plan) * rounds / elapsed
+        results.append({"lanes": len(plan), "threads_per_lane": plan[0]["threads"], "throughput": round(throughput, 3)})
+        if throughput > best_throughput:
+            best_plan, best_throughput = plan, throughput
+    return best_plan, results
+
+# --- Command-line Interface ---
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU 토폴로지와 추론 lane 계획 출력")
+    parser.add_argument('--lanes', type=int, default=len(numa_nodes()), help="lane 수 (기본값: NUMA 노드 수)")
+    parser.add_argument('--threads-per-lane', type=int, default=None, help="lane별 intra-op 스레드 수")
+    parser.add_argument('--placement', choices=PLACEMENTS, default="numa", help="lane 배치 방식")
+    args = parser.parse_args()
+
+    for node, cpus in numa_nodes().items():
+        print(f"NUMA 노드 {node}: CPU {len(cpus)}개 ({cpus[0]}-{cpus[-1]})")
+    for line in describe_plan(plan_lanes(args.lanes, args.threads_per_lane, args.placement)):
+        print(f"  {line}")
+
+if __name__ == "__main__":
+    main()
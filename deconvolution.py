@@ -0,0 +1,58 @@
+
+# deconvolution.py
+
+import io as python_io
+
+import numpy as np
+from PIL import Image
+from skimage import color, restoration, img_as_float
+
+# model_benchmarks 테이블에 기록되는 Wiener 경로의 모델 이름
+WIENER_MODEL_ID = "wiener_deconvolution_v1"
+# 라우팅으로 SR 모델 대신 사용되는 채널별 Wiener 경로 (요청 배율로 확대된 RGB 결과이므로 흑백 1배 결과와 구분하여 기록)
+WIENER_RGB_MODEL_ID = "wiener_deconvolution_rgb_v1"
+
+# --- Image Processing Functions ---
+
+def deconvolve_image(image_bytes: bytes) -> np.ndarray:
+    """
+    Wiener deconvolution을 사용하여 이미지의 블러를 제거합니다.
+    """
+    # 바이트 데이터를 numpy 배열로 읽기 (skimage.io.imread는 bytes를 받지 않으므로 PIL로 디코딩)
+    image = np.array(Image.open(python_io.BytesIO(image_bytes)).convert('RGB'))
+    return deconvolve_array(image)
+
+
+def deconvolve_array(image: np.ndarray) -> np.ndarray:
+    """
+    이미 디코딩된 이미지 배열에 Wiener deconvolution을 적용합니다. (비교 작업에서 디코딩 결과를 공유)
+    """
+    # 컬러 이미지인 경우 흑백으로 변환하여 처리
+    if image.ndim == 3:
+        image_gray = color.rgb2gray(image)
+    else:
+        image_gray = image
+
+    # PSF(Point Spread Function) 추정. 실제 환경에서는 더 정교한 추정이 필요.
+    # 여기서는 간단한 가우시안 커널을 가정합니다.
+    psf = np.ones((5, 5)) / 25  # 5x5 평균 필터
+
+    # Wiener deconvolution 적용
+    # 'balance' 파라미터는 노이즈와 디블러링 사이의 균형을 조절합니다.
+    deconvolved_image = restoration.wiener(image_gray, psf, 1.1, clip=True)
+
+    # 0-255 범위의 8비트 이미지로 변환
+    deconvolved_image_uint8 = (np.clip(deconvolved_image, 0, 1) * 255).astype(np.uint8)
+
+    return deconvolved_image_uint8
+
+
+def deconvolve_rgb(image: np.ndarray) -> np.ndarray:
+    """
+    채널별로 Wiener deconvolution을 적용하여 컬러를 유지한 HWC uint8 결과를 반환합니다.
+    (라우팅으로 SR 모델 대신 사용될 때 흑백이 아닌 같은 종류의 이미지를 돌려주기 위함)
+    """
+    if image.ndim == 2:
+        image = np.stack([image] * 3, axis=2)
+    image = img_as_float(image[..., :3])
+    return np.stack([deconvolve_array(image[..., c]) for c in range(3)], axis=2)
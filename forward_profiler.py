@@ -0,0 +1,146 @@
+
+# forward_profiler.py
+
+import os
+import json
+import time
+import random
+import argparse
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+import torch
+from torch.profiler import profile, ProfilerActivity
+
+from job_telemetry import METRICS
+
+DEFAULT_TRACE_DIR = "profiles"
+SUMMARY_FILENAME = "summary.json"
+
+# --- Sampled Forward-pass Profiler ---
+
+class ForwardProfiler:
+    """
+    샘플링된 일부 forward 호출에 대해서만 torch profiler 트레이스를 수집합니다.
+    낮은 sample_rate와 최소 간격/최대 트레이스 수 제한으로 운영 환경에서도 상시 켜둘 수 있습니다.
+    """
+    def __init__(self, trace_dir: str = DEFAULT_TRACE_DIR, sample_rate: float = 0.01,
+                 max_traces_per_model: int = 50, min_interval_seconds: float = 30.0,
+                 profile_memory: bool = True, record_shapes: bool = False, top_k: int = 20):
+        self.trace_dir = trace_dir
+        self.sample_rate = sample_rate
+        self.max_traces_per_model = max_traces_per_model
+        self.min_interval_seconds = min_interval_seconds
+        self.profile_memory = profile_memory
+        self.record_shapes = record_shapes
+        self.top_k = top_k
+
+        self.activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            self.activities.append(ProfilerActivity.CUDA)
+
+        # torch profiler는 프로세스당 하나만 활성화할 수 있으므로 동시 프로파일링을 막음
+        self._active = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._trace_counts = defaultdict(int)
+        self._last_sampled = defaultdict(float)
+        self._op_totals = defaultdict(dict)  # model_id -> op 이름 -> 누적 통계
+
+    def _should_sample(self, model_id: str) -> bool:
+        with self._state_lock:
+            if self.sample_rate <= 0 or self._trace_counts[model_id] >= self.max_traces_per_model:
+                return False
+            if time.time() - self._last_sampled[model_id] < self.min_interval_seconds:
+                return False
+            if random.random() >= self.sample_rate:
+                return False
+            self._last_sampled[model_id] = time.time()
+            return True
+
+    @contextmanager
+    def maybe_profile(self, model_id: str, tag: str = ""):
+        """샘플링에 당첨된 경우에만 with 블록을 프로파일링하고 트레이스와 요약을 저장합니다."""
+        if not self._should_sample(model_id) or not self._active.acquire(blocking=False):
+            yield None
+            return
+
+        try:
+            start = time.perf_counter()
+            with profile(activities=self.activities, profile_memory=self.profile_memory,
+                         record_shapes=self.record_shapes) as prof:
+                yield prof
+            profiled_ms = (time.perf_counter() - start) * 1000
+            self._save(model_id, tag, prof, profiled_ms)
+        finally:
+            self._active.release()
+
+    def _save(self, model_id: str, tag: str, prof, profiled_ms: float):
+        """Chrome 트레이스 파일을 쓰고 연산자별 누적 통계를 갱신합니다."""
+        model_dir = os.path.join(self.trace_dir, model_id)
+        os.makedirs(model_dir, exist_ok=True)
+        suffix = f"_{tag}" if tag else ""
+        trace_path = os.path.join(model_dir, f"trace_{int(time.time() * 1000)}{suffix}.json")
+        prof.export_chrome_trace(trace_path)
+
+        with self._state_lock:
+            self._trace_counts[model_id] += 1
+            totals = self._op_totals[model_id]
+            for evt in prof.key_averages():
+                op = totals.setdefault(evt.key, {"calls": 0, "self_cpu_ms": 0.0, "cpu_total_ms": 0.0, "self_cpu_memory_mb": 0.0})
+                op["calls"] += evt.count
+                op["self_cpu_ms"] += evt.self_cpu_time_total / 1000
+                op["cpu_total_ms"] += evt.cpu_time_total / 1000
+                op["self_cpu_memory_mb"] += evt.self_cpu_memory_usage / (1024 * 1024)
+            summary = self._summary_locked(model_id)
+
+        with open(os.path.join(model_dir, SUMMARY_FILENAME), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        METRICS.inc("restoration_profiler_traces_total", help_text="Profiler traces captured", model=model_id)
+        METRICS.observe("restoration_profiled_forward_seconds", profiled_ms / 1000,
+                        "Wall time of profiled forward passes (includes profiler overhead)", model=model_id)
+        print(f"[Profiler] {model_id} 트레이스 저장: {trace_path} ({profiled_ms:.1f}ms)")
+
+    def _summary_locked(self, model_id: str) -> dict:
+        ops = sorted(self._op_totals[model_id].items(), key=lambda item: item[1]["self_cpu_ms"], reverse=True)
+        return {
+            "model_id": model_id,
+            "traces": self._trace_counts[model_id],
+            "top_operators": [{"op": name, **{k: round(v, 3) for k, v in stats.items()}} for name, stats in ops[:self.top_k]],
+        }
+
+    def summary(self, model_id: str) -> dict:
+        """모델별 누적 상위 연산자(self CPU 시간 기준) 요약을 반환합니다."""
+        with self._state_lock:
+            return self._summary_locked(model_id)
+
+# --- Command-line Interface ---
+
+def print_summaries(trace_dir: str, top: int):
+    """trace_dir 아래 모델별 summary.json을 읽어 상위 연산자를 출력합니다."""
+    if not os.path.isdir(trace_dir):
+        print(f"프로파일 디렉터리를 찾을 수 없습니다: {trace_dir}")
+        return
+
+    for model_id in sorted(os.listdir(trace_dir)):
+        summary_path = os.path.join(trace_dir, model_id, SUMMARY_FILENAME)
+        if not os.path.exists(summary_path):
+            continue
+        with open(summary_path, encoding='utf-8') as f:
+            summary = json.load(f)
+
+        print(f"\n모델: {model_id} (트레이스 {summary['traces']}개)")
+        for op in summary["top_operators"][:top]:
+            print(f"  {op['op']:<40} self CPU {op['self_cpu_ms']:>10.2f}ms  calls {op['calls']:>7}  mem {op['self_cpu_memory_mb']:>8.2f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="수집된 forward 프로파일 요약 출력 도구")
+    parser.add_argument('--trace-dir', type=str, default=DEFAULT_TRACE_DIR, help="트레이스가 저장된 디렉터리")
+    parser.add_argument('--top', type=int, default=10, help="모델별로 출력할 상위 연산자 수")
+    args = parser.parse_args()
+    print_summaries(args.trace_dir, args.top)
+
+if __name__ == "__main__":
+    main()
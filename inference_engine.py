@@ -1,10 +1,15 @@
 
 # inference_engine.py
 
+import time
+import contextlib
 import torch
 import numpy as np
 from PIL import Image
 import io
+import os
+
+from weight_format import mmap_weights_path, load_state_dict_mmap
 
 # SwinIR 모델 아키텍처를 동적으로 로드
 # 이 파일이 실행되기 전에 models/network_swinir.py 파일이 있어야 합니다.
@@ -13,21 +18,51 @@ try:
 except ImportError:
     raise ImportError("SwinIR 모델 파일을 찾을 수 없습니다. 'models/network_swinir.py' 경로에 파일이 있는지 확인하세요.")
 
+# 워밍업 시 사용할 대표 입력 크기 (H, W). 모델 설정의 'warmup_shapes'로 덮어쓸 수 있습니다.
+DEFAULT_WARMUP_SHAPES = [(64, 64), (256, 256)]
+
+# 지원하는 추론 정밀도
+PRECISIONS = {"fp32": torch.float32, "fp16": torch.float16, "bf16": torch.bfloat16}
+
+
+def _timed(timer, name: str):
+    """timer(JobTimer)가 주어지면 단계 측정 컨텍스트를, 아니면 빈 컨텍스트를 반환"""
+    return timer.stage(name) if timer is not None else contextlib.nullcontext({})
+
 class ImageRestorer:
     """
     PyTorch 기반 AI 모델을 로드하고 이미지 복원 추론을 수행하는 클래스.
     MPS (Apple Silicon GPU) 가속을 지원합니다.
     """
-    def __init__(self, model_path: str, model_config: dict):
+    def __init__(self, model_path: str, model_config: dict, checksum: str = None):
         self.device = self._get_device()
         print(f"Using device: {self.device}")
 
-        self.model = self._load_model(model_config)
-        self._load_weights(model_path)
+        # CPU에서 메모리 매핑으로 로드할 때는 meta 디바이스에서 모델을 구성하여
+        # 곧 파일 페이지로 교체될(assign) 무작위 초기 가중치를 할당하지 않음
+        on_meta = self.device.type == "cpu" and os.path.exists(mmap_weights_path(model_path))
+        with torch.device("meta") if on_meta else contextlib.nullcontext():
+            self.model = self._load_model(model_config)
+        self._load_weights(model_path, checksum)
         
-        self.scale = model_config.get('scale', 1)
+        # 'scale'이 없으면 모델 구성의 'upscale'을 출력 배율로 사용
+        self.scale = model_config.get('scale', model_config.get('upscale', 1))
         self.window_size = model_config.get('window_size', 8)
 
+        # 타일 추론 설정: tile이 None이면 전체 이미지를 한 번에 추론
+        self.tile = model_config.get('tile')
+        self.tile_overlap = model_config.get('tile_overlap', 32)
+
+        self.set_precision(model_config.get('precision', 'fp32'))
+
+        # 선택적 프로파일링 (enable_profiling()으로 활성화)
+        self.profiler = None
+        self.model_id = None
+
+        # 워밍업 상태: warmup()이 끝나기 전까지는 준비되지 않은 것으로 간주
+        self.is_ready = False
+        self.warmup_stats = []
+
     def _get_device(self) -> torch.device:
         """사용 가능한 최적의 디바이스를 선택 (MPS > CPU)"""
         if torch.backends.mps.is_available() and torch.backends.mps.is_built():
@@ -52,8 +87,16 @@ class ImageRestorer:
         )
         return model
 
-    def _load_weights(self, model_path: str):
-        """사전 훈련된 가중치 로드"""
+    def _load_weights(self, model_path: str, checksum: str = None):
+        """
+        사전 훈련된 가중치 로드.
+        변환된 플랫 파일(weight_format.py)이 있으면 메모리 매핑으로 로드하고, 없으면 .pth를 torch.load로 읽습니다.
+        """
+        flat_path = mmap_weights_path(model_path)
+        if os.path.exists(flat_path):
+            self._load_weights_mmap(flat_path, checksum)
+            return
+
         try:
             # MPS 디바이스로 직접 로드 시 발생하는 이슈를 피하기 위해 CPU로 먼저 로드
             pretrained_model = torch.load(model_path, map_location=torch.device('cpu'))
@@ -72,35 +115,203 @@ class ImageRestorer:
         except Exception as e:
             raise IOError(f"모델 가중치 파일 로드 실패: {model_path}. 오류: {e}")
 
-    def inference(self, image_bytes: bytes) -> np.ndarray:
+    def _load_weights_mmap(self, flat_path: str, checksum: str = None):
         """
-        입력 이미지 바이트에 대해 복원 추론을 수행합니다.
+        메모리 매핑된 플랫 파일에서 가중치를 로드합니다.
+        CPU에서는 파라미터가 파일 페이지를 직접 가리키므로(assign) 복사 없이 프로세스 간 페이지가 공유됩니다.
         """
-        # 1. 이미지 전처리
-        img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-        img_np = np.array(img)
-        
-        img_lq = img_np.astype(np.float32) / 255.
-        img_lq = np.transpose(img_lq, (2, 0, 1))  # HWC -> CHW
-        img_lq = torch.from_numpy(img_lq).float().unsqueeze(0).to(self.device)  # Add batch dim and send to device
+        try:
+            state_dict = load_state_dict_mmap(flat_path, expected_sha256=checksum)
+            if self.device.type == "cpu":
+                self.model.load_state_dict(state_dict, strict=True, assign=True)
+                # state_dict에 없는 비영속 버퍼가 meta에 남아 있으면 추론이 불가능하므로 여기서 실패 처리
+                leftover = [name for name, buf in self.model.named_buffers() if buf.is_meta]
+                if leftover:
+                    raise ValueError(f"가중치 파일에 없는 버퍼: {leftover}")
+            else:
+                # 가속기로 옮길 때는 어차피 복사가 일어나므로 일반 로드 후 이동
+                self.model.load_state_dict(state_dict, strict=True)
 
-        # 2. 추론 수행
-        with torch.no_grad():
-            # 타일링 처리: window_size에 맞게 이미지를 패딩
+            self.model.eval()
+            self.model = self.model.to(self.device)
+            print(f"'{flat_path}' 에서 모델 가중치를 메모리 매핑으로 로드했습니다.")
+        except Exception as e:
+            raise IOError(f"모델 가중치 파일 로드 실패: {flat_path}. 오류: {e}")
+
+    def set_precision(self, precision: str):
+        """모델 가중치와 입력 텐서의 정밀도를 변경합니다. ('fp32', 'fp16', 'bf16')"""
+        if precision not in PRECISIONS:
+            raise ValueError(f"지원되지 않는 정밀도: '{precision}' (가능한 값: {list(PRECISIONS)})")
+        self.precision = precision
+        self.dtype = PRECISIONS[precision]
+        self.model = self.model.to(dtype=self.dtype)
+
+    def enable_profiling(self, profiler, model_id: str):
+        """
+        ForwardProfiler를 연결하여 샘플링된 추론 호출의 연산자 단위 트레이스를 수집합니다.
+        """
+        self.profiler = profiler
+        self.model_id = model_id
+
+    def _profiled(self, tag: str = ""):
+        """프로파일러가 연결되어 있으면 샘플링 컨텍스트를, 아니면 빈 컨텍스트를 반환"""
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.maybe_profile(self.model_id, tag)
+
+    def _synchronize(self):
+        """비동기 디바이스 연산이 끝날 때까지 대기 (정확한 지연 시간 측정용)"""
+        if self.device.type == "mps":
+            torch.mps.synchronize()
+        elif self.device.type == "cuda":
+            torch.cuda.synchronize()
+
+    def _forward(self, img_lq: torch.Tensor, timer=None) -> torch.Tensor:
+        """window_size에 맞게 패딩한 뒤 모델을 실행하고 패딩을 제거합니다."""
+        with _timed(timer, "pad"):
+            img_lq = img_lq.to(self.dtype)
             _, _, h_old, w_old = img_lq.size()
             h_pad = (h_old // self.window_size + 1) * self.window_size - h_old
             w_pad = (w_old // self.window_size + 1) * self.window_size - w_old
             img_lq = torch.cat([img_lq, torch.flip(img_lq, [2])], 2)[:, :, :h_old + h_pad, :]
             img_lq = torch.cat([img_lq, torch.flip(img_lq, [3])], 3)[:, :, :, :w_old + w_pad]
 
+        with _timed(timer, "forward"):
             output = self.model(img_lq)
-            
-            # 패딩 제거
-            output = output[..., :h_old * self.scale, :w_old * self.scale]
+            if timer is not None:
+                # 비동기 디바이스에서 forward 시간이 후처리 단계로 넘어가지 않도록 동기화
+                self._synchronize()
+
+        # 패딩 제거
+        return output[..., :h_old * self.scale, :w_old * self.scale]
 
-        # 3. 결과 후처리
+    def warmup(self, shapes=None, iterations: int = 2) -> list:
+        """
+        대표 입력 크기로 더미 추론을 실행하여 메모리 할당기 확장, 커널 선택 등
+        첫 호출의 콜드 스타트 비용을 실제 작업 전에 미리 지불합니다.
+        입력 크기별 콜드(첫 호출)/웜(이후 호출 평균) 지연 시간(ms)을 반환합니다.
+        """
+        shapes = shapes or DEFAULT_WARMUP_SHAPES
+        stats = []
+        with torch.no_grad():
+            for h, w in shapes:
+                dummy = torch.rand(1, 3, h, w, device=self.device)
+                latencies = []
+                for _ in range(1 + max(iterations, 1)):
+                    start = time.perf_counter()
+                    self._forward(dummy)
+                    self._synchronize()
+                    latencies.append((time.perf_counter() - start) * 1000)
+                stats.append({
+                    "shape": [h, w],
+                    "cold_ms": latencies[0],
+                    "warm_ms": sum(latencies[1:]) / len(latencies[1:]),
+                })
+
+        self.warmup_stats = stats
+        self.is_ready = True
+        return stats
+
+    def _forward_tiled(self, img_lq: torch.Tensor, tile: int, timer=None, progress_callback=None) -> torch.Tensor:
+        """
+        이미지를 겹치는 타일로 나누어 추론한 뒤, 겹친 영역은 평균을 내어 합칩니다.
+        모델 활성화 메모리가 전체 이미지가 아닌 타일 크기에 비례합니다.
+        progress_callback(done, total)은 타일 하나가 끝날 때마다 호출됩니다.
+        """
+        b, c, h, w = img_lq.size()
+        tile = min(tile, h, w)
+        stride = max(tile - self.tile_overlap, 1)
+        h_idx_list = list(range(0, h - tile, stride)) + [h - tile]
+        w_idx_list = list(range(0, w - tile, stride)) + [w - tile]
+
+        sf = self.scale
+        E = torch.zeros(b, c, h * sf, w * sf, dtype=torch.float32, device=img_lq.device)
+        W = torch.zeros_like(E)
+
+        total = len(h_idx_list) * len(w_idx_list)
+        done = 0
+        with _timed(timer, "forward"):
+            for h_idx in h_idx_list:
+                for w_idx in w_idx_list:
+                    in_patch = img_lq[..., h_idx:h_idx + tile, w_idx:w_idx + tile]
+                    out_patch = self._forward(in_patch).float()
+                    E[..., h_idx * sf:(h_idx + tile) * sf, w_idx * sf:(w_idx + tile) * sf].add_(out_patch)
+                    W[..., h_idx * sf:(h_idx + tile) * sf, w_idx * sf:(w_idx + tile) * sf].add_(1)
+                    done += 1
+                    if progress_callback is not None:
+                        progress_callback(done, total)
+            if timer is not None:
+                self._synchronize()
+
+        return E.div_(W)
+
+    def _to_tensor(self, img_np: np.ndarray) -> torch.Tensor:
+        """HWC uint8 RGB 배열을 NCHW [0, 1] 텐서로 변환하여 디바이스로 보냅니다."""
+        img_lq = img_np.astype(np.float32) / 255.
+        img_lq = np.transpose(img_lq, (2, 0, 1))  # HWC -> CHW
+        return torch.from_numpy(img_lq).float().unsqueeze(0).to(self.device)  # Add batch dim and send to device
+
+    def _to_uint8(self, output: torch.Tensor) -> np.ndarray:
+        """CHW [0, 1] 출력 텐서를 HWC uint8 배열로 변환합니다."""
         output = output.data.squeeze().float().cpu().clamp_(0, 1).numpy()
         output = np.transpose(output, (1, 2, 0))  # CHW -> HWC
-        output = (output * 255.0).round().astype(np.uint8)
+        return (output * 255.0).round().astype(np.uint8)
+
+    def _restore_tensor(self, img_lq: torch.Tensor, timer=None, tile: int = None, progress_callback=None) -> np.ndarray:
+        """전처리된 입력 텐서를 추론하고 uint8 배열로 후처리합니다."""
+        tile = tile if tile is not None else self.tile
+        with torch.no_grad(), self._profiled(f"tile{tile}" if tile else "full"):
+            if tile:
+                output = self._forward_tiled(img_lq, tile, timer, progress_callback)
+            else:
+                output = self._forward(img_lq, timer)
 
+        with _timed(timer, "postprocess") as span:
+            output = self._to_uint8(output)
+            span["bytes"] = output.nbytes
         return output
+
+    def inference(self, image_bytes: bytes, timer=None, tile: int = None, progress_callback=None) -> np.ndarray:
+        """
+        입력 이미지 바이트에 대해 복원 추론을 수행합니다.
+        timer(JobTimer)를 넘기면 decode/pad/forward/postprocess 단계 시간이 기록됩니다.
+        tile을 지정하면 (기본값: 모델 설정의 'tile') 타일 단위로 추론하며, progress_callback(done, total)으로 진행률을 알립니다.
+        """
+        # 1. 이미지 전처리
+        with _timed(timer, "decode") as span:
+            img_np = np.array(Image.open(io.BytesIO(image_bytes)).convert('RGB'))
+            img_lq = self._to_tensor(img_np)
+            span["bytes"] = img_np.nbytes
+
+        # 2. 추론 수행 및 3. 결과 후처리
+        return self._restore_tensor(img_lq, timer, tile, progress_callback)
+
+    def restore_array(self, img_np: np.ndarray, timer=None, tile: int = None, progress_callback=None) -> np.ndarray:
+        """이미 디코딩된 HWC uint8 RGB 배열에 대해 복원 추론을 수행합니다."""
+        return self._restore_tensor(self._to_tensor(img_np), timer, tile, progress_callback)
+
+    def preview(self, img_np: np.ndarray, max_side: int = 256) -> np.ndarray:
+        """
+        긴 변이 max_side가 되도록 축소한 입력으로 한 번 추론하여 저해상도 미리보기를 빠르게 만듭니다.
+        본 추론 전에 사용자에게 대략적인 결과를 보여주기 위한 용도입니다.
+        """
+        h, w = img_np.shape[:2]
+        ratio = max_side / max(h, w)
+        if ratio < 1:
+            size = (max(int(w * ratio), 1), max(int(h * ratio), 1))
+            img_np = np.array(Image.fromarray(img_np).resize(size, Image.BICUBIC))
+        with torch.no_grad():
+            return self._to_uint8(self._forward(self._to_tensor(img_np)))
+
+    def inference_batch(self, images: list) -> list:
+        """
+        동일한 크기의 이미지 바이트 여러 개를 하나의 배치로 묶어 추론합니다.
+        """
+        arrays = [np.array(Image.open(io.BytesIO(image_bytes)).convert('RGB')) for image_bytes in images]
+        if len({array.shape for array in arrays}) > 1:
+            raise ValueError("배치 추론은 동일한 크기의 이미지만 지원합니다.")
+
+        img_lq = torch.cat([self._to_tensor(array) for array in arrays])
+        with torch.no_grad(), self._profiled(f"batch{len(arrays)}"):
+            output = self._forward(img_lq)
+        return [self._to_uint8(item) for item in output]
@@ -0,0 +1,138 @@
+
+# job_scheduler.py
+
+from datetime import datetime, timezone
+from collections import defaultdict
+
+from job_telemetry import METRICS
+
+# 크기 정보가 없는 작업에 가정하는 입력 픽셀 수
+DEFAULT_PIXELS = 1024 * 1024
+
+# 입력 픽셀 수 기준 크기 등급 (상한, 이름)
+SIZE_CLASSES = [(512 * 512, "small"), (2048 * 2048, "medium"), (float("inf"), "large")]
+
+# 모델별 상대 연산 비용 계수 (MODELS_CONFIG에 'cost_factor'가 없을 때 사용)
+DEFAULT_COST_FACTOR = 1.0
+
+# --- Job Cost Estimation ---
+
+def job_pixels(job: dict) -> int:
+    """작업 행 또는 parameters에 기록된 입력 이미지 크기로 픽셀 수를 계산합니다."""
+    params = job.get('parameters') or {}
+    width = job.get('width') or params.get('width')
+    height = job.get('height') or params.get('height')
+    if width and height:
+        return int(width) * int(height)
+    return DEFAULT_PIXELS
+
+
+def size_class(job: dict) -> str:
+    pixels = job_pixels(job)
+    for limit, name in SIZE_CLASSES:
+        if pixels <= limit:
+            return name
+    return SIZE_CLASSES[-1][1]
+
+
+def job_age_seconds(job: dict, now: datetime = None) -> float:
+    """created_at 기준으로 작업이 큐에서 기다린 시간(초)을 반환합니다."""
+    created_at = job.get('created_at')
+    if not created_at:
+        return 0.0
+    try:
+        created = datetime.fromisoformat(str(created_at).replace('Z', '+00:00'))
+    except ValueError:
+        return 0.0
+    if created.tzinfo is None:
+        created = created.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max((now - created).total_seconds(), 0.0)
+
+# --- Scheduler ---
+
+class JobScheduler:
+    """
+    대기 작업을 우선순위, 예상 비용, 대기 시간, model_id를 기준으로 정렬합니다.
+
+    - 높은 priority가 항상 먼저 선택됩니다.
+    - 같은 priority 안에서는 예상 비용이 작은 작업을 먼저 처리합니다. (shortest-expected-job-first)
+    - 예상 비용에서 대기 시간이 aging_seconds 만큼 지날 때마다 cost_unit(기본: 1MP x1 작업 하나의 비용)을 뺍니다.
+    - 대기 시간이 max_wait_seconds를 넘은 작업은 비용과 관계없이 오래 기다린 순으로 먼저 선택되어 기아가 생기지 않습니다. (0이면 미사용)
+    - 선택된 배치 안에서는 같은 model_id끼리 묶어 모델 전환을 줄입니다.
+    """
+    def __init__(self, models_config: dict, aging_seconds: float = 300.0, max_wait_seconds: float = 3600.0,
+                 cost_unit: float = DEFAULT_PIXELS * DEFAULT_COST_FACTOR):
+        self.models_config = models_config
+        self.aging_seconds = aging_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.cost_unit = cost_unit
+
+    def _model_cost(self, model_id) -> float:
+        model_info = self.models_config.get(model_id, {})
+        upscale = model_info.get('config', {}).get('upscale', 1)
+        return upscale * upscale * model_info.get('cost_factor', DEFAULT_COST_FACTOR)
+
+    def estimate_cost(self, job: dict) -> float:
+        """
+        입력 픽셀 수 x 출력 배율^2 x 모델 비용 계수로 상대 처리 비용을 추정합니다.
+        비교 작업(parameters.models)은 포함된 모델들의 비용을 합산합니다.
+        """
+        model_ids = (job.get('parameters') or {}).get('models') or [job.get('model_id')]
+        return job_pixels(job) * sum(self._model_cost(model_id) for model_id in model_ids)
+
+    def score(self, job: dict, now: datetime = None) -> float:
+        """aging이 적용된 예상 비용. 작을수록 먼저 처리됩니다."""
+        age = job_age_seconds(job, now)
+        return self.estimate_cost(job) - age / self.aging_seconds * self.cost_unit
+
+    def is_overdue(self, job: dict, now: datetime = None) -> bool:
+        """대기 시간이 max_wait_seconds를 넘어 비용과 관계없이 먼저 선택되어야 하는 작업인지 확인합니다."""
+        return bool(self.max_wait_seconds) and job_age_seconds(job, now) >= self.max_wait_seconds
+
+    def schedule(self, candidates: list, limit: int, now: datetime = None) -> list:
+        """후보 작업 중 limit개를 선택하고 실행 순서대로 정렬하여 반환합니다."""
+        now = now or datetime.now(timezone.utc)
+        scores = {job['id']: self.score(job, now) for job in candidates}
+
+        # 1. 우선순위 -> (최대 대기 초과 작업은 오래 기다린 순) -> aging 적용 비용 순으로 선택
+        def selection_key(job):
+            if self.is_overdue(job, now):
+                return (-(job.get('priority') or 0), 0, -job_age_seconds(job, now))
+            return (-(job.get('priority') or 0), 1, scores[job['id']])
+
+        selected = sorted(candidates, key=selection_key)[:limit]
+
+        # 2. 같은 우선순위 안에서 model_id별로 묶고, 가장 저렴한 작업이 있는 그룹부터 실행
+        ordered = []
+        by_priority = defaultdict(list)
+        for job in selected:
+            by_priority[job.get('priority') or 0].append(job)
+        for priority in sorted(by_priority, reverse=True):
+            groups = defaultdict(list)
+            for job in by_priority[priority]:
+                groups[job.get('model_id')].append(job)
+            for model_id in sorted(groups, key=lambda m: min(scores[job['id']] for job in groups[m])):
+                ordered.extend(groups[model_id])
+        return ordered
+
+# --- Queue Wait Reporting ---
+
+def record_queue_waits(jobs: list) -> dict:
+    """
+    선택된 작업들의 큐 대기 시간을 (크기 등급, 우선순위) 클래스별로 집계하여 METRICS에 기록하고 반환합니다.
+    """
+    now = datetime.now(timezone.utc)
+    waits = defaultdict(list)
+    for job in jobs:
+        wait = job_age_seconds(job, now)
+        job_class = (size_class(job), job.get('priority') or 0)
+        waits[job_class].append(wait)
+        METRICS.observe("restoration_queue_wait_seconds", wait, "Time jobs waited in the queue before being claimed",
+                        size_class=job_class[0], priority=str(job_class[1]))
+
+    report = {}
+    for (size, priority), values in sorted(waits.items()):
+        report[f"{size}/p{priority}"] = {"jobs": len(values), "max_wait_s": round(max(values), 1),
+                                         "avg_wait_s": round(sum(values) / len(values), 1)}
+    return report
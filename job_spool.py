@@ -0,0 +1,161 @@
+
+# job_spool.py
+
+import os
+import json
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: 디렉터리 잠금 없이 동작
+    fcntl = None
+
+MANIFEST_SUFFIX = ".json"
+CLAIMS_FILE = ".claims"  # 이 워커가 claim 했지만 아직 DB 기록이 확인되지 않은 작업 id 목록
+
+# --- Local Output Spool ---
+
+class JobSpool:
+    """
+    업로드 전 복원 결과를 로컬 디렉터리에 체크포인트하는 스풀.
+
+    각 작업은 결과 파일(<job_id>.bin)과 매니페스트(<job_id>.json)로 저장됩니다.
+    매니페스트는 결과 파일이 완전히 쓰인 뒤에 원자적으로 기록되므로, 매니페스트가 있으면 체크포인트가 유효합니다.
+    워커가 재시작되면 pending()으로 남은 체크포인트를 찾아 추론을 다시 하지 않고 업로드를 이어갑니다.
+    claim 한 작업 id도 함께 기록하여, 강제 종료(SIGKILL, OOM) 후에도 체크포인트 없이 'processing'에 남은 작업을 찾아 반환할 수 있습니다.
+    """
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._lock_file = self._acquire_directory_lock()
+        # 매니페스트 갱신은 작업 스레드와 버퍼 flush 스레드에서 동시에 일어날 수 있음
+        self._lock = threading.Lock()
+
+    def _acquire_directory_lock(self):
+        """
+        스풀 디렉터리를 이 프로세스가 단독으로 사용하도록 잠급니다.
+        다른 워커가 처리 중인 체크포인트를 '재개'하지 않도록, 살아 있는 워커끼리는 디렉터리를 공유할 수 없습니다.
+        (잠금은 프로세스가 종료되면 자동으로 풀리므로 재시작한 워커는 같은 디렉터리를 이어받습니다.)
+        """
+        if fcntl is None:
+            return None
+        lock_file = open(os.path.join(self.directory, ".lock"), 'w')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            raise RuntimeError(f"스풀 디렉터리 '{self.directory}'를 다른 워커가 사용 중입니다. "
+                               f"워커마다 WORKER_ID 또는 SPOOL_DIR을 다르게 지정하세요.")
+        return lock_file
+
+    def _data_path(self, job_id) -> str:
+        return os.path.join(self.directory, f"{job_id}.bin")
+
+    def _manifest_path(self, job_id) -> str:
+        return os.path.join(self.directory, f"{job_id}{MANIFEST_SUFFIX}")
+
+    @staticmethod
+    def _atomic_write(path: str, data: bytes):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def save(self, job: dict, restored_path: str, data: bytes, content_type: str = "image/png") -> dict:
+        """복원 결과와 재개에 필요한 작업 정보를 체크포인트합니다."""
+        manifest = {
+            "job_id": job['id'],
+            "model_id": job.get('model_id'),
+            "original_image_path": job.get('original_image_path'),
+            "restored_path": restored_path,
+            "content_type": content_type,
+            "spooled_at": time.time(),
+            "uploaded": False,
+            "benchmarked": False,
+            "finalized": False,
+        }
+        self._atomic_write(self._data_path(job['id']), data)
+        self._atomic_write(self._manifest_path(job['id']), json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        return manifest
+
+    def mark(self, job_id, **fields) -> dict:
+        """
+        매니페스트의 진행 상태(uploaded, benchmarked, finalized 등)를 갱신합니다.
+        이미 정리된 체크포인트면 None을 반환합니다.
+        """
+        with self._lock:
+            if not self.has(job_id):
+                return None
+            manifest = self.manifest(job_id)
+            manifest.update(fields)
+            self._atomic_write(self._manifest_path(job_id), json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+            return manifest
+
+    def manifest(self, job_id) -> dict:
+        with open(self._manifest_path(job_id), encoding='utf-8') as f:
+            return json.load(f)
+
+    def has(self, job_id) -> bool:
+        return os.path.exists(self._manifest_path(job_id))
+
+    def read(self, job_id) -> bytes:
+        with open(self._data_path(job_id), 'rb') as f:
+            return f.read()
+
+    def pending(self) -> list:
+        """완료 처리되지 않은 체크포인트의 매니페스트를 오래된 순으로 반환합니다."""
+        manifests = []
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(MANIFEST_SUFFIX):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename), encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[Spool] 손상된 매니페스트 무시: {filename} ({e})")
+        return sorted(manifests, key=lambda m: m.get("spooled_at", 0))
+
+    def _claims_path(self) -> str:
+        return os.path.join(self.directory, CLAIMS_FILE)
+
+    def claims(self) -> list:
+        """기록된 claim 작업 id 목록"""
+        try:
+            with open(self._claims_path(), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return []
+        except ValueError as e:
+            print(f"[Spool] 손상된 claim 목록 무시: {e}")
+            return []
+
+    def record_claims(self, job_ids: list):
+        """claim 한 작업 id를 추가합니다. (DB claim 직후, 추론 시작 전에 호출)"""
+        with self._lock:
+            claimed = self.claims()
+            claimed.extend(job_id for job_id in job_ids if job_id not in claimed)
+            self._atomic_write(self._claims_path(), json.dumps(claimed).encode('utf-8'))
+
+    def clear_claims(self, job_ids: list = None):
+        """job_ids(생략 시 전체)를 claim 목록에서 제거합니다. (결과가 DB에 기록된 뒤 호출)"""
+        with self._lock:
+            claimed = [] if job_ids is None else [job_id for job_id in self.claims() if job_id not in job_ids]
+            self._atomic_write(self._claims_path(), json.dumps(claimed).encode('utf-8'))
+
+    def remove(self, job_id):
+        with self._lock:
+            for path in (self._manifest_path(job_id), self._data_path(job_id)):
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def purge_finalized(self) -> int:
+        """DB 기록까지 끝난(finalized) 체크포인트를 삭제하고 삭제 개수를 반환합니다."""
+        removed = 0
+        for manifest in self.pending():
+            if manifest.get("finalized"):
+                self.remove(manifest["job_id"])
+                removed += 1
+        return removed
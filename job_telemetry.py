@@ -0,0 +1,263 @@
+
+# job_telemetry.py
+
+import os
+import sys
+import time
+import threading
+import resource
+from collections import defaultdict
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import torch
+
+# 단계별 소요 시간 히스토그램 버킷 (초)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# --- Memory Probes ---
+
+def current_rss_mb() -> float:
+    """현재 프로세스의 상주 메모리(RSS)를 MB 단위로 반환합니다."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # /proc이 없는 환경(macOS 등)에서는 최대 RSS로 대체
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    """프로세스 시작 이후 최대 상주 메모리(RSS)를 MB 단위로 반환합니다."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux는 KB, macOS는 byte 단위로 보고
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class RssSampler:
+    """
+    백그라운드 스레드에서 RSS를 주기적으로 샘플링하여 구간 내 최대값을 기록합니다.
+    ru_maxrss는 프로세스 수명 전체의 최대값이므로 구간(단계)별 최대 메모리는 이렇게 측정합니다.
+    """
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak_mb = current_rss_mb()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_mb = max(self.peak_mb, current_rss_mb())
+
+
+def reset_device_peak(device):
+    """CUDA의 최대 할당량 통계를 초기화하여 이후 device_memory_mb가 해당 구간의 최대값을 보고하도록 합니다."""
+    if device is not None and device.type == "cuda":
+        torch.cuda.reset_peak_memory_stats(device)
+
+
+def device_memory_mb(device) -> float:
+    """
+    가속기에 할당된 메모리를 MB 단위로 반환합니다. CPU는 0을 반환합니다.
+    CUDA는 마지막 reset_device_peak 이후의 최대값, MPS는 현재 할당량입니다.
+    """
+    if device is None:
+        return 0.0
+    if device.type == "cuda":
+        return torch.cuda.max_memory_allocated(device) / (1024 * 1024)
+    if device.type == "mps":
+        return torch.mps.current_allocated_memory() / (1024 * 1024)
+    return 0.0
+
+# --- Prometheus-style Metrics Registry ---
+
+class MetricsRegistry:
+    """
+    카운터, 게이지, 히스토그램을 보관하고 Prometheus 텍스트 포맷으로 내보내는 스레드 안전 레지스트리.
+    """
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._types = {}
+        self._help = {}
+        self._values = defaultdict(float)  # (name, labels) -> counter/gauge 값
+        self._histograms = {}              # (name, labels) -> [bucket 카운트, 합계, 개수]
+
+    def _register(self, name: str, metric_type: str, help_text: str):
+        self._types.setdefault(name, metric_type)
+        if help_text:
+            self._help.setdefault(name, help_text)
+
+    def inc(self, name: str, value: float = 1.0, help_text: str = "", **labels):
+        with self._lock:
+            self._register(name, "counter", help_text)
+            self._values[(name, tuple(sorted(labels.items())))] += value
+
+    def set(self, name: str, value: float, help_text: str = "", **labels):
+        with self._lock:
+            self._register(name, "gauge", help_text)
+            self._values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels):
+        with self._lock:
+            self._register(name, "histogram", help_text)
+            key = (name, tuple(sorted(labels.items())))
+            hist = self._histograms.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    hist[0][i] += 1
+            hist[1] += value
+            hist[2] += 1
+
+    def get(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._values.get((name, tuple(sorted(labels.items()))), 0.0)
+
+    def render(self) -> str:
+        """등록된 모든 지표를 Prometheus 텍스트 노출 포맷으로 직렬화합니다."""
+        def fmt_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for name in sorted(self._types):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {self._help[name]}")
+                lines.append(f"# TYPE {name} {self._types[name]}")
+
+                if self._types[name] == "histogram":
+                    for (hist_name, labels), (counts, total, count) in sorted(self._histograms.items()):
+                        if hist_name != name:
+                            continue
+                        for bound, bucket_count in zip(self.buckets, counts):
+                            lines.append(f"{name}_bucket{fmt_labels(labels, [('le', bound)])} {bucket_count}")
+                        lines.append(f"{name}_bucket{fmt_labels(labels, [('le', '+Inf')])} {count}")
+                        lines.append(f"{name}_sum{fmt_labels(labels)} {total}")
+                        lines.append(f"{name}_count{fmt_labels(labels)} {count}")
+                else:
+                    for (value_name, labels), value in sorted(self._values.items()):
+                        if value_name == name:
+                            lines.append(f"{name}{fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+# 워커 프로세스 전역 레지스트리
+METRICS = MetricsRegistry()
+
+# --- Per-Job Stage Timer ---
+
+class JobTimer:
+    """
+    단일 작업의 단계(stage)별 소요 시간, 처리 바이트 수, 메모리 사용량을 기록합니다.
+    기록된 span은 전역 METRICS 레지스트리에도 함께 반영됩니다.
+    """
+    def __init__(self, job_id, device=None):
+        self.job_id = job_id
+        self.device = device
+        self.spans = []
+
+    @contextmanager
+    def stage(self, name: str, nbytes: int = None):
+        """
+        with 블록의 실행 시간을 name 단계로 기록합니다.
+        블록 안에서 span["bytes"]를 설정하면 처리 바이트 수로 함께 기록됩니다.
+        """
+        span = {"stage": name, "bytes": nbytes}
+        reset_device_peak(self.device)
+        sampler = RssSampler()
+        start = time.perf_counter()
+        try:
+            with sampler:
+                yield span
+        finally:
+            self.add_span(name, (time.perf_counter() - start) * 1000, span.get("bytes"), peak_mb=sampler.peak_mb)
+
+    def add_span(self, name: str, duration_ms: float, nbytes: int = None, peak_mb: float = None):
+        """
+        이미 측정된 구간(예: 배치 단위 claim)을 작업의 span으로 추가합니다.
+        peak_mb는 구간 중 최대 RSS이며, 주어지지 않으면 현재 RSS를 사용합니다.
+        """
+        rss_mb = current_rss_mb()
+        span = {
+            "stage": name,
+            "duration_ms": round(duration_ms, 3),
+            "bytes": nbytes,
+            "rss_mb": round(rss_mb, 1),
+            "peak_rss_mb": round(max(peak_mb or 0.0, rss_mb), 1),
+            "device_mem_mb": round(device_memory_mb(self.device), 1),
+        }
+        self.spans.append(span)
+
+        METRICS.observe("restoration_stage_seconds", duration_ms / 1000,
+                        "Time spent in each restoration pipeline stage", stage=name)
+        if nbytes:
+            METRICS.inc("restoration_stage_bytes_total", nbytes,
+                        "Bytes processed by each restoration pipeline stage", stage=name)
+
+    def total_ms(self) -> float:
+        return sum(span["duration_ms"] for span in self.spans)
+
+    def summary_lines(self) -> list:
+        """job 행의 logs 컬럼에 기록할 사람이 읽기 쉬운 단계 요약을 반환합니다."""
+        lines = []
+        for span in self.spans:
+            line = f"{span['stage']}: {span['duration_ms']:.1f}ms"
+            if span["bytes"]:
+                line += f" ({span['bytes'] / (1024 * 1024):.2f}MB)"
+            lines.append(line)
+        job_peak = max((span["peak_rss_mb"] for span in self.spans), default=0.0)
+        lines.append(f"total: {self.total_ms():.1f}ms, peak_rss: {job_peak:.1f}MB")
+        return lines
+
+    def to_rows(self) -> list:
+        """job_stage_timings 테이블에 일괄 삽입할 행 목록을 반환합니다."""
+        return [{"job_id": self.job_id, **span} for span in self.spans]
+
+# --- Local Metrics Endpoint ---
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            METRICS.set("restoration_process_peak_rss_bytes", peak_rss_mb() * 1024 * 1024,
+                        "Peak resident memory of the worker process")
+            self._respond(200, METRICS.render(), "text/plain; version=0.0.4")
+        elif self.path == "/ready":
+            ready = METRICS.get("restoration_worker_ready") >= 1
+            self._respond(200 if ready else 503, "ready\n" if ready else "warming up\n", "text/plain")
+        else:
+            self._respond(404, "not found\n", "text/plain")
+
+    def _respond(self, status: int, body: str, content_type: str):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        # 스크래핑 요청마다 로그가 쌓이지 않도록 억제
+        pass
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """/metrics 와 /ready 를 제공하는 로컬 HTTP 서버를 데몬 스레드로 시작합니다."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+    print(f"메트릭 엔드포인트 시작: http://{host}:{port}/metrics")
+    return server
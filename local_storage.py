@@ -0,0 +1,55 @@
+
+# local_storage.py
+
+import os
+
+# --- Local Storage Stand-in ---
+# Supabase Storage의 from_(bucket).download/upload 인터페이스를 로컬 디렉터리로 흉내 냅니다.
+# 네트워크 없이 벤치마크나 로컬 테스트를 실행할 때 supabase 클라이언트 대신 사용합니다.
+
+class LocalBucket:
+    """로컬 디렉터리 하나를 Supabase Storage 버킷처럼 다루는 클래스"""
+    def __init__(self, root: str):
+        self.root = root
+
+    def _resolve(self, path: str) -> str:
+        full_path = os.path.abspath(os.path.join(self.root, path))
+        if not full_path.startswith(os.path.abspath(self.root) + os.sep):
+            raise ValueError(f"버킷 밖의 경로에는 접근할 수 없습니다: {path}")
+        return full_path
+
+    def download(self, path: str) -> bytes:
+        with open(self._resolve(path), 'rb') as f:
+            return f.read()
+
+    def upload(self, path: str, file, file_options: dict = None):
+        full_path = self._resolve(path)
+        if os.path.exists(full_path) and str((file_options or {}).get("upsert", "false")).lower() != "true":
+            raise FileExistsError(f"이미 존재하는 파일입니다: {path}")
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        data = file if isinstance(file, (bytes, bytearray)) else file.read()
+        with open(full_path, 'wb') as f:
+            f.write(data)
+        return {"Key": path}
+
+    def remove(self, paths: list):
+        for path in paths:
+            full_path = self._resolve(path)
+            if os.path.exists(full_path):
+                os.remove(full_path)
+
+
+class _LocalStorageAPI:
+    def __init__(self, root: str):
+        self.root = root
+
+    def from_(self, bucket: str) -> LocalBucket:
+        return LocalBucket(os.path.join(self.root, bucket))
+
+
+class LocalStorageClient:
+    """supabase.Client의 storage 속성만 제공하는 로컬 대체 클라이언트"""
+    def __init__(self, root: str):
+        os.makedirs(root, exist_ok=True)
+        self.storage = _LocalStorageAPI(root)
@@ -0,0 +1,22 @@
+
+# model_registry.py
+
+from inference_engine import DEFAULT_WARMUP_SHAPES
+
+# --- Model Definitions ---
+
+# 사용자가 Supabase 'restoration_jobs' 테이블에 'model_id'로 지정할 키
+# 워커와 벤치마크 도구가 같은 설정을 공유하도록 Supabase 클라이언트와 분리된 모듈에 둡니다.
+MODELS_CONFIG = {
+    "swinir_real_sr_x4": {
+        "path": "model_weights/003_realSR_BSRGAN_DFO_s64w8_SwinIR-S_x4_GAN.pth",
+        "config": {
+            'upscale': 4, 'in_chans': 3, 'img_size': 64, 'window_size': 8, 'img_range': 1.,
+            'depths': [6, 6, 6, 6, 6, 6], 'embed_dim': 180, 'num_heads': [6, 6, 6, 6, 6, 6],
+            'mlp_ratio': 2, 'upsampler': 'real-esrgan', 'resi_connection': '1conv'
+        },
+        # 'python weight_format.py <path>'로 변환한 .safetensors 파일의 SHA-256 (None이면 검증 생략)
+        "sha256": None,
+        "warmup_shapes": DEFAULT_WARMUP_SHAPES,
+    }
+}
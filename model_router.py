@@ -0,0 +1,187 @@
+
+# model_router.py
+
+import time
+import threading
+
+from job_scheduler import job_pixels, DEFAULT_COST_FACTOR
+from deconvolution import WIENER_RGB_MODEL_ID
+from job_telemetry import METRICS
+
+# fp32 대비 상대 추론 비용 (초기 추정값, 실제 처리 시간 관측으로 (모델, 정밀도)별 비용 단위당 시간이 보정됨)
+PRECISION_COST = {"fp32": 1.0, "bf16": 0.6, "fp16": 0.5}
+# Wiener deconvolution 경로의 픽셀당 상대 비용 (출력 배율 1)
+WIENER_COST_FACTOR = 0.02
+EWMA_ALPHA = 0.2
+
+# --- Adaptive Routing ---
+
+class ModelRouter:
+    """
+    큐 깊이와 예상 대기 시간에 따라 opt-in 작업(parameters.allow_downgrade)을 더 저렴한 구성으로 보내는 라우터.
+
+    - 모델별 티어: 요청 구성 -> 낮은 정밀도 -> 더 저렴한 모델들 -> Wiener 경로 순으로 예상 처리 시간이 줄어듭니다.
+      예상 시간은 (model_id, precision)별로 관측값을 보정하므로, 낮은 정밀도가 실제로 더 느린 CPU에서는 해당 티어가 빠집니다.
+    - 부하 단계(level)는 예상 대기가 downgrade_wait_seconds를 넘거나 큐 깊이가 downgrade_queue_depth를 넘으면 한 단계 오르고,
+      예상 대기가 upgrade_wait_seconds 미만이면서 큐 깊이가 upgrade_queue_depth 미만이면 한 단계 내려갑니다.
+    - 두 임계값 사이에서는 단계를 유지하고, 변경 후 min_dwell_seconds 동안은 다시 바꾸지 않아 진동을 막습니다.
+    """
+    def __init__(self, models_config: dict, downgrade_wait_seconds: float = 120.0, upgrade_wait_seconds: float = 30.0,
+                 downgrade_queue_depth: int = 0, upgrade_queue_depth: int = 0, min_dwell_seconds: float = 60.0):
+        self.models_config = models_config
+        self.downgrade_wait_seconds = downgrade_wait_seconds
+        self.upgrade_wait_seconds = upgrade_wait_seconds
+        self.downgrade_queue_depth = downgrade_queue_depth  # 0이면 큐 깊이 기준을 사용하지 않음
+        self.upgrade_queue_depth = upgrade_queue_depth
+        self.min_dwell_seconds = min_dwell_seconds
+
+        self._lock = threading.Lock()
+        self._device_types = {}      # model_id -> 디바이스 종류 (낮은 정밀도 선택용)
+        self._seconds_per_cost = {}  # (model_id, precision) -> 비용 단위당 처리 시간(초), EWMA
+        self._job_seconds = None     # 작업당 평균 처리 시간(초), EWMA
+
+        self.level = 0
+        self.queue_depth = 0
+        self.estimated_wait = 0.0
+        self._changed_at = float("-inf")
+
+    # --- Cost Model ---
+
+    def register(self, model_id: str, device_type: str, warmup_stats: list, precision: str = None):
+        """
+        로드된 모델(또는 정밀도 변형)을 등록하고, 워밍업 측정값으로 비용 단위당 처리 시간의 초기값을 정합니다.
+        precision을 생략하면 모델 설정의 기본 정밀도로 등록합니다.
+        """
+        self._device_types[model_id] = device_type
+        if warmup_stats:
+            entry = max(warmup_stats, key=lambda e: e['shape'][0] * e['shape'][1])
+            h, w = entry['shape']
+            key = (model_id, self._precision(model_id, precision))
+            self._seconds_per_cost[key] = entry['warm_ms'] / 1000 / (h * w * self.model_cost(model_id, precision))
+
+    def _precision(self, model_id: str, precision: str = None) -> str:
+        """precision None을 모델 설정의 기본 정밀도로 바꿉니다."""
+        if model_id == WIENER_RGB_MODEL_ID:
+            return None
+        return precision or self.models_config.get(model_id, {}).get('config', {}).get('precision', 'fp32')
+
+    def model_cost(self, model_id: str, precision: str = None) -> float:
+        """픽셀당 상대 비용: 출력 배율^2 x 모델 비용 계수 x 정밀도 계수"""
+        if model_id == WIENER_RGB_MODEL_ID:
+            return WIENER_COST_FACTOR
+        model_info = self.models_config.get(model_id, {})
+        upscale = model_info.get('config', {}).get('upscale', 1)
+        precision = self._precision(model_id, precision)
+        return upscale * upscale * model_info.get('cost_factor', DEFAULT_COST_FACTOR) * PRECISION_COST.get(precision, 1.0)
+
+    def _mean_seconds_per_cost(self) -> float:
+        known = list(self._seconds_per_cost.values())
+        return sum(known) / len(known) if known else 1e-6
+
+    def _seconds_per_cost_for(self, model_id: str, precision: str = None) -> float:
+        """
+        (model_id, precision)의 비용 단위당 처리 시간. 관측값이 없는 정밀도는 같은 모델의 기본 정밀도 값으로,
+        등록되지 않은 모델(Wiener 경로 등)은 전체 평균으로 추정합니다.
+        """
+        seconds_per_cost = self._seconds_per_cost.get((model_id, self._precision(model_id, precision)))
+        if seconds_per_cost is None:
+            seconds_per_cost = self._seconds_per_cost.get((model_id, self._precision(model_id)))
+        return seconds_per_cost or self._mean_seconds_per_cost()
+
+    def pixel_seconds(self, model_id: str, precision: str = None) -> float:
+        """입력 픽셀당 예상 처리 시간(초)"""
+        return self.model_cost(model_id, precision) * self._seconds_per_cost_for(model_id, precision)
+
+    def estimate_seconds(self, job: dict, model_id: str, precision: str = None) -> float:
+        """작업을 model_id/precision으로 처리할 때의 예상 추론 시간(초)"""
+        return job_pixels(job) * self.pixel_seconds(model_id, precision)
+
+    def tiers(self, model_id: str) -> list:
+        """요청 모델에서 시작해 예상 처리 시간이 점점 짧아지는 (model_id, precision) 구성 목록. precision None은 모델 기본값."""
+        tiers = [(model_id, None)]
+        configured = self._precision(model_id)
+        low_precision = "bf16" if self._device_types.get(model_id) == "cpu" else "fp16"
+        if low_precision != configured and self.pixel_seconds(model_id, low_precision) < self.pixel_seconds(model_id):
+            tiers.append((model_id, low_precision))
+
+        base_seconds = self.pixel_seconds(*tiers[-1])
+        cheaper = [m for m in self._device_types if m != model_id and self.pixel_seconds(m) < base_seconds]
+        tiers.extend((m, None) for m in sorted(cheaper, key=self.pixel_seconds, reverse=True))
+
+        tiers.append((WIENER_RGB_MODEL_ID, None))
+        return tiers
+
+    # --- Load Tracking ---
+
+    def update_load(self, queue_depth: int, lanes: int) -> int:
+        """대기 작업 수로 예상 대기 시간을 갱신하고 hysteresis 규칙에 따라 부하 단계를 조정합니다."""
+        with self._lock:
+            job_seconds = self._job_seconds
+            if job_seconds is None:
+                # 관측값이 없으면 크기 정보가 없는 작업 하나를 첫 모델로 처리하는 시간으로 가정
+                job_seconds = self.estimate_seconds({}, next(iter(self._device_types))) if self._device_types else 0.0
+            self.queue_depth = queue_depth
+            self.estimated_wait = queue_depth * job_seconds / max(lanes, 1)
+
+            overloaded = self.estimated_wait > self.downgrade_wait_seconds or \
+                (self.downgrade_queue_depth and queue_depth > self.downgrade_queue_depth)
+            relieved = self.estimated_wait < self.upgrade_wait_seconds and \
+                (not self.upgrade_queue_depth or queue_depth < self.upgrade_queue_depth)
+            max_level = max((len(self.tiers(m)) - 1 for m in self._device_types), default=0)
+
+            now = time.monotonic()
+            if now - self._changed_at >= self.min_dwell_seconds:
+                previous = self.level
+                if overloaded and self.level < max_level:
+                    self.level += 1
+                elif relieved and self.level > 0:
+                    self.level -= 1
+                if self.level != previous:
+                    self._changed_at = now
+                    print(f"[Router] 부하 단계 {previous} -> {self.level} (큐 깊이: {queue_depth}, 예상 대기: {self.estimated_wait:.1f}초)")
+
+        METRICS.set("restoration_routing_level", self.level, "Current downgrade level of the model router")
+        METRICS.set("restoration_estimated_wait_seconds", self.estimated_wait, "Estimated queue wait used for routing")
+        return self.level
+
+    # --- Routing ---
+
+    def route(self, job: dict) -> dict:
+        """작업을 처리할 구성과 라우팅 결정 내역을 반환합니다. opt-in하지 않은 작업은 항상 요청 구성 그대로입니다."""
+        requested = job.get('model_id')
+        params = job.get('parameters') or {}
+        level = self.level if params.get('allow_downgrade') and requested in self._device_types else 0
+
+        tiers = self.tiers(requested) if level else [(requested, None)]
+        model_id, precision = tiers[min(level, len(tiers) - 1)]
+
+        requested_seconds = self.estimate_seconds(job, requested)
+        routed_seconds = self.estimate_seconds(job, model_id, precision)
+        decision = {
+            "requested_model_id": requested,
+            "model_id": model_id,
+            "precision": precision,
+            "level": level,
+            "queue_depth": self.queue_depth,
+            "estimated_wait_s": round(self.estimated_wait, 1),
+            "estimated_seconds": round(routed_seconds, 3),
+            "estimated_savings_s": round(max(requested_seconds - routed_seconds, 0.0), 3),
+        }
+        if level:
+            METRICS.inc("restoration_routed_jobs_total", help_text="Jobs routed to a cheaper configuration",
+                        requested=str(requested), routed=f"{model_id}:{precision or 'default'}")
+            METRICS.inc("restoration_routing_savings_seconds_total", decision["estimated_savings_s"],
+                        "Estimated inference seconds saved by routing")
+        return decision
+
+    def observe(self, job: dict, decision: dict, elapsed_seconds: float):
+        """실제 추론 시간으로 비용 단위당 처리 시간과 작업당 평균 처리 시간을 보정합니다."""
+        model_id = decision["model_id"]
+        key = (model_id, self._precision(model_id, decision["precision"]))
+        cost = job_pixels(job) * self.model_cost(model_id, decision["precision"])
+        with self._lock:
+            sample = elapsed_seconds / cost
+            previous = self._seconds_per_cost.get(key)
+            self._seconds_per_cost[key] = sample if previous is None else previous + EWMA_ALPHA * (sample - previous)
+            self._job_seconds = elapsed_seconds if self._job_seconds is None \
+                else self._job_seconds + EWMA_ALPHA * (elapsed_seconds - self._job_seconds)
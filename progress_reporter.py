@@ -0,0 +1,46 @@
+
+# progress_reporter.py
+
+import time
+import threading
+
+# --- Throttled Progress Reporting ---
+
+class ProgressReporter:
+    """
+    작업의 progress / current_step을 write-behind 버퍼를 통해 기록하는 리포터.
+
+    타일 단위 추론처럼 콜백이 자주 호출되어도, 마지막 기록 후 min_interval 초가 지나고
+    진행률이 min_delta 이상 변했을 때만 쓰기를 만들어 작업당 DB 쓰기 수를 제한합니다.
+    단계 전환과 미리보기처럼 반드시 보여야 하는 변경은 force=True로 즉시 버퍼에 넣습니다.
+    """
+    def __init__(self, buffer, job_id, min_interval: float = 2.0, min_delta: int = 5):
+        self.buffer = buffer
+        self.job_id = job_id
+        self.min_interval = min_interval
+        self.min_delta = min_delta
+
+        self._lock = threading.Lock()
+        self._last_time = float("-inf")
+        self._last_progress = -1
+        self.writes = 0
+
+    def update(self, progress: int, step: str, force: bool = False, **fields) -> bool:
+        """진행률과 현재 단계를 기록합니다. 쓰기가 만들어졌으면 True를 반환합니다."""
+        progress = max(0, min(int(progress), 100))
+        now = time.monotonic()
+        with self._lock:
+            if not force and (now - self._last_time < self.min_interval
+                              or progress - self._last_progress < self.min_delta):
+                return False
+            self._last_time = now
+            self._last_progress = progress
+            self.writes += 1
+        self.buffer.update_job(self.job_id, {"progress": progress, "current_step": step, **fields})
+        return True
+
+    def range_callback(self, start: int, end: int, step: str):
+        """(done, total) 콜백을 받아 진행률 start~end 구간으로 환산하는 함수를 반환합니다. (타일/밴드 추론용)"""
+        def callback(done: int, total: int):
+            self.update(start + (end - start) * done / max(total, 1), f"{step} {done}/{total}")
+        return callback
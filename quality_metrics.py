@@ -0,0 +1,74 @@
+
+# quality_metrics.py
+
+import threading
+import numpy as np
+from PIL import Image
+import io as python_io
+import torch
+from skimage.metrics import peak_signal_noise_ratio as psnr
+from skimage.metrics import structural_similarity as ssim
+import pyiqa
+
+# --- Metric Calculation Logic ---
+# Supabase 클라이언트에 의존하지 않으므로 워커, 리포팅 도구, 벤치마크에서 공통으로 재사용합니다.
+
+# NIQE 메트릭은 생성 시 모델 파라미터를 로드하므로 디바이스별로 한 번만 만들어 재사용
+_NIQE_METRICS = {}
+_NIQE_LOCK = threading.Lock()
+
+
+def get_niqe_metric(device: torch.device):
+    """디바이스별로 캐시된 pyiqa NIQE 메트릭 객체를 반환합니다."""
+    key = str(device)
+    with _NIQE_LOCK:
+        if key not in _NIQE_METRICS:
+            _NIQE_METRICS[key] = pyiqa.create_metric('niqe', device=device)
+        return _NIQE_METRICS[key]
+
+
+def decode_image(image_bytes: bytes) -> np.ndarray:
+    """이미지 바이트를 HWC uint8 RGB 배열로 디코딩합니다."""
+    return np.array(Image.open(python_io.BytesIO(image_bytes)).convert('RGB'))
+
+
+def calculate_metrics_array(original_array: np.ndarray, restored_img_array: np.ndarray, device: torch.device):
+    """
+    이미 디코딩된 원본 배열을 기준으로 PSNR, SSIM, NIQE 품질 지표를 계산합니다.
+    같은 원본으로 여러 결과를 평가할 때 디코딩을 한 번만 하도록 분리되어 있습니다.
+    """
+    metrics = {}
+    try:
+        if restored_img_array.ndim == 2:
+            # Wiener 경로처럼 흑백 결과는 원본과 비교할 수 있도록 3채널로 확장
+            restored_img_array = np.stack([restored_img_array] * 3, axis=2)
+
+        restored_pil = Image.fromarray(restored_img_array)
+        original_size = (original_array.shape[1], original_array.shape[0])
+        if original_size != restored_pil.size:
+            restored_pil = restored_pil.resize(original_size, Image.LANCZOS)
+
+        restored_array_resized = np.array(restored_pil)
+
+        metrics['psnr'] = psnr(original_array, restored_array_resized)
+        metrics['ssim'] = ssim(original_array, restored_array_resized, multichannel=True, channel_axis=2, data_range=255)
+
+        niqe_metric = get_niqe_metric(device)
+        restored_tensor = torch.tensor(restored_array_resized).permute(2, 0, 1).unsqueeze(0) / 255.
+
+        with torch.no_grad():
+            niqe_score = niqe_metric(restored_tensor)
+        metrics['niqe'] = niqe_score.item()
+    except Exception as e:
+        print(f"품질 지표 계산 중 오류 발생: {e}")
+    return metrics
+
+
+def calculate_metrics(original_img_bytes: bytes, restored_img_array: np.ndarray, device: torch.device):
+    """PSNR, SSIM, NIQE 품질 지표를 계산합니다."""
+    try:
+        original_array = decode_image(original_img_bytes)
+    except Exception as e:
+        print(f"품질 지표 계산 중 오류 발생: {e}")
+        return {}
+    return calculate_metrics_array(original_array, restored_img_array, device)
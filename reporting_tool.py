@@ -10,12 +10,9 @@ from collections import defaultdict
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import numpy as np
-from PIL import Image
-import io as python_io
-import torch
-from skimage.metrics import peak_signal_noise_ratio as psnr
-from skimage.metrics import structural_similarity as ssim
-import pyiqa
+
+# calculate_metrics는 quality_metrics.py로 이동 (기존 'from reporting_tool import calculate_metrics' 호환용)
+from quality_metrics import calculate_metrics
 
 
 # --- Configuration ---
@@ -31,35 +28,6 @@ supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 IMAGE_STORAGE_BUCKET = "images"
 REPORT_FILENAME = "benchmark_report.json"
 
-# --- Metric Calculation Logic (from batch_worker) ---
-# This function is now self-contained in the reporting tool for reuse.
-def calculate_metrics(original_img_bytes: bytes, restored_img_array: np.ndarray, device: torch.device):
-    """PSNR, SSIM, NIQE 품질 지표를 계산합니다."""
-    metrics = {}
-    try:
-        original_pil = Image.open(python_io.BytesIO(original_img_bytes)).convert('RGB')
-        original_array = np.array(original_pil)
-
-        restored_pil = Image.fromarray(restored_img_array)
-        if original_pil.size != restored_pil.size:
-            restored_pil = restored_pil.resize(original_pil.size, Image.LANCZOS)
-        
-        restored_array_resized = np.array(restored_pil)
-        
-        metrics['psnr'] = psnr(original_array, restored_array_resized)
-        metrics['ssim'] = ssim(original_array, restored_array_resized, multichannel=True, channel_axis=2, data_range=255)
-
-        niqe_metric = pyiqa.create_metric('niqe', device=device)
-        restored_tensor = torch.tensor(restored_array_resized).permute(2, 0, 1).unsqueeze(0) / 255.
-        
-        with torch.no_grad():
-            niqe_score = niqe_metric(restored_tensor)
-        metrics['niqe'] = niqe_score.item()
-    except Exception as e:
-        print(f"품질 지표 계산 중 오류 발생: {e}")
-    return metrics
-
-
 # --- Core Functions ---
 
 def generate_benchmark_report(output_filename: str):
@@ -83,8 +51,7 @@ def generate_benchmark_report(output_filename: str):
 
     # 평균 점수 계산
     report = {}
-    print("
---- 벤치마크 종합 리포트 ---")
+    print("\n--- 벤치마크 종합 리포트 ---")
     for model, data in scores.items():
         avg_psnr = np.mean(data['psnr']) if data['psnr'] else 0
         avg_ssim = np.mean(data['ssim']) if data['ssim'] else 0
@@ -100,8 +67,7 @@ def generate_benchmark_report(output_filename: str):
         print(f"모델: {model} (처리된 이미지: {count}개)")
         print(f"  - 평균 PSNR: {avg_psnr:.2f}")
         print(f"  - 평균 SSIM: {avg_ssim:.4f}")
-        print(f"  - 평균 NIQE: {avg_niqe:.2f}
-")
+        print(f"  - 평균 NIQE: {avg_niqe:.2f}\n")
 
     # JSON 파일로 저장
     with open(output_filename, 'w', encoding='utf-8') as f:
@@ -146,8 +112,7 @@ def create_archive_zip(job_ids: list, output_zip_path: str):
             except Exception as e:
                 print(f"[오류] '{path}' 이미지 다운로드 또는 압축 실패: {e}")
                 
-    print(f"
-결과물이 '{output_zip_path}' 파일로 성공적으로 압축되었습니다.")
+    print(f"\n결과물이 '{output_zip_path}' 파일로 성공적으로 압축되었습니다.")
 
 
 # --- Command-line Interface ---
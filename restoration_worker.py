@@ -4,13 +4,15 @@
 import os
 import time
 import numpy as np
-from skimage import io, color, restoration
+from skimage import io, color
 from skimage.metrics import peak_signal_noise_ratio as psnr
 from skimage.metrics import structural_similarity as ssim
 from dotenv import load_dotenv
 from supabase import create_client, Client
 import io as python_io
 
+from deconvolution import deconvolve_image, WIENER_MODEL_ID
+
 # --- Configuration ---
 # .env.local 파일에서 환경 변수 로드
 load_dotenv(dotenv_path=".env.local")
@@ -24,35 +26,6 @@ if not SUPABASE_URL or not SUPABASE_KEY:
 supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 IMAGE_STORAGE_BUCKET = "images"  # Supabase 스토리지 버킷 이름
 
-# --- Image Processing Functions ---
-
-def deconvolve_image(image_bytes: bytes) -> np.ndarray:
-    """
-    Wiener deconvolution을 사용하여 이미지의 블러를 제거합니다.
-    """
-    # 바이트 데이터를 numpy 배열로 읽기
-    image = io.imread(image_bytes)
-
-    # 컬러 이미지인 경우 흑백으로 변환하여 처리
-    if image.ndim == 3:
-        image_gray = color.rgb2gray(image)
-    else:
-        image_gray = image
-
-    # PSF(Point Spread Function) 추정. 실제 환경에서는 더 정교한 추정이 필요.
-    # 여기서는 간단한 가우시안 커널을 가정합니다.
-    psf = np.ones((5, 5)) / 25  # 5x5 평균 필터
-
-    # Wiener deconvolution 적용
-    # 'balance' 파라미터는 노이즈와 디블러링 사이의 균형을 조절합니다.
-    deconvolved_image = restoration.wiener(image_gray, psf, 1.1, clip=True)
-
-    # 0-255 범위의 8비트 이미지로 변환
-    deconvolved_image_uint8 = (np.clip(deconvolved_image, 0, 1) * 255).astype(np.uint8)
-
-    return deconvolved_image_uint8
-
-
 # --- Main Worker Logic ---
 
 def main():
@@ -135,7 +108,7 @@ def main():
                 # model_benchmarks 테이블에 기록
                 supabase.table("model_benchmarks").insert({
                     "job_id": job_id,
-                    "model_name": "wiener_deconvolution_v1",
+                    "model_name": WIENER_MODEL_ID,
                     "psnr": psnr_value,
                     "ssim": ssim_value,
                 }).execute()
@@ -15,6 +15,7 @@ from supabase import create_client, Client
 
 # 사용자 정의 모듈 임포트
 from inference_engine import ImageRestorer
+from job_telemetry import JobTimer
 
 # IQA (Image Quality Assessment) 라이브러리
 try:
@@ -103,6 +104,7 @@ def main():
     job = None
     try:
         # 1. 처리할 작업 가져오기
+        claim_start = time.perf_counter()
         response = supabase.table("restoration_jobs").select("*").eq("status", "pending").limit(1).execute()
         if not response.data:
             print("처리할 작업이 없습니다.")
@@ -113,8 +115,9 @@ def main():
         
         # 2. 작업 상태를 'processing'으로 변경
         supabase.table("restoration_jobs").update({"status": "processing"}).eq("id", job_id).execute()
-        print(f"
-작업 ID {job_id} 처리 시작...")
+        timer = JobTimer(job_id)
+        timer.add_span("claim", (time.perf_counter() - claim_start) * 1000)
+        print(f"\n작업 ID {job_id} 처리 시작...")
         
         # 3. 작업에 맞는 모델 선택 및 로드
         model_id = job.get('model_id') # Supabase 테이블에 'model_id' 컬럼이 있어야 함
@@ -123,7 +126,9 @@ def main():
             
         model_info = MODELS_CONFIG[model_id]
         print(f"모델 '{model_id}' 로드 중...")
-        restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'])
+        restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'],
+                                 checksum=model_info.get('sha256'))
+        timer.device = restorer.device
 
         # 4. 이미지 다운로드 및 복원
         blurred_image_path = job.get("blurred_image_path")
@@ -131,53 +136,67 @@ def main():
             raise ValueError("블러 처리된 이미지 경로가 없습니다.")
         
         print(f"이미지 다운로드: {blurred_image_path}")
-        image_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=blurred_image_path)
+        with timer.stage("download") as span:
+            image_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=blurred_image_path)
+            span["bytes"] = len(image_bytes)
         
         print("AI 모델 추론 시작...")
-        start_time = time.time()
-        restored_image_array = restorer.inference(image_bytes)
-        print(f"추론 완료. (소요 시간: {time.time() - start_time:.2f}초)")
+        restored_image_array = restorer.inference(image_bytes, timer=timer)
+        forward_ms = next(span["duration_ms"] for span in timer.spans if span["stage"] == "forward")
+        print(f"추론 완료. (forward 소요 시간: {forward_ms / 1000:.2f}초)")
 
         # 5. 복원된 이미지 업로드
         restored_filename = f"restored_{model_id}_{os.path.basename(blurred_image_path)}_{int(time.time())}.png"
         restored_path = os.path.join(os.path.dirname(blurred_image_path), restored_filename)
         
-        output_io = python_io.BytesIO()
-        Image.fromarray(restored_image_array).save(output_io, format='PNG')
-        output_io.seek(0)
+        with timer.stage("encode") as span:
+            output_io = python_io.BytesIO()
+            Image.fromarray(restored_image_array).save(output_io, format='PNG')
+            output_bytes = output_io.getvalue()
+            span["bytes"] = len(output_bytes)
 
         print(f"복원된 이미지 업로드: {restored_path}")
-        supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
-            path=restored_path,
-            file=output_io.read(),
-            file_options={"content-type": "image/png"}
-        )
+        with timer.stage("upload", len(output_bytes)):
+            supabase.storage.from_(IMAGE_STORAGE_BUCKET).upload(
+                path=restored_path,
+                file=output_bytes,
+                file_options={"content-type": "image/png"}
+            )
 
         # 6. 품질 지표 계산 및 저장
         metrics = {}
         if job.get("original_image_path"):
             print("품질 지표 계산 중...")
-            original_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=job["original_image_path"])
-            metrics = calculate_metrics(original_bytes, restored_image_array, restorer.device)
-            print(f"계산된 지표: PSNR={metrics.get('psnr'):.2f}, SSIM={metrics.get('ssim'):.4f}, NIQE={metrics.get('niqe'):.2f}")
-            
-            # model_benchmarks 테이블에 저장
-            supabase.table("model_benchmarks").insert({
-                "job_id": job_id,
-                "model_name": model_id,
-                "psnr": metrics.get('psnr'),
-                "ssim": metrics.get('ssim'),
-                "niqe": metrics.get('niqe'),
-            }).execute()
-
-        # 7. 작업 최종 완료 처리
-        supabase.table("restoration_jobs").update({
-            "status": "completed",
-            "restored_image_path": restored_path,
-            "completed_at": "now()"
-        }).eq("id", job_id).execute()
-        
-        print(f"작업 ID {job_id} 성공적으로 완료.")
+            with timer.stage("metrics") as span:
+                original_bytes = supabase.storage.from_(IMAGE_STORAGE_BUCKET).download(path=job["original_image_path"])
+                span["bytes"] = len(original_bytes)
+                metrics = calculate_metrics(original_bytes, restored_image_array, restorer.device)
+                print(f"계산된 지표: PSNR={metrics.get('psnr'):.2f}, SSIM={metrics.get('ssim'):.4f}, NIQE={metrics.get('niqe'):.2f}")
+
+                # model_benchmarks 테이블에 저장
+                supabase.table("model_benchmarks").insert({
+                    "job_id": job_id,
+                    "model_name": model_id,
+                    "psnr": metrics.get('psnr'),
+                    "ssim": metrics.get('ssim'),
+                    "niqe": metrics.get('niqe'),
+                }).execute()
+
+        # 7. 작업 최종 완료 처리 (단계별 요약은 logs 컬럼에 함께 기록)
+        with timer.stage("db_update"):
+            supabase.table("restoration_jobs").update({
+                "status": "completed",
+                "restored_image_path": restored_path,
+                "completed_at": "now()",
+                "logs": timer.summary_lines(),
+            }).eq("id", job_id).execute()
+
+        # 8. 단계별 span을 job_stage_timings 테이블에 저장 (실패해도 작업 결과에는 영향 없음)
+        try:
+            supabase.table("job_stage_timings").insert(timer.to_rows()).execute()
+        except Exception as e:
+            print(f"단계별 타이밍 저장 실패: {e}")
+        print(f"작업 ID {job_id} 성공적으로 완료. (총 소요 시간: {timer.total_ms() / 1000:.2f}초)")
 
     except Exception as e:
         print(f"작업 처리 중 심각한 오류 발생: {e}")
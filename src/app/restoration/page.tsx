@@ -12,6 +12,7 @@ import { supabase } from '@/lib/supabase';
 import { RestorationJob, BenchmarkResult } from '@/types/optics';
 import { Rocket, Sliders, LayoutDashboard, History, Beaker, Layers } from 'lucide-react';
 import { cn } from '@/lib/utils';
+import { readImageDimensions } from '@/lib/imageDimensions';
 
 export default function RestorationPage() {
     const [activeTab, setActiveTab] = useState<'workbench' | 'batch'>('workbench');
@@ -37,6 +38,8 @@ export default function RestorationPage() {
         setUploadProgress(10);
 
         try {
+            // Dimensions let the worker schedule by job size (shortest job first)
+            const dimensions = await readImageDimensions(file);
             const fileName = `${Date.now()}_${file.name}`;
             const filePath = `blurred/${fileName}`;
 
@@ -55,7 +58,8 @@ export default function RestorationPage() {
                     algorithm: selectedModelId,
                     progress: 0,
                     current_step: 'Queued',
-                    parameters: parameters
+                    parameters: parameters,
+                    ...(dimensions ?? {})
                 })
                 .select()
                 .single();
@@ -4,6 +4,7 @@ import React, { useState } from 'react';
 import { supabase } from '@/lib/supabase';
 import { RestorationJob } from '@/types/optics';
 import { cn } from '@/lib/utils';
+import { readImageDimensions } from '@/lib/imageDimensions';
 import { Layers, Play, CheckCircle2, Clock, Trash2, Plus } from 'lucide-react';
 
 export function BatchManager() {
@@ -27,6 +28,7 @@ export function BatchManager() {
             setQueue(prev => prev.map(i => i.id === item.id ? { ...i, status: 'pending' } : i));
 
             try {
+                const dimensions = await readImageDimensions(item.file);
                 const filePath = `blurred/${Date.now()}_${item.file.name}`;
                 await supabase.storage.from('images').upload(filePath, item.file);
 
@@ -35,6 +37,7 @@ export function BatchManager() {
                     blurred_image_path: filePath,
                     status: 'pending',
                     algorithm: model,
+                    ...(dimensions ?? {}),
                 }));
 
                 const { data } = await supabase.from('restoration_jobs').insert(inserts).select();
@@ -3,7 +3,7 @@
 import React, { useEffect, useState } from 'react';
 import { supabase } from '@/lib/supabase';
 import { RestorationJob } from '@/types/optics';
-import { Loader2, CheckCircle2, AlertCircle, FileText } from 'lucide-react';
+import { Loader2, CheckCircle2, AlertCircle, FileText, Eye } from 'lucide-react';
 import { cn } from '@/lib/utils';
 
 export function ProcessingStatus({ jobId }: { jobId: string }) {
@@ -52,6 +52,11 @@ export function ProcessingStatus({ jobId }: { jobId: string }) {
 
     if (!job) return null;
 
+    // The worker uploads a low-resolution preview before full inference; show it until the final result exists
+    const previewUrl = job.preview_image_path && !job.restored_image_path
+        ? supabase.storage.from('images').getPublicUrl(job.preview_image_path).data.publicUrl
+        : undefined;
+
     return (
         <div className="bg-white/5 border border-white/10 rounded-2xl p-6 flex flex-col gap-6">
             <div className="flex items-center justify-between">
@@ -84,6 +89,18 @@ export function ProcessingStatus({ jobId }: { jobId: string }) {
                 </div>
             </div>
 
+            {previewUrl && (
+                <div className="flex flex-col gap-3 pt-6 border-t border-white/5">
+                    <div className="flex items-center gap-2 text-xs text-white/40 font-semibold mb-1 uppercase tracking-wider">
+                        <Eye className="w-3.5 h-3.5" />
+                        Preview
+                    </div>
+                    <div className="bg-black/50 rounded-lg overflow-hidden aspect-video">
+                        <img src={previewUrl} alt="Preview" className="w-full h-full object-contain" />
+                    </div>
+                </div>
+            )}
+
             <div className="flex flex-col gap-3 pt-6 border-t border-white/5">
                 <div className="flex items-center gap-2 text-xs text-white/40 font-semibold mb-1 uppercase tracking-wider">
                     <FileText className="w-3.5 h-3.5" />
@@ -0,0 +1,79 @@
+export interface ImageDimensions {
+    width: number;
+    height: number;
+}
+
+const NPY_MAGIC = '\x93NUMPY';
+const TIFF_IMAGE_WIDTH = 256;
+const TIFF_IMAGE_LENGTH = 257;
+
+async function readBytes(file: File, start: number, end: number): Promise<DataView> {
+    return new DataView(await file.slice(start, end).arrayBuffer());
+}
+
+/**
+ * Read width/height from a .npy header ('shape': (height, width, ...)).
+ */
+async function readNpyDimensions(file: File): Promise<ImageDimensions | null> {
+    const head = await readBytes(file, 0, 12);
+    const magic = String.fromCharCode(...Array.from({ length: 6 }, (_, i) => head.getUint8(i)));
+    if (magic !== NPY_MAGIC) return null;
+
+    // Version 1.x stores the header length as uint16, 2.x and later as uint32
+    const major = head.getUint8(6);
+    const headerStart = major === 1 ? 10 : 12;
+    const headerLength = major === 1 ? head.getUint16(8, true) : head.getUint32(8, true);
+    const header = new TextDecoder('latin1').decode(await file.slice(headerStart, headerStart + headerLength).arrayBuffer());
+
+    const shape = header.match(/'shape':\s*\((\d+),\s*(\d+)/);
+    return shape ? { width: Number(shape[2]), height: Number(shape[1]) } : null;
+}
+
+/**
+ * Read ImageWidth/ImageLength from the first IFD of a classic TIFF.
+ */
+async function readTiffDimensions(file: File): Promise<ImageDimensions | null> {
+    const head = await readBytes(file, 0, 8);
+    const order = String.fromCharCode(head.getUint8(0), head.getUint8(1));
+    if (order !== 'II' && order !== 'MM') return null;
+    const little = order === 'II';
+    if (head.getUint16(2, little) !== 42) return null;  // BigTIFF is not supported
+
+    const ifdOffset = head.getUint32(4, little);
+    const count = (await readBytes(file, ifdOffset, ifdOffset + 2)).getUint16(0, little);
+    const entries = await readBytes(file, ifdOffset + 2, ifdOffset + 2 + count * 12);
+
+    let width = 0;
+    let height = 0;
+    for (let i = 0; i < count; i++) {
+        const base = i * 12;
+        const tag = entries.getUint16(base, little);
+        if (tag !== TIFF_IMAGE_WIDTH && tag !== TIFF_IMAGE_LENGTH) continue;
+        // SHORT (3) values sit in the first two bytes of the value field, LONG (4) uses all four
+        const type = entries.getUint16(base + 2, little);
+        const value = type === 3 ? entries.getUint16(base + 8, little) : entries.getUint32(base + 8, little);
+        if (tag === TIFF_IMAGE_WIDTH) width = value;
+        else height = value;
+    }
+    return width && height ? { width, height } : null;
+}
+
+/**
+ * Read the pixel dimensions of an upload from its header so the worker scheduler can estimate
+ * the job cost from restoration_jobs.width / height. Returns null when the format cannot be read.
+ */
+export async function readImageDimensions(file: File): Promise<ImageDimensions | null> {
+    const name = file.name.toLowerCase();
+    try {
+        if (name.endsWith('.npy')) return await readNpyDimensions(file);
+        if (name.endsWith('.tif') || name.endsWith('.tiff')) return await readTiffDimensions(file);
+
+        const bitmap = await createImageBitmap(file);
+        const dimensions = { width: bitmap.width, height: bitmap.height };
+        bitmap.close();
+        return dimensions;
+    } catch (error) {
+        console.warn('Could not read image dimensions:', error);
+        return null;
+    }
+}
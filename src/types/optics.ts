@@ -4,6 +4,7 @@ export interface RestorationJob {
     blurred_image_path: string;
     original_image_path?: string;
     restored_image_path?: string;
+    preview_image_path?: string;
     status: 'pending' | 'processing' | 'completed' | 'failed';
     progress?: number;
     current_step?: string;
@@ -12,6 +13,25 @@ export interface RestorationJob {
     error_log?: string;
     algorithm?: string;
     parameters?: any;
+    model_id?: string;
+    priority?: number;
+    width?: number;
+    height?: number;
+    routed_model_id?: string;
+    routing_decision?: RoutingDecision;
+}
+
+// 부하 기반 라우팅 결정 (parameters.allow_downgrade 작업에 기록)
+export interface RoutingDecision {
+    requested_model_id: string;
+    model_id: string;
+    precision: 'fp32' | 'fp16' | 'bf16' | null;
+    level: number;
+    queue_depth: number;
+    estimated_wait_s: number;
+    estimated_seconds: number;
+    estimated_savings_s: number;
+    actual_seconds?: number;
 }
 
 export interface ModelInfo {
@@ -38,3 +58,21 @@ export interface RestorationParameters {
     learning_rate?: number;
     denoise_level?: number;
 }
+
+export interface StageTiming {
+    job_id: string;
+    stage: 'claim' | 'download' | 'decode' | 'pad' | 'forward' | 'postprocess' | 'encode' | 'upload' | 'metrics' | 'db_update'
+        | 'preview' | 'stream_restore' | 'download_original' | `restore:${string}` | `upload:${string}` | `metrics:${string}`;
+    duration_ms: number;
+    bytes?: number;
+    rss_mb: number;
+    peak_rss_mb: number;
+    device_mem_mb: number;
+}
+
+// 비교 작업(parameters.models)의 모델별 결과. parameters.comparison_results에 기록됩니다.
+export interface ComparisonResult {
+    model_id: string;
+    restored_image_path: string;
+    inference_ms: number;
+}
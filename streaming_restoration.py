@@ -0,0 +1,198 @@
+
+# streaming_restoration.py
+
+import os
+import math
+import time
+import argparse
+
+import numpy as np
+
+# TIFF 입출력은 선택적 의존성 (pip install tifffile, 압축/타일 TIFF 입력은 zarr도 필요)
+try:
+    import tifffile
+except ImportError:
+    tifffile = None
+
+# 스트리밍 모드가 지원하는 입출력 포맷 (전체 디코딩 없이 행 단위 접근이 가능한 포맷)
+STREAMING_EXTENSIONS = (".npy", ".tif", ".tiff")
+DEFAULT_BAND_HEIGHT = 256
+DEFAULT_BAND_OVERLAP = 32
+DEFAULT_TILE = 512
+DEFAULT_BLOCK_WIDTH = 2048  # 밴드를 나눠 추론할 열 블록 폭 (float32 타일 누적 버퍼 크기를 제한)
+OUTPUT_TIFF_TILE = 256
+
+# --- Band Source ---
+
+def _require_tifffile():
+    if tifffile is None:
+        raise ImportError("TIFF 스트리밍에는 tifffile 라이브러리가 필요합니다. 'pip install tifffile'로 설치해주세요.")
+
+
+def open_band_source(path: str):
+    """
+    이미지를 메모리에 올리지 않고 행 범위 슬라이싱이 가능한 (H, W, C) 배열 객체로 엽니다.
+    - .npy: numpy 메모리 매핑
+    - 비압축 TIFF: tifffile 메모리 매핑
+    - 압축/타일 TIFF: tifffile + zarr (타일 단위 지연 디코딩)
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npy":
+        return np.load(path, mmap_mode='r')
+    if ext in (".tif", ".tiff"):
+        _require_tifffile()
+        try:
+            return tifffile.memmap(path, mode='r')
+        except ValueError:
+            import zarr
+            return zarr.open(tifffile.imread(path, aszarr=True), mode='r')
+    raise ValueError(f"스트리밍 모드에서 지원하지 않는 입력 포맷입니다: {ext} (지원: {STREAMING_EXTENSIONS})")
+
+
+def _as_rgb(band: np.ndarray) -> np.ndarray:
+    """밴드를 HWC uint8 RGB로 정규화합니다. (흑백 확장, 알파 채널 제거)"""
+    band = np.asarray(band)
+    if band.ndim == 2:
+        band = np.repeat(band[..., None], 3, axis=2)
+    elif band.shape[2] == 4:
+        band = band[..., :3]
+    if band.dtype != np.uint8:
+        raise ValueError(f"스트리밍 모드는 8비트 이미지만 지원합니다. (입력 dtype: {band.dtype})")
+    return np.ascontiguousarray(band)
+
+# --- Band Restoration ---
+
+def _restore_band(restorer, band: np.ndarray, overlap: int, tile: int, block_width: int) -> np.ndarray:
+    """
+    밴드를 열 블록 단위로 나눠 좌우 overlap 열을 붙여 복원한 뒤, 겹친 부분을 잘라 uint8 출력 밴드에 채웁니다.
+    타일 추론의 float32 누적 버퍼가 밴드 전체 폭이 아닌 (block_width + 2 * overlap) 열 분량으로 제한됩니다.
+    """
+    height, width = band.shape[:2]
+    scale = restorer.scale
+    output = np.empty((height * scale, width * scale, 3), dtype=np.uint8)
+
+    for x0 in range(0, width, block_width):
+        x1 = min(x0 + block_width, width)
+        left = max(x0 - overlap, 0)
+        right = min(x1 + overlap, width)
+
+        restored = restorer.restore_array(band[:, left:right], tile=tile)
+        output[:, x0 * scale:x1 * scale] = restored[:, (x0 - left) * scale:(x1 - left) * scale]
+    return output
+
+
+def restored_bands(restorer, source, band_height: int, overlap: int, tile: int, progress_callback=None,
+                   block_width: int = DEFAULT_BLOCK_WIDTH):
+    """
+    입력을 행 밴드 단위로 읽어 위아래 overlap 행을 붙여 복원한 뒤, 겹친 부분을 잘라낸 출력 밴드를 순서대로 생성합니다.
+    한 번에 메모리에 올라가는 양은 (band_height + 2 * overlap) 행 분량의 uint8 입력/출력과 열 블록 하나의 추론 버퍼입니다.
+    """
+    height = source.shape[0]
+    scale = restorer.scale
+    total = math.ceil(height / band_height)
+
+    for index, y0 in enumerate(range(0, height, band_height)):
+        y1 = min(y0 + band_height, height)
+        top = max(y0 - overlap, 0)
+        bottom = min(y1 + overlap, height)
+
+        band = _as_rgb(source[top:bottom])
+        output = _restore_band(restorer, band, overlap, tile, block_width)
+        yield y0 * scale, output[(y0 - top) * scale:(y1 - top) * scale]
+
+        if progress_callback is not None:
+            progress_callback(index + 1, total)
+
+# --- Band Writers ---
+
+def _write_npy(path: str, shape: tuple, bands):
+    output = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8, shape=shape)
+    for y, band in bands:
+        output[y:y + band.shape[0]] = band
+        output.flush()  # 기록한 밴드의 dirty 페이지를 즉시 디스크로 내보냄
+    del output
+
+
+def _tiff_tiles(bands, out_width: int, tile_size: int):
+    """출력 밴드를 TIFF 타일 순서(행 우선)로 잘라 생성합니다. 가장자리 타일은 0으로 채웁니다."""
+    for _, band in bands:
+        for ty in range(0, band.shape[0], tile_size):
+            rows = band[ty:ty + tile_size]
+            for tx in range(0, out_width, tile_size):
+                tile = rows[:, tx:tx + tile_size]
+                if tile.shape[:2] != (tile_size, tile_size):
+                    padded = np.zeros((tile_size, tile_size, 3), dtype=np.uint8)
+                    padded[:tile.shape[0], :tile.shape[1]] = tile
+                    tile = padded
+                yield tile
+
+
+def _write_tiff(path: str, shape: tuple, bands):
+    _require_tifffile()
+    tifffile.imwrite(path, _tiff_tiles(bands, shape[1], OUTPUT_TIFF_TILE), shape=shape, dtype=np.uint8,
+                     tile=(OUTPUT_TIFF_TILE, OUTPUT_TIFF_TILE), photometric='rgb', compression='zlib', bigtiff=True)
+
+# --- Public API ---
+
+def restore_streaming(restorer, input_path: str, output_path: str, band_height: int = DEFAULT_BAND_HEIGHT,
+                      overlap: int = DEFAULT_BAND_OVERLAP, tile: int = DEFAULT_TILE, progress_callback=None,
+                      block_width: int = DEFAULT_BLOCK_WIDTH) -> dict:
+    """
+    입력 파일을 행 밴드 단위로 복원하여 출력 파일(.npy 또는 타일 TIFF)에 밴드별로 바로 기록합니다.
+    피크 메모리는 이미지 전체가 아닌 밴드 크기(추론 버퍼는 열 블록 크기)에 비례합니다.
+    """
+    start = time.time()
+    source = open_band_source(input_path)
+    height, width = source.shape[:2]
+    scale = restorer.scale
+    out_shape = (height * scale, width * scale, 3)
+
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext in (".tif", ".tiff"):
+        # 출력 밴드 높이가 TIFF 타일 높이의 배수가 되도록 입력 밴드 높이를 맞춤 (마지막 밴드 제외)
+        unit = OUTPUT_TIFF_TILE // math.gcd(OUTPUT_TIFF_TILE, scale)
+        band_height = math.ceil(band_height / unit) * unit
+        writer = _write_tiff
+    elif ext == ".npy":
+        writer = _write_npy
+    else:
+        raise ValueError(f"스트리밍 모드에서 지원하지 않는 출력 포맷입니다: {ext}")
+
+    bands = restored_bands(restorer, source, band_height, overlap, tile, progress_callback, block_width)
+    writer(output_path, out_shape, bands)
+
+    return {
+        "input_shape": [height, width],
+        "output_shape": list(out_shape[:2]),
+        "band_height": band_height,
+        "block_width": block_width,
+        "bands": math.ceil(height / band_height),
+        "elapsed_seconds": round(time.time() - start, 3),
+    }
+
+# --- Command-line Interface ---
+
+def main():
+    from inference_engine import ImageRestorer
+    from model_registry import MODELS_CONFIG
+
+    parser = argparse.ArgumentParser(description="대용량 이미지 스트리밍 복원 도구 (밴드 단위 처리)")
+    parser.add_argument('input', help=f"입력 파일 ({', '.join(STREAMING_EXTENSIONS)})")
+    parser.add_argument('output', help="출력 파일 (.npy 또는 .tif)")
+    parser.add_argument('--model-id', default=next(iter(MODELS_CONFIG)), help="사용할 model_id")
+    parser.add_argument('--band-height', type=int, default=DEFAULT_BAND_HEIGHT, help="입력 밴드 높이(행)")
+    parser.add_argument('--overlap', type=int, default=DEFAULT_BAND_OVERLAP, help="밴드 위아래로 겹쳐 읽을 행 수")
+    parser.add_argument('--tile', type=int, default=DEFAULT_TILE, help="밴드 내부 타일 추론 크기")
+    parser.add_argument('--block-width', type=int, default=DEFAULT_BLOCK_WIDTH, help="밴드를 나눠 추론할 열 블록 폭")
+    args = parser.parse_args()
+
+    model_info = MODELS_CONFIG[args.model_id]
+    restorer = ImageRestorer(model_path=model_info['path'], model_config=model_info['config'],
+                             checksum=model_info.get('sha256'))
+    stats = restore_streaming(restorer, args.input, args.output, args.band_height, args.overlap, args.tile,
+                              progress_callback=lambda done, total: print(f"  밴드 {done}/{total} 완료"),
+                              block_width=args.block_width)
+    print(f"스트리밍 복원 완료: {stats}")
+
+if __name__ == "__main__":
+    main()
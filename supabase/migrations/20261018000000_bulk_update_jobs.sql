@@ -0,0 +1,38 @@
+-- bulk_update_jobs: write-behind 버퍼(write_buffer.py)가 모은 작업별 변경 컬럼을 한 번의 호출로 기록합니다.
+--
+-- updates: [{"id": <job id>, "fields": {"<column>": <value>, ...}}, ...]
+-- 작업마다 fields에 있는 컬럼만 UPDATE 하므로, 다른 곳에서 바뀐 컬럼을 되돌리거나 삭제된 행을 되살리지 않습니다.
+-- 값은 jsonb_populate_record로 컬럼 타입에 맞게 변환되며, 전체가 하나의 트랜잭션으로 적용됩니다.
+create or replace function public.bulk_update_jobs(updates jsonb)
+returns integer
+language plpgsql
+as $$
+declare
+    item jsonb;
+    assignments text;
+    updated integer := 0;
+    affected integer;
+begin
+    for item in select value from jsonb_array_elements(updates) loop
+        select string_agg(format('%I = r.%I', key, key), ', ')
+          into assignments
+          from jsonb_object_keys(item -> 'fields') as key
+         where key <> 'id';
+
+        if assignments is null then
+            continue;
+        end if;
+
+        execute format(
+            'update public.restoration_jobs as j set %s '
+            'from jsonb_populate_record(null::public.restoration_jobs, $1) as r '
+            'where j.id::text = $2',
+            assignments
+        ) using item -> 'fields', item ->> 'id';
+
+        get diagnostics affected = row_count;
+        updated := updated + affected;
+    end loop;
+    return updated;
+end;
+$$;
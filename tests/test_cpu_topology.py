@@ -0,0 +1,52 @@
+
+# tests/test_cpu_topology.py
+
+import pytest
+
+import cpu_topology
+from cpu_topology import parse_cpulist, plan_lanes
+
+
+@pytest.fixture
+def two_nodes(monkeypatch):
+    """CPU 0-7이 두 NUMA 노드(0-3, 4-7)로 나뉜 호스트"""
+    monkeypatch.setattr(cpu_topology, "available_cpus", lambda: list(range(8)))
+    monkeypatch.setattr(cpu_topology, "numa_nodes", lambda: {0: [0, 1, 2, 3], 1: [4, 5, 6, 7]})
+
+
+def test_parse_cpulist():
+    assert parse_cpulist("0-3,8-9,12\n") == [0, 1, 2, 3, 8, 9, 12]
+
+
+def test_numa_lanes_stay_inside_nodes(two_nodes):
+    plan = plan_lanes(4, placement="numa")
+
+    assert [lane["cpus"] for lane in plan] == [[0, 1], [4, 5], [2, 3], [6, 7]]
+    assert [lane["threads"] for lane in plan] == [2, 2, 2, 2]
+
+
+def test_uneven_numa_split_sizes_threads_per_lane(two_nodes):
+    plan = plan_lanes(3, placement="numa")
+
+    assert [lane["cpus"] for lane in plan] == [[0, 1], [4, 5, 6, 7], [2, 3]]
+    assert [lane["threads"] for lane in plan] == [2, 4, 2]
+
+
+def test_fewer_lanes_than_nodes_take_whole_nodes(two_nodes):
+    assert plan_lanes(1, placement="numa")[0]["cpus"] == list(range(8))
+
+
+def test_cores_placement_and_thread_override(two_nodes):
+    plan = plan_lanes(3, threads_per_lane=1, placement="cores")
+
+    assert [lane["cpus"] for lane in plan] == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert all(lane["threads"] == 1 for lane in plan)
+
+
+def test_lanes_are_capped_by_cpus(two_nodes):
+    assert len(plan_lanes(32, placement="none")) == 8
+
+
+def test_unknown_placement_is_rejected(two_nodes):
+    with pytest.raises(ValueError):
+        plan_lanes(2, placement="sockets")
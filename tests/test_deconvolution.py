@@ -0,0 +1,30 @@
+
+# tests/test_deconvolution.py
+
+import io as python_io
+
+import numpy as np
+from PIL import Image
+
+from deconvolution import deconvolve_image, deconvolve_rgb
+
+
+def encode_png(array: np.ndarray) -> bytes:
+    buffer = python_io.BytesIO()
+    Image.fromarray(array).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def test_deconvolve_image_accepts_encoded_bytes():
+    image = np.random.default_rng(0).integers(0, 256, (32, 40, 3), dtype=np.uint8)
+
+    restored = deconvolve_image(encode_png(image))
+
+    assert restored.shape == (32, 40)
+    assert restored.dtype == np.uint8
+
+
+def test_deconvolve_rgb_keeps_channels():
+    image = np.random.default_rng(0).integers(0, 256, (16, 24, 3), dtype=np.uint8)
+
+    assert deconvolve_rgb(image).shape == (16, 24, 3)
@@ -0,0 +1,75 @@
+
+# tests/test_job_scheduler.py
+
+from datetime import datetime, timedelta, timezone
+
+from job_scheduler import JobScheduler, job_pixels, size_class, DEFAULT_PIXELS
+
+MODELS_CONFIG = {
+    "sr_x4": {"config": {"upscale": 4}},
+    "sr_x2": {"config": {"upscale": 2}},
+}
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_job(job_id, width, height, waited_seconds=0.0, model_id="sr_x4", priority=0):
+    return {"id": job_id, "model_id": model_id, "width": width, "height": height, "priority": priority,
+            "created_at": (NOW - timedelta(seconds=waited_seconds)).isoformat()}
+
+
+def fresh_small_jobs(count=30):
+    return [make_job(f"small-{i}", 256, 256) for i in range(count)]
+
+
+def test_job_pixels_and_size_class():
+    assert job_pixels({"parameters": {"width": 100, "height": 20}}) == 2000
+    assert job_pixels({}) == DEFAULT_PIXELS
+    assert size_class(make_job(1, 256, 256)) == "small"
+    assert size_class(make_job(1, 7680, 4320)) == "large"
+
+
+def test_shortest_expected_job_first():
+    scheduler = JobScheduler(MODELS_CONFIG)
+    jobs = [make_job("large", 2048, 2048), make_job("small", 256, 256), make_job("medium", 1024, 1024)]
+
+    assert [job["id"] for job in scheduler.schedule(jobs, 3, now=NOW)] == ["small", "medium", "large"]
+
+
+def test_priority_is_selected_before_cost():
+    scheduler = JobScheduler(MODELS_CONFIG)
+    jobs = fresh_small_jobs(4) + [make_job("urgent", 4096, 4096, priority=1)]
+
+    assert scheduler.schedule(jobs, 2, now=NOW)[0]["id"] == "urgent"
+
+
+def test_aging_is_additive():
+    scheduler = JobScheduler(MODELS_CONFIG, aging_seconds=300, max_wait_seconds=0)
+    job = make_job("job", 1024, 1024, waited_seconds=600)
+
+    assert scheduler.score(job, NOW) == scheduler.estimate_cost(job) - 2 * scheduler.cost_unit
+
+
+def test_large_job_is_selected_after_max_wait():
+    scheduler = JobScheduler(MODELS_CONFIG, max_wait_seconds=3600)
+    candidates = fresh_small_jobs()
+
+    waiting = make_job("8k", 7680, 4320, waited_seconds=1800)
+    assert "8k" not in [job["id"] for job in scheduler.schedule(candidates + [waiting], 8, now=NOW)]
+
+    overdue = make_job("8k", 7680, 4320, waited_seconds=3600)
+    assert "8k" in [job["id"] for job in scheduler.schedule(candidates + [overdue], 8, now=NOW)]
+
+
+def test_overdue_jobs_are_selected_oldest_first():
+    scheduler = JobScheduler(MODELS_CONFIG, max_wait_seconds=60)
+    jobs = [make_job("older", 4096, 4096, waited_seconds=500), make_job("newer", 1024, 1024, waited_seconds=100)]
+
+    assert [job["id"] for job in scheduler.schedule(jobs + fresh_small_jobs(), 2, now=NOW)] == ["older", "newer"]
+
+
+def test_batch_is_grouped_by_model():
+    scheduler = JobScheduler(MODELS_CONFIG)
+    jobs = [make_job("a1", 256, 256, model_id="sr_x2"), make_job("b1", 300, 300, model_id="sr_x4"),
+            make_job("a2", 512, 512, model_id="sr_x2")]
+
+    assert [job["model_id"] for job in scheduler.schedule(jobs, 3, now=NOW)] == ["sr_x2", "sr_x2", "sr_x4"]
@@ -0,0 +1,88 @@
+
+# tests/test_job_spool.py
+
+import pytest
+
+from job_spool import JobSpool, fcntl
+
+JOB = {"id": 7, "model_id": "sr_x4", "original_image_path": "originals/7.png"}
+
+
+def test_save_and_read_checkpoint(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.save(JOB, "restored/7.png", b"png-bytes")
+
+    assert spool.has(7)
+    assert spool.read(7) == b"png-bytes"
+    manifest = spool.manifest(7)
+    assert manifest["restored_path"] == "restored/7.png"
+    assert not (manifest["uploaded"] or manifest["benchmarked"] or manifest["finalized"])
+
+
+def test_mark_updates_manifest_and_ignores_removed_jobs(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.save(JOB, "restored/7.png", b"png-bytes")
+
+    assert spool.mark(7, uploaded=True)["uploaded"]
+    assert spool.manifest(7)["uploaded"]
+
+    spool.remove(7)
+    assert spool.mark(7, benchmarked=True) is None
+    assert not spool.has(7)
+
+
+def test_pending_survives_restart_in_spool_order(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.save({**JOB, "id": 1}, "restored/1.png", b"1")
+    spool.save({**JOB, "id": 2}, "restored/2.png", b"2")
+    spool.mark(1, finalized=True, completed_update={"status": "completed"})
+    spool._lock_file.close()
+
+    # 재시작한 워커는 잠금이 풀린 같은 디렉터리를 이어받아 체크포인트를 재개
+    restarted = JobSpool(str(tmp_path))
+    manifests = restarted.pending()
+    assert [m["job_id"] for m in manifests] == [1, 2]
+    assert manifests[0]["completed_update"] == {"status": "completed"}
+
+
+def test_purge_finalized_removes_only_finalized(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.save({**JOB, "id": 1}, "restored/1.png", b"1")
+    spool.save({**JOB, "id": 2}, "restored/2.png", b"2")
+    spool.mark(1, finalized=True)
+
+    assert spool.purge_finalized() == 1
+    assert [m["job_id"] for m in spool.pending()] == [2]
+
+
+@pytest.mark.skipif(fcntl is None, reason="디렉터리 잠금은 fcntl이 있는 플랫폼에서만 사용")
+def test_live_workers_cannot_share_spool_directory(tmp_path):
+    live = JobSpool(str(tmp_path))
+
+    with pytest.raises(RuntimeError):
+        JobSpool(str(tmp_path))
+    assert live.has(JOB["id"]) is False
+
+
+def test_claims_are_recorded_and_cleared(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.record_claims([1, 2])
+    spool.record_claims([2, 3])
+    assert spool.claims() == [1, 2, 3]
+
+    spool.clear_claims([2])
+    assert spool.claims() == [1, 3]
+    spool.clear_claims()
+    assert spool.claims() == []
+
+
+def test_claims_survive_restart_without_being_listed_as_checkpoints(tmp_path):
+    spool = JobSpool(str(tmp_path))
+    spool.record_claims([1, 2])
+    spool.save({**JOB, "id": 2}, "restored/2.png", b"2")
+    spool._lock_file.close()
+
+    # 강제 종료 후 재시작: 체크포인트가 없는 claim 작업만 반환 대상
+    restarted = JobSpool(str(tmp_path))
+    assert [job_id for job_id in restarted.claims() if not restarted.has(job_id)] == [1]
+    assert [m["job_id"] for m in restarted.pending()] == [2]
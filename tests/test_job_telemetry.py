@@ -0,0 +1,30 @@
+
+# tests/test_job_telemetry.py
+
+import numpy as np
+
+from job_telemetry import JobTimer, current_rss_mb
+
+
+def test_stage_peak_rss_is_per_stage():
+    timer = JobTimer(1)
+    with timer.stage("decode"):
+        buffer = np.ones(256 * 1024 * 1024, dtype=np.uint8)  # 256MB를 실제로 기록하여 상주시킴
+    del buffer
+
+    with timer.stage("upload"):
+        pass
+
+    decode, upload = timer.spans
+    # 앞 단계의 최대값이 뒤 단계로 이어지지 않아야 함 (ru_maxrss는 프로세스 수명 최대값)
+    assert decode["peak_rss_mb"] - upload["peak_rss_mb"] > 128
+    assert upload["peak_rss_mb"] <= current_rss_mb() + 16
+
+
+def test_add_span_without_peak_uses_current_rss():
+    timer = JobTimer(1)
+    timer.add_span("claim", 12.5)
+
+    span = timer.spans[0]
+    assert span["peak_rss_mb"] == span["rss_mb"]
+    assert timer.summary_lines()[-1].startswith("total: 12.5ms")
@@ -0,0 +1,115 @@
+
+# tests/test_model_router.py
+
+from deconvolution import WIENER_RGB_MODEL_ID
+from model_router import ModelRouter
+
+MODELS_CONFIG = {
+    "sr_x4": {"config": {"upscale": 4}},
+    "sr_x2": {"config": {"upscale": 2}},
+}
+# x2 모델은 같은 입력을 x4 모델보다 4배 빠르게 처리
+WARMUP_STATS = {
+    "sr_x4": [{"shape": (64, 64), "cold_ms": 50.0, "warm_ms": 16.0}],
+    "sr_x2": [{"shape": (64, 64), "cold_ms": 50.0, "warm_ms": 4.0}],
+}
+
+
+def make_router(min_dwell_seconds=0.0):
+    router = ModelRouter(MODELS_CONFIG, downgrade_wait_seconds=120, upgrade_wait_seconds=30,
+                         min_dwell_seconds=min_dwell_seconds)
+    for model_id in MODELS_CONFIG:
+        router.register(model_id, "cpu", WARMUP_STATS[model_id])
+    # 작업당 평균 처리 시간을 10초로 관측
+    job = {"id": 1, "model_id": "sr_x4", "width": 64, "height": 64}
+    router.observe(job, {"model_id": "sr_x4", "precision": None}, 10.0)
+    return router
+
+
+def fresh_router():
+    router = ModelRouter(MODELS_CONFIG)
+    for model_id in MODELS_CONFIG:
+        router.register(model_id, "cpu", WARMUP_STATS[model_id])
+    return router
+
+
+def downgradable_job(model_id="sr_x4"):
+    return {"id": 2, "model_id": model_id, "width": 512, "height": 512, "parameters": {"allow_downgrade": True}}
+
+
+def test_tiers_get_cheaper_and_end_with_wiener():
+    router = fresh_router()
+    tiers = router.tiers("sr_x4")
+
+    assert tiers == [("sr_x4", None), ("sr_x4", "bf16"), ("sr_x2", None), (WIENER_RGB_MODEL_ID, None)]
+    seconds = [router.pixel_seconds(model_id, precision) for model_id, precision in tiers]
+    assert seconds == sorted(seconds, reverse=True)
+
+
+def test_low_precision_estimate_is_learned_separately():
+    router = fresh_router()
+    job = downgradable_job()
+    fp32_before = router.estimate_seconds(job, "sr_x4")
+
+    # bf16이 fp32보다 두 배 느리게 관측되면 fp32 추정은 그대로이고 bf16 티어는 빠짐
+    for _ in range(20):
+        router.observe(job, {"model_id": "sr_x4", "precision": "bf16"}, fp32_before * 2)
+
+    assert router.estimate_seconds(job, "sr_x4") == fp32_before
+    assert router.estimate_seconds(job, "sr_x4", "bf16") > fp32_before
+    assert ("sr_x4", "bf16") not in router.tiers("sr_x4")
+
+
+def test_variant_warmup_registers_its_own_estimate():
+    router = fresh_router()
+    router.register("sr_x4", "cpu", [{"shape": (64, 64), "cold_ms": 50.0, "warm_ms": 8.0}], precision="bf16")
+
+    assert router.pixel_seconds("sr_x4", "bf16") == router.pixel_seconds("sr_x4") / 2
+
+
+def test_level_rises_one_step_per_update_under_load_and_is_capped():
+    router = make_router()
+    levels = [router.update_load(queue_depth=100, lanes=1) for _ in range(5)]
+
+    assert levels == [1, 2, 3, 3, 3]
+
+
+def test_level_holds_between_thresholds_and_drops_when_relieved():
+    router = make_router()
+    router.update_load(queue_depth=100, lanes=1)
+    router.update_load(queue_depth=100, lanes=1)
+
+    # 예상 대기 50초: 다운그레이드(120초)와 복귀(30초) 임계값 사이에서는 유지
+    assert router.update_load(queue_depth=5, lanes=1) == 2
+    assert router.update_load(queue_depth=0, lanes=1) == 1
+    assert router.update_load(queue_depth=0, lanes=1) == 0
+
+
+def test_min_dwell_blocks_consecutive_changes():
+    router = make_router(min_dwell_seconds=3600)
+
+    assert router.update_load(queue_depth=100, lanes=1) == 1
+    assert router.update_load(queue_depth=100, lanes=1) == 1
+    assert router.update_load(queue_depth=0, lanes=1) == 1
+
+
+def test_route_follows_level_only_for_opted_in_jobs():
+    router = make_router()
+    router.update_load(queue_depth=100, lanes=1)
+    router.update_load(queue_depth=100, lanes=1)
+
+    decision = router.route(downgradable_job())
+    assert (decision["model_id"], decision["precision"], decision["level"]) == ("sr_x2", None, 2)
+    assert decision["estimated_savings_s"] > 0
+
+    regular = {**downgradable_job(), "parameters": {}}
+    assert router.route(regular)["model_id"] == "sr_x4"
+
+
+def test_observe_updates_cost_estimate():
+    router = make_router()
+    job = downgradable_job()
+    before = router.estimate_seconds(job, "sr_x2")
+    router.observe(job, {"model_id": "sr_x2", "precision": None}, before * 10)
+
+    assert router.estimate_seconds(job, "sr_x2") > before
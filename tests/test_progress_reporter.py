@@ -0,0 +1,44 @@
+
+# tests/test_progress_reporter.py
+
+from progress_reporter import ProgressReporter
+
+
+class RecordingBuffer:
+    def __init__(self):
+        self.updates = []
+
+    def update_job(self, job_id, fields):
+        self.updates.append((job_id, fields))
+
+
+def test_updates_are_throttled_by_delta():
+    buffer = RecordingBuffer()
+    reporter = ProgressReporter(buffer, 1, min_interval=0, min_delta=5)
+
+    written = [reporter.update(progress, "inference") for progress in (10, 12, 14, 15, 30)]
+
+    assert written == [True, False, False, True, True]
+    assert [fields["progress"] for _, fields in buffer.updates] == [10, 15, 30]
+
+
+def test_updates_are_throttled_by_interval():
+    buffer = RecordingBuffer()
+    reporter = ProgressReporter(buffer, 1, min_interval=3600, min_delta=0)
+
+    assert reporter.update(10, "inference")
+    assert not reporter.update(50, "inference")
+    assert reporter.update(90, "upload", force=True)
+    assert reporter.writes == 2
+
+
+def test_range_callback_maps_tiles_into_range():
+    buffer = RecordingBuffer()
+    reporter = ProgressReporter(buffer, 1, min_interval=0, min_delta=0)
+    callback = reporter.range_callback(10, 90, "inference")
+
+    for done in range(1, 5):
+        callback(done, 4)
+
+    assert [fields["progress"] for _, fields in buffer.updates] == [30, 50, 70, 90]
+    assert buffer.updates[-1][1]["current_step"] == "inference 4/4"
@@ -0,0 +1,68 @@
+
+# tests/test_streaming_restoration.py
+
+import numpy as np
+import pytest
+
+from streaming_restoration import restore_streaming
+
+
+class NearestRestorer:
+    """각 픽셀을 scale x scale로 복제하는 가짜 복원기. 호출된 입력 크기를 기록합니다."""
+    def __init__(self, scale=2):
+        self.scale = scale
+        self.calls = []
+
+    def restore_array(self, img_np, tile=None):
+        self.calls.append(img_np.shape[:2])
+        return img_np.repeat(self.scale, axis=0).repeat(self.scale, axis=1)
+
+
+def make_image(tmp_path, height=37, width=53):
+    image = np.random.default_rng(0).integers(0, 256, size=(height, width, 3), dtype=np.uint8)
+    path = str(tmp_path / "input.npy")
+    np.save(path, image)
+    return image, path
+
+
+def test_bands_and_blocks_stitch_to_direct_result(tmp_path):
+    image, input_path = make_image(tmp_path)
+    restorer = NearestRestorer(scale=2)
+    output_path = str(tmp_path / "output.npy")
+
+    stats = restore_streaming(restorer, input_path, output_path, band_height=8, overlap=3, tile=16, block_width=10)
+
+    assert stats["output_shape"] == [74, 106]
+    assert stats["bands"] == 5
+    np.testing.assert_array_equal(np.load(output_path), restorer.restore_array(image))
+
+
+def test_inference_input_is_bounded_by_band_and_block(tmp_path):
+    _, input_path = make_image(tmp_path, height=40, width=200)
+    restorer = NearestRestorer(scale=4)
+
+    restore_streaming(restorer, input_path, str(tmp_path / "output.npy"), band_height=8, overlap=2, block_width=32)
+
+    assert max(h for h, _ in restorer.calls) <= 8 + 2 * 2
+    assert max(w for _, w in restorer.calls) <= 32 + 2 * 2
+
+
+def test_grayscale_input_is_expanded_to_rgb(tmp_path):
+    gray = np.arange(12 * 9, dtype=np.uint8).reshape(12, 9)
+    input_path = str(tmp_path / "gray.npy")
+    np.save(input_path, gray)
+
+    restore_streaming(NearestRestorer(scale=1), input_path, str(tmp_path / "output.npy"), band_height=5, overlap=1,
+                      block_width=4)
+
+    np.testing.assert_array_equal(np.load(str(tmp_path / "output.npy")), np.repeat(gray[..., None], 3, axis=2))
+
+
+def test_tiff_output_matches_npy_output(tmp_path):
+    tifffile = pytest.importorskip("tifffile")
+    image, input_path = make_image(tmp_path, height=70, width=45)
+    output_path = str(tmp_path / "output.tif")
+
+    restore_streaming(NearestRestorer(scale=4), input_path, output_path, band_height=16, overlap=2, block_width=20)
+
+    np.testing.assert_array_equal(tifffile.imread(output_path), NearestRestorer(scale=4).restore_array(image))
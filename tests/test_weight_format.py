@@ -0,0 +1,60 @@
+
+# tests/test_weight_format.py
+
+import os
+
+import pytest
+import torch
+
+from weight_format import convert_checkpoint, load_state_dict_mmap, mmap_weights_path
+
+
+def make_checkpoint(tmp_path, key="params_ema"):
+    state_dict = {
+        "conv.weight": torch.randn(4, 3, 3, 3),
+        "conv.bias": torch.randn(4),
+        "norm.num_batches_tracked": torch.tensor(7, dtype=torch.int64),
+        "half": torch.randn(5, 3).to(torch.float16),
+    }
+    pth_path = str(tmp_path / "model.pth")
+    torch.save({key: state_dict}, pth_path)
+    return pth_path, state_dict
+
+
+def test_convert_and_load_round_trip(tmp_path):
+    pth_path, state_dict = make_checkpoint(tmp_path)
+    digest = convert_checkpoint(pth_path)
+
+    loaded = load_state_dict_mmap(mmap_weights_path(pth_path), expected_sha256=digest)
+
+    assert loaded.keys() == state_dict.keys()
+    for name, tensor in state_dict.items():
+        assert loaded[name].dtype == tensor.dtype
+        assert torch.equal(loaded[name], tensor)
+
+
+def test_loaded_tensors_are_aligned(tmp_path):
+    pth_path, _ = make_checkpoint(tmp_path, key="params")
+    convert_checkpoint(pth_path)
+
+    for tensor in load_state_dict_mmap(mmap_weights_path(pth_path)).values():
+        assert tensor.data_ptr() % tensor.element_size() == 0
+
+
+def test_checksum_mismatch_is_detected_even_with_same_mtime(tmp_path):
+    pth_path, _ = make_checkpoint(tmp_path)
+    flat_path = mmap_weights_path(pth_path)
+    digest = convert_checkpoint(pth_path)
+    load_state_dict_mmap(flat_path, expected_sha256=digest)
+
+    # 크기와 수정 시각을 그대로 유지한 채 마지막 바이트를 뒤집음
+    stat = os.stat(flat_path)
+    with open(flat_path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        last = f.read(1)
+        f.seek(-1, os.SEEK_END)
+        f.write(bytes([last[0] ^ 0xFF]))
+    os.utime(flat_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    with pytest.raises(IOError, match="체크섬 불일치"):
+        load_state_dict_mmap(flat_path, expected_sha256=digest)
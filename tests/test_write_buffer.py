@@ -0,0 +1,174 @@
+
+# tests/test_write_buffer.py
+
+from write_buffer import WriteBehindBuffer
+
+
+class FakeQuery:
+    def __init__(self, client, table, op, payload):
+        self.client = client
+        self.call = {"table": table, "op": op, "payload": payload}
+
+    def eq(self, column, value):
+        self.call["ids"] = [value]
+        return self
+
+    def in_(self, column, values):
+        self.call["ids"] = list(values)
+        return self
+
+    def execute(self):
+        self.client.calls.append(self.call)
+        if self.client.failures:
+            self.client.failures -= 1
+            raise RuntimeError("connection reset")
+
+
+class MissingFunctionError(Exception):
+    code = "PGRST202"
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def insert(self, rows):
+        return FakeQuery(self.client, self.name, "insert", rows)
+
+    def update(self, fields):
+        return FakeQuery(self.client, self.name, "update", fields)
+
+    def upsert(self, rows):
+        raise AssertionError("작업 상태는 upsert로 기록하면 안 됩니다.")
+
+
+class FakeClient:
+    """Supabase 클라이언트의 table().insert/update().eq/in_().execute() 호출을 기록하는 가짜 클라이언트"""
+    def __init__(self, failures: int = 0, has_rpc: bool = True):
+        self.calls = []
+        self.failures = failures
+        self.has_rpc = has_rpc
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+    def rpc(self, name, params):
+        if not self.has_rpc:
+            raise MissingFunctionError(f"Could not find the function public.{name}")
+        return FakeQuery(self, name, "rpc", params["updates"])
+
+
+def make_buffer(client, **kwargs):
+    return WriteBehindBuffer(client, max_pending=1000, **kwargs)
+
+
+def test_updates_send_only_changed_columns_in_one_call():
+    client = FakeClient()
+    buffer = make_buffer(client)
+    buffer.update_job(1, {"progress": 10})
+    buffer.update_job(2, {"status": "completed", "restored_image_path": "restored/2.png"})
+    buffer.flush()
+
+    assert client.calls == [{"table": "bulk_update_jobs", "op": "rpc", "payload": [
+        {"id": 1, "fields": {"progress": 10}},
+        {"id": 2, "fields": {"status": "completed", "restored_image_path": "restored/2.png"}},
+    ]}]
+
+
+def test_updates_for_same_job_are_merged_later_value_wins():
+    client = FakeClient()
+    buffer = make_buffer(client)
+    buffer.update_job(1, {"progress": 10, "current_step": "download"})
+    buffer.update_job(1, {"progress": 50})
+    buffer.flush()
+
+    assert client.calls[0]["payload"] == [{"id": 1, "fields": {"progress": 50, "current_step": "download"}}]
+
+
+def test_missing_rpc_falls_back_to_grouped_updates():
+    client = FakeClient(has_rpc=False)
+    buffer = make_buffer(client)
+    buffer.update_job(1, {"status": "pending"})
+    buffer.flush()
+
+    assert buffer.bulk_update_rpc is None
+    assert client.calls == [{"table": "restoration_jobs", "op": "update", "payload": {"status": "pending"}, "ids": [1]}]
+
+
+def test_identical_payloads_are_grouped_into_one_update_without_rpc():
+    client = FakeClient()
+    buffer = make_buffer(client, bulk_update_rpc=None)
+    buffer.update_job(1, {"status": "pending"})
+    buffer.update_job(2, {"status": "pending"})
+    buffer.update_job(3, {"status": "failed"})
+    buffer.flush()
+
+    assert [(call["payload"], call["ids"]) for call in client.calls] == [
+        ({"status": "pending"}, [1, 2]),
+        ({"status": "failed"}, [3]),
+    ]
+
+
+def test_inserts_are_flushed_before_updates():
+    client = FakeClient()
+    buffer = make_buffer(client)
+    buffer.update_job(1, {"status": "completed"})
+    buffer.insert("model_benchmarks", {"job_id": 1})
+    buffer.flush()
+
+    assert [call["op"] for call in client.calls] == ["insert", "rpc"]
+
+
+def test_failed_update_is_requeued_ahead_of_newer_fields():
+    client = FakeClient(failures=1)
+    buffer = make_buffer(client)
+    buffer.update_job(1, {"status": "completed", "progress": 100})
+    buffer.flush()
+    assert buffer.has_pending()
+
+    # 실패 후 들어온 더 새로운 값은 재시도되는 값보다 우선
+    buffer.update_job(1, {"progress": 99})
+    buffer.update_job(2, {"progress": 5})
+    buffer.flush()
+
+    assert not buffer.has_pending()
+    assert client.calls[1]["payload"] == [
+        {"id": 1, "fields": {"status": "completed", "progress": 99}},
+        {"id": 2, "fields": {"progress": 5}},
+    ]
+
+
+def test_failed_insert_is_retried_then_dropped_after_max_attempts():
+    client = FakeClient(failures=10)
+    buffer = make_buffer(client, max_attempts=3)
+    buffer.insert("job_stage_timings", [{"job_id": 1}, {"job_id": 1}])
+
+    for _ in range(3):
+        buffer.flush()
+
+    assert len(client.calls) == 3
+    assert not buffer.has_pending()
+
+
+def test_on_flushed_runs_once_after_successful_insert():
+    client = FakeClient(failures=1)
+    buffer = make_buffer(client)
+    flushed = []
+    buffer.insert("model_benchmarks", [{"job_id": 1}, {"job_id": 1}], on_flushed=lambda: flushed.append(1))
+
+    buffer.flush()
+    assert flushed == []
+
+    buffer.flush()
+    assert flushed == [1]
+
+
+def test_close_flushes_pending_writes():
+    client = FakeClient()
+    buffer = make_buffer(client)
+    buffer.start()
+    buffer.update_job(1, {"status": "completed"})
+    buffer.close()
+
+    assert client.calls and not buffer.has_pending()
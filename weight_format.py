@@ -0,0 +1,138 @@
+
+# weight_format.py
+
+import os
+import json
+import struct
+import hashlib
+import argparse
+
+import numpy as np
+import torch
+
+# safetensors 호환 플랫 파일 포맷:
+#   [8바이트 little-endian 헤더 길이 N][N바이트 JSON 헤더][텐서 데이터 영역]
+# 헤더는 텐서 이름별 dtype, shape, 데이터 영역 내 [시작, 끝) 오프셋을 담습니다.
+MMAP_SUFFIX = ".safetensors"
+ALIGNMENT = 64  # 텐서 시작 오프셋 정렬 (dtype view가 가능하도록)
+
+_DTYPES = {
+    torch.float32: "F32", torch.float16: "F16", torch.bfloat16: "BF16", torch.float64: "F64",
+    torch.int64: "I64", torch.int32: "I32", torch.int16: "I16", torch.int8: "I8",
+    torch.uint8: "U8", torch.bool: "BOOL",
+}
+_DTYPES_REVERSE = {name: dtype for dtype, name in _DTYPES.items()}
+
+# --- Helpers ---
+
+def mmap_weights_path(model_path: str) -> str:
+    """.pth 체크포인트에 대응하는 변환된 플랫 파일 경로를 반환합니다."""
+    root, ext = os.path.splitext(model_path)
+    return model_path if ext == MMAP_SUFFIX else root + MMAP_SUFFIX
+
+
+def sha256_file(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_checksum(path: str, expected: str):
+    """
+    파일의 SHA-256이 expected와 같은지 확인합니다.
+    크기/수정 시각만으로는 내용 변경을 보장할 수 없으므로 로드할 때마다 다시 해싱합니다.
+    """
+    actual = sha256_file(path)
+    if actual != expected:
+        raise IOError(f"가중치 체크섬 불일치: {path} (예상: {expected}, 실제: {actual})")
+
+# --- Conversion ---
+
+def _extract_state_dict(checkpoint: dict) -> dict:
+    """SwinIR 체크포인트의 'params_ema' / 'params' 키를 풀어 순수 state_dict를 반환합니다."""
+    for key in ('params_ema', 'params'):
+        if key in checkpoint:
+            return checkpoint[key]
+    return checkpoint
+
+
+def convert_checkpoint(pth_path: str, output_path: str = None) -> str:
+    """
+    pickle 기반 .pth 체크포인트를 메모리 매핑 가능한 플랫 파일로 변환하고 SHA-256을 반환합니다.
+    """
+    output_path = output_path or mmap_weights_path(pth_path)
+    state_dict = _extract_state_dict(torch.load(pth_path, map_location=torch.device('cpu')))
+
+    header = {"__metadata__": {"format": "pt", "source": os.path.basename(pth_path)}}
+    tensors = []
+    offset = 0
+    for name, tensor in state_dict.items():
+        tensor = tensor.detach().cpu().contiguous()
+        if tensor.dtype not in _DTYPES:
+            raise ValueError(f"지원되지 않는 dtype: {name} ({tensor.dtype})")
+        offset = (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+        nbytes = tensor.numel() * tensor.element_size()
+        header[name] = {"dtype": _DTYPES[tensor.dtype], "shape": list(tensor.shape), "data_offsets": [offset, offset + nbytes]}
+        tensors.append((offset, tensor))
+        offset += nbytes
+
+    # 데이터 영역이 정렬되도록 헤더를 공백으로 채움
+    header_bytes = json.dumps(header, separators=(",", ":")).encode('utf-8')
+    header_bytes += b" " * ((-(8 + len(header_bytes))) % ALIGNMENT)
+
+    tmp_path = f"{output_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        data_start = f.tell()
+        for tensor_offset, tensor in tensors:
+            f.seek(data_start + tensor_offset)
+            f.write(tensor.reshape(-1).view(torch.uint8).numpy().tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, output_path)
+
+    return sha256_file(output_path)
+
+# --- Loading ---
+
+def load_state_dict_mmap(path: str, expected_sha256: str = None) -> dict:
+    """
+    플랫 파일을 메모리 매핑하여 파일 페이지를 그대로 가리키는 텐서들의 state_dict를 반환합니다.
+    페이지는 접근할 때 로드되며(lazy), 같은 호스트의 워커 프로세스들이 페이지 캐시를 공유합니다.
+    """
+    if expected_sha256:
+        verify_checksum(path, expected_sha256)
+
+    with open(path, 'rb') as f:
+        (header_len,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_len))
+    header.pop("__metadata__", None)
+    data_start = 8 + header_len
+
+    # copy-on-write 매핑: 쓰지 않는 한 페이지는 다른 프로세스와 공유됨
+    mapped = torch.from_numpy(np.memmap(path, dtype=np.uint8, mode='c'))
+
+    state_dict = {}
+    for name, info in header.items():
+        begin, end = info["data_offsets"]
+        raw = mapped[data_start + begin:data_start + end]
+        state_dict[name] = raw.view(_DTYPES_REVERSE[info["dtype"]]).reshape(info["shape"])
+    return state_dict
+
+# --- Command-line Interface ---
+
+def main():
+    parser = argparse.ArgumentParser(description=".pth 체크포인트를 메모리 매핑용 플랫 파일로 변환")
+    parser.add_argument('checkpoints', nargs='+', help="변환할 .pth 파일 경로")
+    args = parser.parse_args()
+
+    for pth_path in args.checkpoints:
+        output_path = mmap_weights_path(pth_path)
+        digest = convert_checkpoint(pth_path, output_path)
+        print(f"'{pth_path}' -> '{output_path}'")
+        print(f"  sha256: {digest}  (MODELS_CONFIG의 'sha256' 값으로 등록하세요)")
+
+if __name__ == "__main__":
+    main()
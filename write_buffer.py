@@ -0,0 +1,185 @@
+
+# write_buffer.py
+
+import json
+import threading
+from collections import OrderedDict
+
+from job_telemetry import METRICS
+
+# --- Write-behind Buffer ---
+
+class WriteBehindBuffer:
+    """
+    작업 상태 변경과 테이블 insert를 메모리에 모아 두었다가 일괄 insert와 일괄 UPDATE RPC로 내보내는 버퍼.
+
+    - 같은 작업의 상태 변경은 하나로 병합되며(나중 값 우선), flush는 직렬화되어 작업별 쓰기 순서가 유지됩니다.
+    - 한 번의 flush 안에서는 insert(벤치마크, 단계별 타이밍)가 상태 변경보다 먼저 기록됩니다.
+    - 상태 변경은 작업별로 변경된 컬럼만 모아 bulk_update_rpc 함수 한 번의 호출로 기록합니다. (supabase/migrations 참고)
+      RPC가 배포되지 않은 DB에서는 변경 내용이 같은 작업끼리 묶은 UPDATE ... WHERE id IN (...)으로 대체합니다.
+    - 대기 중인 쓰기가 max_pending 개를 넘거나 flush_interval 초가 지나면 flush 됩니다.
+    - 실패한 쓰기는 다음 flush에서 재시도하며, insert는 max_attempts 회 실패하면 버립니다.
+    """
+    def __init__(self, client, jobs_table: str = "restoration_jobs", max_pending: int = 50,
+                 flush_interval: float = 2.0, max_attempts: int = 3, bulk_update_rpc: str = "bulk_update_jobs"):
+        self.client = client
+        self.jobs_table = jobs_table
+        self.bulk_update_rpc = bulk_update_rpc  # None이면 묶음 UPDATE만 사용
+        self.max_pending = max_pending
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+
+        self._lock = threading.Lock()        # 버퍼 상태 보호
+        self._flush_lock = threading.Lock()  # flush 직렬화
+        self._job_updates = OrderedDict()    # job_id -> 병합된 변경 필드
+        self._inserts = []                   # (table, row, attempts, on_flushed)
+
+        self._stop = threading.Event()
+        self._thread = None
+
+    # --- Producer API ---
+
+    def update_job(self, job_id, fields: dict):
+        """작업 행의 변경 필드를 버퍼에 병합합니다."""
+        with self._lock:
+            merged = self._job_updates.pop(job_id, {})
+            merged.update(fields)
+            self._job_updates[job_id] = merged
+            should_flush = self._pending_count() >= self.max_pending
+        if should_flush:
+            self.flush()
+
+    def insert(self, table: str, rows, on_flushed=None):
+        """
+        table에 삽입할 행(또는 행 목록)을 버퍼에 추가합니다.
+        on_flushed를 넘기면 이 행들이 실제로 기록된 뒤 flush 스레드에서 한 번 호출됩니다. (재시도 후 버려지면 호출되지 않음)
+        """
+        rows = rows if isinstance(rows, list) else [rows]
+        with self._lock:
+            self._inserts.extend((table, row, 0, on_flushed) for row in rows)
+            should_flush = self._pending_count() >= self.max_pending
+        if should_flush:
+            self.flush()
+
+    def _pending_count(self) -> int:
+        return len(self._job_updates) + len(self._inserts)
+
+    def has_pending(self) -> bool:
+        """아직 기록되지 않은(또는 재시도 대기 중인) 쓰기가 남아 있는지 확인합니다."""
+        with self._lock:
+            return self._pending_count() > 0
+
+    # --- Flush ---
+
+    def flush(self):
+        """버퍼에 쌓인 쓰기를 테이블별 bulk insert와 묶음 UPDATE로 내보냅니다."""
+        with self._flush_lock:
+            with self._lock:
+                inserts, self._inserts = self._inserts, []
+                updates, self._job_updates = self._job_updates, OrderedDict()
+
+            if not inserts and not updates:
+                return
+
+            failed_inserts = self._flush_inserts(inserts)
+            failed_updates = self._flush_updates(updates)
+
+            with self._lock:
+                # 실패한 쓰기를 그 사이 새로 들어온 쓰기보다 앞에 되돌려 순서를 유지
+                self._inserts = failed_inserts + self._inserts
+                for job_id, fields in reversed(list(failed_updates.items())):
+                    newer = self._job_updates.pop(job_id, {})
+                    self._job_updates[job_id] = {**fields, **newer}
+                    self._job_updates.move_to_end(job_id, last=False)
+
+            METRICS.inc("restoration_write_buffer_flushes_total", help_text="Write-behind buffer flushes")
+            METRICS.inc("restoration_write_buffer_rows_total", len(inserts) + len(updates),
+                        "Rows written through the write-behind buffer")
+
+    def _flush_inserts(self, inserts: list) -> list:
+        by_table = OrderedDict()
+        for table, row, attempts, on_flushed in inserts:
+            by_table.setdefault(table, []).append((row, attempts, on_flushed))
+
+        failed = []
+        for table, entries in by_table.items():
+            try:
+                self.client.table(table).insert([row for row, _, _ in entries]).execute()
+            except Exception as e:
+                retry = [(table, row, attempts + 1, on_flushed) for row, attempts, on_flushed in entries
+                         if attempts + 1 < self.max_attempts]
+                print(f"[WriteBuffer] '{table}' 일괄 insert 실패 ({len(entries)}행, 재시도 {len(retry)}행): {e}")
+                failed.extend(retry)
+                continue
+
+            callbacks = OrderedDict((id(cb), cb) for _, _, cb in entries if cb is not None)
+            for callback in callbacks.values():
+                try:
+                    callback()
+                except Exception as e:
+                    print(f"[WriteBuffer] flush 후 콜백 실패: {e}")
+        return failed
+
+    def _flush_updates(self, updates: OrderedDict) -> OrderedDict:
+        """
+        작업별로 변경된 컬럼만 한 번의 RPC 호출로 기록합니다.
+        (전체 행 upsert는 claim 이후 다른 곳에서 바뀐 컬럼을 되돌리거나 삭제된 행을 되살리므로 사용하지 않음)
+        """
+        if not updates:
+            return OrderedDict()
+        if self.bulk_update_rpc:
+            payload = [{"id": job_id, "fields": fields} for job_id, fields in updates.items()]
+            try:
+                self.client.rpc(self.bulk_update_rpc, {"updates": json.loads(json.dumps(payload, default=str))}).execute()
+                return OrderedDict()
+            except Exception as e:
+                if getattr(e, 'code', None) != "PGRST202":
+                    print(f"[WriteBuffer] 작업 상태 일괄 업데이트 실패 ({len(updates)}건): {e}")
+                    return OrderedDict(updates)
+                # 함수가 없는 DB(마이그레이션 미적용)에서는 묶음 UPDATE로 전환
+                print(f"[WriteBuffer] '{self.bulk_update_rpc}' 함수가 없어 묶음 UPDATE로 기록합니다: {e}")
+                self.bulk_update_rpc = None
+        return self._flush_grouped_updates(updates)
+
+    def _flush_grouped_updates(self, updates: OrderedDict) -> OrderedDict:
+        """변경 내용이 같은 작업들을 하나의 .in_("id", ...) UPDATE로 묶어 기록합니다."""
+        failed = OrderedDict()
+        groups = OrderedDict()
+        for job_id, fields in updates.items():
+            key = json.dumps(fields, sort_keys=True, default=str)
+            groups.setdefault(key, (fields, []))[1].append(job_id)
+
+        for fields, job_ids in groups.values():
+            try:
+                query = self.client.table(self.jobs_table).update(fields)
+                query = query.eq("id", job_ids[0]) if len(job_ids) == 1 else query.in_("id", job_ids)
+                query.execute()
+            except Exception as e:
+                print(f"[WriteBuffer] 작업 상태 업데이트 실패 ({len(job_ids)}건): {e}")
+                for job_id in job_ids:
+                    failed[job_id] = updates[job_id]
+        return failed
+
+    # --- Lifecycle ---
+
+    def start(self):
+        """flush_interval 마다 flush 하는 백그라운드 스레드를 시작합니다."""
+        self._thread = threading.Thread(target=self._run, name="write-buffer", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """백그라운드 flush를 멈추고 남은 쓰기를 모두 내보냅니다. (종료 시 반드시 호출)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._lock:
+            remaining = self._pending_count()
+        if remaining:
+            # 실패 후 재시도 대기 중인 쓰기가 남은 경우 한 번 더 시도
+            self.flush()